@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""Upgrade the student data to the current schema version.
+
+Older students.json files (no schema_version field) may hold a legacy
+`score` field, short `scores` lists or out-of-range scores, and older
+deployments keep score history in score_history.json instead of the
+score_history.jsonl journal. The server upgrades both once at startup; run
+this script to do it ahead of time (e.g. before a deploy). Re-running is a
+no-op once the data is current.
+"""
+
+import os
+import sys
+from pathlib import Path
+
+# Add repository's src/ to sys.path so the package is importable when running from repo root
+HERE = Path(__file__).resolve().parent.parent
+SRC_DIR = HERE / 'src'
+if SRC_DIR.exists():
+    s = str(SRC_DIR)
+    if s not in sys.path:
+        sys.path.insert(0, s)
+
+# The migration must not start the background poller
+os.environ['POLL_ENGINE'] = 'off'
+
+try:
+    import xueyuanzuoye.stu_homework as appmod
+except Exception:
+    try:
+        import stu_homework as appmod
+    except Exception as e:
+        print('Failed to import application module:', e)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    # Importing the module already runs the startup migration; run it again
+    # so the result can be reported (None means the data was already current).
+    changed = appmod.migrate_students_schema()
+    print(f"Student data is at schema version {appmod.students_schema_version()}"
+          + ("" if changed is None else f" ({changed} records normalized)"))
+    if not appmod.use_sqlite():
+        converted = appmod.migrate_score_history_journal()
+        if converted is not None:
+            print(f"Converted {converted} score history records to {appmod.score_journal_file()}")
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""One-shot migration of the JSON data files into the SQLite storage backend.
+
+Reads students.json, state.json, remarks.json and the score_history.jsonl
+journal (converting a legacy score_history.json first) from their usual locations and writes them to the database
+(SQLITE_DB, default homework.db next to state.json). The JSON files are left untouched; start
+the server with STORAGE_BACKEND=sqlite afterwards.
+"""
+
+import os
+import sys
+from pathlib import Path
+
+# Add repository's src/ to sys.path so the package is importable when running from repo root
+HERE = Path(__file__).resolve().parent.parent
+SRC_DIR = HERE / 'src'
+if SRC_DIR.exists():
+    s = str(SRC_DIR)
+    if s not in sys.path:
+        sys.path.insert(0, s)
+
+# The migration must not start the background poller
+os.environ['POLL_ENGINE'] = 'off'
+
+try:
+    import xueyuanzuoye.stu_homework as appmod
+except Exception:
+    try:
+        import stu_homework as appmod
+    except Exception as e:
+        print('Failed to import application module:', e)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    counts = appmod.migrate_json_to_sqlite()
+    print(f"Migrated into {appmod.sqlite_path()}:")
+    for table, count in counts.items():
+        print(f"  {table}: {count}")
@@ -8,16 +8,33 @@ const API = {
     UPDATE: '/api/students/update',
     DELETE: '/api/students/delete',
     SCORE: '/api/students/score',
+    EVENTS: '/api/events',
     EXPORT: '/api/export/csv',
     STUDENT_DETAILS: (name) => `/api/students/${encodeURIComponent(name)}/details`,
     STUDENT_REMARKS: (name) => `/api/students/${encodeURIComponent(name)}/remarks`
 };
 
 const PHASE_LABELS = ['阶段1', '阶段2', '阶段3', '阶段4', '阶段5'];
-
-let allRows = [];
-let filteredRows = []; // 用于搜索过滤
+const DETAILS_REFRESH_DELAY = 3000; // 提交历史后台刷新时，重新拉取详情的间隔（毫秒）
+const DETAILS_REFRESH_ATTEMPTS = 5;
+const EVENT_REFRESH_DELAY = 300; // 收到事件后稍等再刷新，合并一连串事件（毫秒）
+const LIST_PAGE_SIZE = 100; // 每次从 /api/list 取的行数
+const LIST_PAGE_LIMIT_MAX = 500; // 服务器每页最多返回的行数，重新加载更多行时分页取
+const SEARCH_DEBOUNCE = 200; // 输入停顿多久后再向服务器搜索（毫秒）
+
+let allRows = []; // 已加载的行（服务器端筛选、排序后的前几页）
+let filteredRows = []; // 当前渲染的行
 let refreshTimer = null;
+let listETag = null; // 上次 /api/list 响应的 ETag
+let listVersion = null; // allRows 对应的列表版本，刷新时用 ?since= 只取之后的变化
+let listCursor = null; // 下一页的 cursor，没有更多时为 null
+let listTotal = 0; // 符合当前筛选条件的总行数
+let listSort = ''; // 服务器端排序字段，空为名单原有顺序
+let searchTimer = null;
+let listRequestSeq = 0; // 只采用最后一次列表请求的结果，丢弃过时的响应
+let refreshSeconds = 60;
+let eventsConnected = false; // 事件流连上时不轮询
+let eventRefreshTimer = null;
 let editingStudent = null;
 let currentView = 'card';
 let searchQuery = ''; // 搜索关键词
@@ -115,68 +132,42 @@ function getLevelText(level) {
 }
 
 // Search & Filter Functions
-function applyFilters() {
-    const showUpdatedOnly = document.getElementById('updatedOnlyToggle').classList.contains('active');
-
-    // 首先根据"仅显示已更新"过滤
-    let rows = showUpdatedOnly ? allRows.filter(r => r.updated_since_view) : [...allRows];
-
-    // 然后应用搜索过滤
-    if (searchQuery.trim()) {
-        const query = searchQuery.toLowerCase();
-        rows = rows.filter(r => {
-            const name = (r.name || '').toLowerCase();
-            const repo = (r.repo || '').toLowerCase();
-            // 支持拼音首字母搜索（简单实现）
-            return name.includes(query) || repo.includes(query) ||
-                   matchPinyin(r.name, query);
-        });
+// 筛选、拼音首字母搜索与排序都在服务器端完成，条件变化时从第一页重新加载
+function listQueryParams() {
+    const params = new URLSearchParams();
+    const query = searchQuery.trim();
+    if (query) params.set('q', query);
+    if (document.getElementById('updatedOnlyToggle').classList.contains('active')) {
+        params.set('updated_only', '1');
     }
-
-    filteredRows = rows;
-    renderView();
+    if (listSort) params.set('sort', listSort);
+    return params;
 }
 
-// 简单的拼音首字母匹配（仅支持常见汉字）
-function matchPinyin(name, query) {
-    if (!name) return false;
-    // 这里可以接入完整的拼音库，暂时用简化版
-    const pinyinMap = {
-        '陈': 'c', '李': 'l', '张': 'z', '王': 'w', '刘': 'l', '黄': 'h',
-        '周': 'z', '吴': 'w', '郑': 'z', '徐': 'x', '孙': 's', '马': 'm',
-        '朱': 'z', '胡': 'h', '郭': 'g', '何': 'h', '高': 'g', '林': 'l',
-        '罗': 'l', '郑': 'z', '梁': 'l', '谢': 'x', '宋': 's', '唐': 't',
-        '许': 'x', '韩': 'h', '冯': 'f', '邓': 'd', '曹': 'c', '彭': 'p',
-        '曾': 'z', '萧': 'x', '田': 't', '董': 'd', '袁': 'y', '潘': 'p',
-        '于': 'y', '蒋': 'j', '蔡': 'c', '余': 'y', '杜': 'd', '叶': 'y',
-        '程': 'c', '苏': 's', '魏': 'w', '吕': 'l', '丁': 'd', '任': 'r',
-        '沈': 's', '姚': 'y', '卢': 'l', '姜': 'j', '崔': 'c', '钟': 'z',
-        '谭': 't', '陆': 'l', '汪': 'w', '范': 'f', '金': 'j', '石': 's',
-        '廖': 'l', '贾': 'j', '夏': 'x', '韦': 'w', '付': 'f', '方': 'f',
-        '白': 'b', '邹': 'z', '孟': 'm', '熊': 'x', '秦': 'q', '邱': 'q',
-        '江': 'j', '尹': 'y', '薛': 'x', '闫': 'y', '段': 'd', '雷': 'l',
-        '侯': 'h', '龙': 'l', '史': 's', '陶': 't', '黎': 'l', '贺': 'h',
-        '顾': 'g', '毛': 'm', '郝': 'h', '龚': 'g', '邵': 's', '万': 'w',
-        '钱': 'q', '严': 'y', '覃': 'q', '武': 'w', '戴': 'd', '莫': 'm',
-        '孔': 'k', '向': 'x'
-    };
-
-    const initials = name.split('').map(char => pinyinMap[char] || '').join('');
-    return initials.includes(query);
+function applyFilters() {
+    listETag = null;
+    allRows = [];
+    fetchList();
 }
 
 function handleSearch(event) {
     searchQuery = event.target.value;
-    applyFilters();
+    if (searchTimer) clearTimeout(searchTimer);
+    searchTimer = setTimeout(() => {
+        searchTimer = null;
+        applyFilters();
+    }, SEARCH_DEBOUNCE);
 
     // 显示/隐藏清除按钮
     const clearBtn = document.getElementById('searchClearBtn');
     if (clearBtn) {
         clearBtn.style.display = searchQuery.trim() ? 'flex' : 'none';
     }
+}
 
-    // 显示搜索结果统计
-    const resultCount = filteredRows.length;
+// 显示搜索结果统计
+function updateSearchResult() {
+    const resultCount = listTotal;
     const searchResult = document.getElementById('searchResult');
     if (searchQuery.trim() && searchResult) {
         searchResult.textContent = `找到 ${resultCount} 条结果`;
@@ -188,6 +179,8 @@ function handleSearch(event) {
 
 function clearSearch() {
     searchQuery = '';
+    if (searchTimer) clearTimeout(searchTimer);
+    searchTimer = null;
     const searchInput = document.getElementById('searchInput');
     if (searchInput) searchInput.value = '';
 
@@ -200,28 +193,153 @@ function clearSearch() {
 }
 
 // Data Loading
+// 刷新：已加载过行时先用 ?since= 只取变化并合并进已加载的行；
+// 变化会改变行的顺序或筛选结果时，才重新加载已加载的全部行
 async function fetchList() {
     try {
-        const res = await fetch(API.LIST);
+        if (listVersion && allRows.length && await fetchListChanges()) return;
+        await fetchListWindow();
+    } catch (e) {
+        console.error('Failed to load data:', e);
+    }
+}
+
+// 取 listVersion 之后的变化；已处理（没有变化、已合并或已过时）时返回 true
+async function fetchListChanges() {
+    const seq = ++listRequestSeq;
+    const res = await fetch(`${API.LIST}?since=${encodeURIComponent(listVersion)}`, {cache: 'no-store'});
+    if (seq !== listRequestSeq) return true;
+    if (res.status === 304) {
+        document.getElementById('lastLoaded').textContent = new Date().toLocaleTimeString('zh-CN');
+        return true;
+    }
+    if (!res.ok) throw new Error('Failed to fetch');
+    const delta = await res.json();
+    if (seq !== listRequestSeq) return true;
+    const rows = mergeListChanges(allRows, delta);
+    if (!rows) return false;
+
+    allRows = rows;
+    filteredRows = allRows;
+    listVersion = delta.version;
+    // 分页响应的 ETag 已对不上，下次整页重新加载时不带 If-None-Match
+    listETag = null;
+    renderView();
+    updateStats(delta.summary);
+    return true;
+}
+
+// 当前筛选、搜索与排序依赖的行字段；这些字段变化的行可能进出结果或换位置
+function listDependentFields() {
+    const fields = [];
+    if (searchQuery.trim()) fields.push('name', 'repo');
+    if (document.getElementById('updatedOnlyToggle').classList.contains('active')) {
+        fields.push('updated_since_view');
+    }
+    if (listSort) fields.push(listSort === 'updated' ? 'updated_since_view' : listSort);
+    return fields;
+}
+
+// 把 /api/list?since= 的增量合并进已加载的行，返回新的行列表；
+// 名单增删改名（order）、完整列表（full），或变化的行会进出当前结果、改变排序位置时返回 null
+function mergeListChanges(rows, delta) {
+    if (delta.full || delta.order || delta.deleted.length) return null;
+    const fields = listDependentFields();
+    const loaded = new Map(rows.map(r => [r.name, r]));
+    const fits = delta.rows.every(row => {
+        const old = loaded.get(row.name);
+        // 没有筛选和排序时已加载的行是名单的前几行，顺序不变时其他行的变化与页面无关
+        if (!old) return fields.length === 0;
+        return fields.every(field => old[field] === row[field]);
+    });
+    if (!fits) return null;
+    const changed = new Map(delta.rows.map(r => [r.name, r]));
+    return rows.map(r => changed.get(r.name) || r);
+}
+
+// 重新加载已加载的全部行（至少一页）；每次最多取 LIST_PAGE_LIMIT_MAX 行，按 cursor 取完，
+// 第一页带上次的 ETag，数据没变时只收到 304，不重新渲染
+async function fetchListWindow() {
+    const wanted = Math.max(LIST_PAGE_SIZE, allRows.length);
+    const params = listQueryParams();
+    params.set('limit', Math.min(wanted, LIST_PAGE_LIMIT_MAX));
+    const headers = listETag ? {'If-None-Match': listETag} : {};
+    const seq = ++listRequestSeq;
+    const res = await fetch(`${API.LIST}?${params}`, {headers, cache: 'no-store'});
+    if (seq !== listRequestSeq) return;
+    if (res.status === 304) {
+        document.getElementById('lastLoaded').textContent = new Date().toLocaleTimeString('zh-CN');
+        return;
+    }
+    if (!res.ok) throw new Error('Failed to fetch');
+    const etag = res.headers.get('ETag');
+    let data = await res.json();
+    let rows = data.rows;
+    while (data.next_cursor && rows.length < wanted) {
+        params.set('cursor', data.next_cursor);
+        params.set('limit', Math.min(wanted - rows.length, LIST_PAGE_LIMIT_MAX));
+        const more = await fetch(`${API.LIST}?${params}`, {cache: 'no-store'});
+        if (!more.ok) throw new Error('Failed to fetch');
+        const page = await more.json();
+        if (seq !== listRequestSeq) return;
+        if (page.version !== data.version) {
+            // 分页取的过程中数据变了，从第一页重新取
+            listETag = null;
+            return fetchListWindow();
+        }
+        rows = rows.concat(page.rows);
+        data = page;
+    }
+    if (seq !== listRequestSeq) return;
+
+    listETag = etag;
+    allRows = rows;
+    applyListPage(data);
+}
+
+// 加载下一页并追加；翻页期间数据变了就从第一页重新加载
+async function loadMore() {
+    if (!listCursor) return;
+    try {
+        const params = listQueryParams();
+        params.set('limit', LIST_PAGE_SIZE);
+        params.set('cursor', listCursor);
+        const seq = ++listRequestSeq;
+        const res = await fetch(`${API.LIST}?${params}`, {cache: 'no-store'});
         if (!res.ok) throw new Error('Failed to fetch');
         const data = await res.json();
-
-        allRows = data;
-        applyFilters();
-        updateStats();
+        if (seq !== listRequestSeq) return;
+        if (data.version !== listVersion) {
+            listETag = null;
+            await fetchListWindow();
+            return;
+        }
+        allRows = allRows.concat(data.rows);
+        applyListPage(data);
     } catch (e) {
-        console.error('Failed to load data:', e);
+        console.error('Failed to load more:', e);
     }
 }
 
-function updateStats() {
-    const total = allRows.length;
-    const updated = allRows.filter(r => r.updated_since_view).length;
-    const avgScore = total > 0 ? (allRows.reduce((sum, r) => sum + (r.avg_score || 0), 0) / total).toFixed(1) : '0';
+function applyListPage(data) {
+    listVersion = data.version;
+    listCursor = data.next_cursor;
+    listTotal = data.total;
+    filteredRows = allRows;
+    renderView();
+    updateStats(data.summary);
+    updateSearchResult();
+    const loadMoreBtn = document.getElementById('loadMoreBtn');
+    if (loadMoreBtn) {
+        loadMoreBtn.style.display = listCursor ? '' : 'none';
+        loadMoreBtn.textContent = `加载更多（${allRows.length}/${listTotal}）`;
+    }
+}
 
-    document.getElementById('totalCount').textContent = total;
-    document.getElementById('updatedCount').textContent = updated;
-    document.getElementById('avgScore').textContent = avgScore;
+function updateStats(summary) {
+    document.getElementById('totalCount').textContent = summary.total;
+    document.getElementById('updatedCount').textContent = summary.updated;
+    document.getElementById('avgScore').textContent = summary.avg_score.toFixed(1);
     document.getElementById('lastLoaded').textContent = new Date().toLocaleTimeString('zh-CN');
 }
 
@@ -526,8 +644,9 @@ async function handleScoreChange(input) {
             if (row) {
                 row.scores[phase] = score;
                 row.avg_score = row.scores.reduce((a, b) => a + b, 0) / 5;
-                updateStats();
             }
+            // 统计与排序由服务器计算
+            scheduleEventRefresh();
             showStatus('settingsStatus', `✓ ${name} 的${PHASE_LABELS[phase]}评分已保存`, 'success', 2000);
         } else {
             throw new Error('Save failed');
@@ -591,6 +710,7 @@ async function saveStudent() {
         } else {
             const errorMsg = data.error === 'name exists' ? '姓名已存在' :
                 data.error === 'repo exists' ? '仓库已存在' :
+                data.error === 'invalid repo' ? 'git 镜像模式下仓库地址须为 https://github.com/用户名/仓库' :
                     data.error === 'not found' ? '学员不存在' : '操作失败';
             showStatus('studentStatus', errorMsg, 'error');
         }
@@ -639,9 +759,9 @@ async function markViewed(name, repo) {
                 row.updated_since_view = false;
                 row.last_viewed_at = new Date().toISOString();
             }
-            // 重新应用过滤和渲染
-            applyFilters();
-            updateStats();
+            renderView();
+            // 重新取当前页（"仅显示已更新"时该学员会移出列表）
+            fetchList();
         }
     } catch (e) {
         console.error('Failed to mark as viewed:', e);
@@ -753,9 +873,61 @@ async function loadSettings() {
 }
 
 function setRefreshInterval(seconds) {
+    refreshSeconds = seconds;
     document.getElementById('refreshLabel').textContent = seconds;
     if (refreshTimer) clearInterval(refreshTimer);
-    refreshTimer = setInterval(fetchList, seconds * 1000);
+    refreshTimer = null;
+    // 事件流断开（或浏览器不支持）时才按间隔轮询
+    if (!eventsConnected) refreshTimer = setInterval(fetchList, seconds * 1000);
+}
+
+// 订阅 /api/events：有变化时立即增量刷新，连接期间停止轮询
+function connectEvents() {
+    if (!window.EventSource) return;
+    const source = new EventSource(API.EVENTS);
+    source.onopen = () => {
+        eventsConnected = true;
+        setRefreshInterval(refreshSeconds);
+        // 补上断开期间错过的变化
+        fetchList();
+    };
+    source.onerror = () => {
+        // EventSource 会自动重连，重连成功前退回轮询
+        if (!eventsConnected) return;
+        eventsConnected = false;
+        setRefreshInterval(refreshSeconds);
+    };
+    ['score', 'roster', 'state', 'data'].forEach(type => {
+        source.addEventListener(type, scheduleEventRefresh);
+    });
+    source.addEventListener('remarks', (e) => {
+        const {name} = JSON.parse(e.data);
+        refreshOpenDetails(name);
+    });
+}
+
+function scheduleEventRefresh() {
+    if (eventRefreshTimer) return;
+    eventRefreshTimer = setTimeout(() => {
+        eventRefreshTimer = null;
+        fetchList();
+    }, EVENT_REFRESH_DELAY);
+}
+
+// 其他页面修改了备注：正在查看该学员详情（且没有在编辑）时重新加载
+async function refreshOpenDetails(studentName) {
+    const modal = document.querySelector('.student-details-modal.show');
+    if (!modal || modal.dataset.student !== studentName) return;
+    const active = document.activeElement;
+    if (active && modal.contains(active) && active.matches('textarea')) return;
+    try {
+        const res = await fetch(API.STUDENT_DETAILS(studentName));
+        if (!res.ok) return;
+        const data = await res.json();
+        if (data.ok && document.body.contains(modal)) renderStudentDetails(modal, data);
+    } catch (e) {
+        console.error('Failed to refresh student details:', e);
+    }
 }
 
 // Theme Toggle
@@ -847,6 +1019,8 @@ function initEventListeners() {
     const importBtn = document.getElementById('importBtn');
     const updatedOnlyToggle = document.getElementById('updatedOnlyToggle');
     const searchInput = document.getElementById('searchInput');
+    const sortSelect = document.getElementById('sortSelect');
+    const loadMoreBtn = document.getElementById('loadMoreBtn');
 
     if (checkBtn) checkBtn.addEventListener('click', checkNow);
     if (exportCsvBtn) exportCsvBtn.addEventListener('click', exportCsv);
@@ -866,6 +1040,15 @@ function initEventListeners() {
             applyFilters();
         });
     }
+
+    if (sortSelect) {
+        sortSelect.addEventListener('change', function () {
+            listSort = this.value;
+            applyFilters();
+        });
+    }
+
+    if (loadMoreBtn) loadMoreBtn.addEventListener('click', loadMore);
 }
 
 // Initialize
@@ -876,6 +1059,7 @@ function init() {
     initAchievementsGuide();
     loadSettings();
     fetchList();
+    connectEvents();
 }
 
 // 成就指南功能
@@ -958,6 +1142,7 @@ function closeBadgesModal() {
 async function showStudentDetails(studentName) {
     const modal = document.createElement('div');
     modal.className = 'student-details-modal';
+    modal.dataset.student = studentName;
     modal.innerHTML = `
         <div class="student-details-content">
             <div class="student-details-header">
@@ -994,6 +1179,7 @@ async function showStudentDetails(studentName) {
         if (!data.ok) throw new Error(data.error || 'Unknown error');
 
         renderStudentDetails(modal, data);
+        scheduleDetailsRefresh(modal, studentName, data);
     } catch (e) {
         console.error('Failed to load student details:', e);
         modal.querySelector('.student-details-body').innerHTML = `
@@ -1006,6 +1192,30 @@ async function showStudentDetails(studentName) {
     }
 }
 
+// 服务端先返回本地缓存的提交历史并在后台同步；同步未完成时隔几秒重新拉取，直到完成或弹窗关闭
+function scheduleDetailsRefresh(modal, studentName, data, attempt = 1) {
+    if (!data.commits_refreshing || attempt > DETAILS_REFRESH_ATTEMPTS) return;
+    setTimeout(async () => {
+        if (!document.body.contains(modal) || !modal.classList.contains('show')) return;
+        // 正在编辑备注时先不重绘，避免丢失输入
+        const active = document.activeElement;
+        if (active && modal.contains(active) && active.matches('textarea')) {
+            scheduleDetailsRefresh(modal, studentName, data, attempt + 1);
+            return;
+        }
+        try {
+            const res = await fetch(API.STUDENT_DETAILS(studentName));
+            if (!res.ok) return;
+            const next = await res.json();
+            if (!next.ok || !document.body.contains(modal)) return;
+            renderStudentDetails(modal, next);
+            scheduleDetailsRefresh(modal, studentName, next, attempt + 1);
+        } catch (e) {
+            console.error('Failed to refresh student details:', e);
+        }
+    }, DETAILS_REFRESH_DELAY);
+}
+
 function renderStudentDetails(modal, data) {
     const { student, commits, commit_frequency, score_trend, score_history, remarks } = data;
 
@@ -1112,6 +1322,9 @@ function renderStudentDetails(modal, data) {
             <!-- 提交历史时间轴 -->
             <div class="details-section">
                 <h4 class="section-title">⏰ 提交历史 (最近30条)</h4>
+                <div class="commits-freshness">
+                    ${data.commits_refreshing ? '🔄 正在同步最新提交… ' : ''}同步于 ${formatDate(data.commits_synced_at)}
+                </div>
                 <div class="commit-timeline">
                     ${commits.length > 0 ? commits.map(commit => `
                         <div class="timeline-item">
@@ -1,11 +1,18 @@
 const API = {
-    LEADERBOARD: '/api/leaderboard'
+    LEADERBOARD: '/api/leaderboard',
+    EVENTS: '/api/events'
 };
 
+const LEADERBOARD_POLL_SECONDS = 60; // 事件流不可用时的轮询间隔
+const EVENT_REFRESH_DELAY = 300; // 合并一连串事件后再刷新（毫秒）
+
 let currentSort = 'avg_score';
 let leaderboardData = [];
 let filteredData = [];
 let searchQuery = '';
+let leaderboardCache = {}; // sortBy -> {etag, data}，切换排序时用 If-None-Match 复用
+let pollTimer = null;
+let eventRefreshTimer = null;
 
 // Utility Functions
 function truncateUrl(url) {
@@ -137,10 +144,18 @@ function updateThemeToggleButton(theme) {
 // Load Leaderboard Data
 async function loadLeaderboard(sortBy = 'avg_score') {
     try {
-        const res = await fetch(`${API.LEADERBOARD}?sort_by=${sortBy}`);
-        if (!res.ok) throw new Error('Failed to fetch leaderboard');
-
-        leaderboardData = await res.json();
+        const cached = leaderboardCache[sortBy];
+        const headers = cached ? {'If-None-Match': cached.etag} : {};
+        const res = await fetch(`${API.LEADERBOARD}?sort_by=${sortBy}`, {headers, cache: 'no-store'});
+        if (res.status === 304) {
+            // 排名没变：直接用上次的数据
+            leaderboardData = cached.data;
+        } else {
+            if (!res.ok) throw new Error('Failed to fetch leaderboard');
+            leaderboardData = await res.json();
+            const etag = res.headers.get('ETag');
+            if (etag) leaderboardCache[sortBy] = {etag, data: leaderboardData};
+        }
         currentSort = sortBy;
         applyFilters(); // 应用搜索过滤
 
@@ -341,6 +356,38 @@ function initRefreshButton() {
     });
 }
 
+// 排名随打分、名单变化与提交数实时更新；事件流断开（或浏览器不支持）时才轮询
+function startPolling() {
+    if (!pollTimer) pollTimer = setInterval(() => loadLeaderboard(currentSort), LEADERBOARD_POLL_SECONDS * 1000);
+}
+
+function stopPolling() {
+    if (pollTimer) clearInterval(pollTimer);
+    pollTimer = null;
+}
+
+function connectEvents() {
+    if (!window.EventSource) {
+        startPolling();
+        return;
+    }
+    const source = new EventSource(API.EVENTS);
+    source.onopen = () => {
+        stopPolling();
+        loadLeaderboard(currentSort);
+    };
+    source.onerror = startPolling;
+    ['score', 'roster', 'state', 'data'].forEach(type => {
+        source.addEventListener(type, () => {
+            if (eventRefreshTimer) return;
+            eventRefreshTimer = setTimeout(() => {
+                eventRefreshTimer = null;
+                loadLeaderboard(currentSort);
+            }, EVENT_REFRESH_DELAY);
+        });
+    });
+}
+
 // Initialize
 function init() {
     console.log('Initializing leaderboard page...');
@@ -348,6 +395,7 @@ function init() {
     initSortButtons();
     initRefreshButton();
     loadLeaderboard(currentSort);
+    connectEvents();
 }
 
 if (document.readyState === 'loading') {
@@ -6,6 +6,13 @@ const API = {
 const DEFAULT_SETTINGS = {
     client_refresh_seconds: 60,
     server_poll_interval_seconds: 300,
+    poll_max_interval_seconds: 21600,
+    poll_concurrency: 8,
+    fetch_backend: 'rest',
+    graphql_batch_size: 50,
+    poll_engine: 'thread',
+    async_poll_concurrency: 100,
+    negative_cache_seconds: 3600,
     instructor_name: '',
     instructor_email: '',
     notify_updates: true,
@@ -94,6 +101,13 @@ async function loadSettings() {
         // Apply server settings
         document.getElementById('clientRefresh').value = settings.client_refresh_seconds;
         document.getElementById('serverPoll').value = settings.server_poll_interval_seconds;
+        document.getElementById('pollMaxInterval').value = settings.poll_max_interval_seconds;
+        document.getElementById('pollConcurrency').value = settings.poll_concurrency;
+        document.getElementById('fetchBackend').value = settings.fetch_backend || 'rest';
+        document.getElementById('graphqlBatchSize').value = settings.graphql_batch_size;
+        document.getElementById('pollEngine').value = settings.poll_engine || 'thread';
+        document.getElementById('asyncPollConcurrency').value = settings.async_poll_concurrency;
+        document.getElementById('negativeCache').value = settings.negative_cache_seconds;
 
         // Apply instructor settings
         document.getElementById('instructorName').value = settings.instructor_name || '';
@@ -140,7 +154,14 @@ async function saveAllSettings() {
         // Gather server settings
         const serverSettings = {
             client_refresh_seconds: parseInt(document.getElementById('clientRefresh').value),
-            server_poll_interval_seconds: parseInt(document.getElementById('serverPoll').value)
+            server_poll_interval_seconds: parseInt(document.getElementById('serverPoll').value),
+            poll_max_interval_seconds: parseInt(document.getElementById('pollMaxInterval').value),
+            poll_concurrency: parseInt(document.getElementById('pollConcurrency').value),
+            fetch_backend: document.getElementById('fetchBackend').value,
+            graphql_batch_size: parseInt(document.getElementById('graphqlBatchSize').value),
+            poll_engine: document.getElementById('pollEngine').value,
+            async_poll_concurrency: parseInt(document.getElementById('asyncPollConcurrency').value),
+            negative_cache_seconds: parseInt(document.getElementById('negativeCache').value)
         };
 
         // Gather instructor and local settings
@@ -193,6 +214,13 @@ function resetSettings() {
         // Reset to default values
         document.getElementById('clientRefresh').value = DEFAULT_SETTINGS.client_refresh_seconds;
         document.getElementById('serverPoll').value = DEFAULT_SETTINGS.server_poll_interval_seconds;
+        document.getElementById('pollMaxInterval').value = DEFAULT_SETTINGS.poll_max_interval_seconds;
+        document.getElementById('pollConcurrency').value = DEFAULT_SETTINGS.poll_concurrency;
+        document.getElementById('fetchBackend').value = DEFAULT_SETTINGS.fetch_backend;
+        document.getElementById('graphqlBatchSize').value = DEFAULT_SETTINGS.graphql_batch_size;
+        document.getElementById('pollEngine').value = DEFAULT_SETTINGS.poll_engine;
+        document.getElementById('asyncPollConcurrency').value = DEFAULT_SETTINGS.async_poll_concurrency;
+        document.getElementById('negativeCache').value = DEFAULT_SETTINGS.negative_cache_seconds;
         document.getElementById('instructorName').value = '';
         document.getElementById('instructorEmail').value = '';
         document.getElementById('githubToken').value = '';
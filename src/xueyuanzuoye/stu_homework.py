@@ -1,13 +1,39 @@
 import os
 import json
+import asyncio
+import atexit
 import threading
 import time
+import random
 from datetime import datetime, timezone
 from urllib.parse import urlparse
 import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+try:
+    import aiohttp  # 可选依赖：仅 asyncio 轮询引擎需要
+except ImportError:
+    aiohttp = None
+try:
+    import fcntl  # 跨进程文件锁；Windows 上没有，只剩进程内的线程锁
+except ImportError:
+    fcntl = None
 from flask import Flask, jsonify, request, send_file, redirect, abort, make_response
 import io
 import csv
+import re
+import heapq
+import hmac
+import hashlib
+import subprocess
+import sqlite3
+import tempfile
+import copy
+import queue
+from collections import deque
+import functools
+from contextlib import contextmanager, ExitStack
 from pathlib import Path
 
 # 基本路径（兼容重构后的位置）
@@ -16,12 +42,8 @@ PACKAGE_DIR = Path(__file__).resolve().parent
 # REPO_ROOT: two levels up from package dir (repo root)
 REPO_ROOT = PACKAGE_DIR.parents[1] if len(PACKAGE_DIR.parents) > 1 else PACKAGE_DIR
 
-# 缓存配置
-CACHE_DURATION = 60  # API 响应缓存60秒
-api_cache = {
-    'leaderboard': {'data': None, 'timestamp': 0},
-    'list': {'data': None, 'timestamp': 0}
-}
+# 响应缓存：{key: {'data', 'generation'}}，数据代数（data_generation）变化后自动失效
+api_cache = {}
 cache_lock = threading.Lock()
 
 def resolve_data_file(name: str) -> str:
@@ -57,12 +79,115 @@ STUDENTS_FILE = resolve_data_file('students.json')
 STATE_FILE = resolve_data_file('state.json')
 HTML_FILE = resolve_static_file('static/homework.html')
 SETTINGS_FILE = resolve_data_file('settings.json')
+REMARKS_FILE = resolve_data_file('remarks.json')
+SCORE_HISTORY_FILE = resolve_data_file('score_history.json')
+
+# 存储后端：json（默认，上面的 JSON 文件）或 sqlite（单个 WAL 模式数据库，按学员读写单行）
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "json")
+SQLITE_DB = os.environ.get("SQLITE_DB")  # 数据库路径，默认为 state.json 旁的 homework.db
+SQLITE_DB_NAME = "homework.db"
+REPO_META_CACHE_SIZE = 8192  # 缓存解析结果（owner/repo、头像地址）的仓库地址数
+STUDENTS_SCHEMA_VERSION = 2  # 学员数据结构版本；低于该版本的数据由 migrate_students_schema() 一次性规范化
+SCORE_HISTORY_LIMIT = 100  # 每个学员保留的分数变更记录数
+SCORE_JOURNAL_COMPACT_MIN = 1000  # 分数历史日志中过期行超过该数（且多于有效行）时压缩
+STATE_FLUSH_INTERVAL = 5  # 后台检查期间合并 state 写入，最多每隔该秒数落盘一次
+USER_STATE_FIELDS = ("last_viewed_at",)  # state 中由用户操作写入、后台检查不应覆盖的字段
 
 GITHUB_TOKEN = os.environ.get("GITHUB_TOKEN")  # 可选，放在环境变量中以提高配额
+GITHUB_API_URL = os.environ.get("GITHUB_API_URL", "https://api.github.com").rstrip("/")
+GITHUB_GRAPHQL_URL = os.environ.get("GITHUB_GRAPHQL_URL", f"{GITHUB_API_URL}/graphql")
+HTTP_CACHE_NAME = "http_cache.json"  # 条件请求校验缓存，与 state.json 放在同一目录
+COMMIT_CACHE_NAME = "commit_cache.json"  # 本地提交历史，与 state.json 放在同一目录
+COMMIT_CACHE_LIMIT = 100  # 每个仓库保留的最近提交数
+COMMIT_PAGE_SIZE = 100  # 增量拉取提交历史时每页的提交数（GitHub 上限）
+COMMIT_SINCE_OVERLAP = 24 * 3600  # 增量拉取时 since 往前多取的秒数，重复的提交按 sha 去重
+GITHUB_WEBHOOK_SECRET = os.environ.get("GITHUB_WEBHOOK_SECRET")  # push webhook 签名密钥
+WEBHOOK_COMMITS_LIMIT = 20  # GitHub push 事件最多携带的提交数
+WEBHOOK_DELIVERY_HISTORY = 1000  # 记住的最近 webhook 投递 ID 数，GitHub 重投同一事件时跳过
+GIT_MIRROR_DIR = os.environ.get("GIT_MIRROR_DIR")  # git 镜像目录，默认为 state.json 旁的 git_mirrors/
+GIT_TIMEOUT = 120  # 单次 git clone / fetch 的超时（秒）
+ALLOW_FILE_REPOS = os.environ.get("ALLOW_FILE_REPOS") == "1"  # 允许 file:// 仓库地址，仅供测试 git 镜像模式
 POLL_INTERVAL = 300  # 5 分钟轮询一次
+POLL_CONCURRENCY = 8  # 后台抓取时同时检查的仓库数
+GRAPHQL_BATCH_SIZE = 50  # GraphQL 后端每次查询的仓库数
+POLL_MAX_INTERVAL = 6 * 3600  # 长期无推送 / 出错仓库的最长检查间隔
+POLL_MIN_WAKE = 5  # 后台轮询两次唤醒之间的最短间隔（秒）
+ASYNC_POLL_CONCURRENCY = 100  # asyncio 引擎同时在途的仓库检查数
+ASYNC_REQUEST_TIMEOUT = 10  # asyncio 引擎单个请求超时（秒）
+RATE_LIMIT_RESERVE = 20  # 为页面操作（详情、标记已查看）保留的 GitHub 配额
+RATE_LIMIT_PACE_RATIO = 0.2  # 剩余配额低于上限的该比例时，把请求均匀分布到重置前
+RATE_LIMIT_MAX_WAIT = 30  # 单次节流等待超过该秒数则推迟到下一轮
+REST_CALLS_PER_REPO = 3  # REST 后端检查一个仓库最多需要的请求数
+RETRY_ATTEMPTS = 3  # 超时 / 连接错误 / 5xx 时的最多尝试次数（含首次）
+RETRY_BASE_DELAY = 0.5  # 重试退避基数（秒），第 n 次重试在 [0, base*2^n] 内随机等待
+RETRY_STATUSES = (500, 502, 503, 504)
+CIRCUIT_FAILURE_THRESHOLD = 5  # 连续失败该次数后断路器打开
+CIRCUIT_COOLDOWN = 60  # 断路器打开后快速失败的时长（秒），之后放行一次试探请求
+NEGATIVE_STATUSES = (404, 451)  # 仓库不存在 / 被屏蔽：结果缓存一段时间，不再反复请求
+NEGATIVE_CACHE_SECONDS = 3600
+EVENTS_KEEPALIVE_SECONDS = 15  # /api/events 无事件时发送心跳（并检查其他进程的写入）的间隔
+EVENTS_QUEUE_SIZE = 100  # 每个事件流连接最多积压的事件数，超过则断开让浏览器重连
+EVENTS_RETRY_MS = 5000  # 浏览器断线重连间隔
+EVENT_NAMES_LIMIT = 50  # state 事件最多列出的学员姓名数
+LIST_HISTORY_LIMIT = 200  # /api/list?since= 能追溯的数据代数个数，更早的版本返回完整列表
+LIST_PAGE_LIMIT_MAX = 500  # /api/list 分页时每页最多行数
+LIST_QUERY_CACHE_SIZE = 64  # 每个列表快照缓存的筛选/排序结果个数
+LIST_PAGE_PARAMS = ("limit", "cursor", "q", "updated_only", "sort", "order")  # 分页 / 筛选参数，不能与 since 同时使用
 DEFAULT_SETTINGS = {
     "server_poll_interval_seconds": POLL_INTERVAL,
     "client_refresh_seconds": 60,
+    "poll_concurrency": POLL_CONCURRENCY,
+    "fetch_backend": "rest",
+    "graphql_batch_size": GRAPHQL_BATCH_SIZE,
+    "poll_engine": "thread",
+    "async_poll_concurrency": ASYNC_POLL_CONCURRENCY,
+    "poll_max_interval_seconds": POLL_MAX_INTERVAL,
+    "negative_cache_seconds": NEGATIVE_CACHE_SECONDS,
+}
+# 各项数值设置的取值范围 (min, max)
+SETTING_RANGES = {
+    "server_poll_interval_seconds": (5, 3600),
+    "client_refresh_seconds": (5, 3600),
+    "poll_concurrency": (1, 64),
+    "graphql_batch_size": (1, 100),
+    "async_poll_concurrency": (1, 2000),
+    "poll_max_interval_seconds": (60, 7 * 24 * 3600),
+    "negative_cache_seconds": (0, 7 * 24 * 3600),
+}
+# 字符串类设置的可选值（第一个为默认值）
+SETTING_CHOICES = {
+    "fetch_backend": ("rest", "graphql", "git"),
+    "poll_engine": ("thread", "asyncio"),
+}
+
+# 常见姓氏的拼音首字母，与前端原来的 matchPinyin 一致
+PINYIN_INITIALS = {
+    '陈': 'c', '李': 'l', '张': 'z', '王': 'w', '刘': 'l', '黄': 'h',
+    '周': 'z', '吴': 'w', '郑': 'z', '徐': 'x', '孙': 's', '马': 'm',
+    '朱': 'z', '胡': 'h', '郭': 'g', '何': 'h', '高': 'g', '林': 'l',
+    '罗': 'l', '梁': 'l', '谢': 'x', '宋': 's', '唐': 't',
+    '许': 'x', '韩': 'h', '冯': 'f', '邓': 'd', '曹': 'c', '彭': 'p',
+    '曾': 'z', '萧': 'x', '田': 't', '董': 'd', '袁': 'y', '潘': 'p',
+    '于': 'y', '蒋': 'j', '蔡': 'c', '余': 'y', '杜': 'd', '叶': 'y',
+    '程': 'c', '苏': 's', '魏': 'w', '吕': 'l', '丁': 'd', '任': 'r',
+    '沈': 's', '姚': 'y', '卢': 'l', '姜': 'j', '崔': 'c', '钟': 'z',
+    '谭': 't', '陆': 'l', '汪': 'w', '范': 'f', '金': 'j', '石': 's',
+    '廖': 'l', '贾': 'j', '夏': 'x', '韦': 'w', '付': 'f', '方': 'f',
+    '白': 'b', '邹': 'z', '孟': 'm', '熊': 'x', '秦': 'q', '邱': 'q',
+    '江': 'j', '尹': 'y', '薛': 'x', '闫': 'y', '段': 'd', '雷': 'l',
+    '侯': 'h', '龙': 'l', '史': 's', '陶': 't', '黎': 'l', '贺': 'h',
+    '顾': 'g', '毛': 'm', '郝': 'h', '龚': 'g', '邵': 's', '万': 'w',
+    '钱': 'q', '严': 'y', '覃': 'q', '武': 'w', '戴': 'd', '莫': 'm',
+    '孔': 'k', '向': 'x',
+}
+
+# ?sort= 可用的字段 -> (排序键, 默认是否倒序)
+LIST_SORT_FIELDS = {
+    "name": (lambda r: r["name"] or "", False),
+    "avg_score": (lambda r: r["avg_score"], True),
+    "commits_count": (lambda r: r["commits_count"] or 0, True),
+    "last_known_pushed_at": (lambda r: r["last_known_pushed_at"] or "", True),
+    "updated": (lambda r: r["updated_since_view"], True),
 }
 
 # 时间阶段标签
@@ -90,14 +215,136 @@ def init_scores():
     return [0, 0, 0, 0, 0]
 
 
-def load_students():
+# 解析结果缓存：{path: ((st_ino, st_mtime_ns, st_size), data)}
+# 文件签名不变时直接复用上次解析的对象；外部编辑或 os.replace 都会改变签名。
+_parsed_cache = {}
+_parsed_cache_lock = threading.Lock()
+parsed_cache_stats = {"hits": 0, "misses": 0}
+
+
+def file_signature(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def read_json_cached(path):
+    """读取并解析 JSON 文件，文件签名未变时返回缓存的对象（不再解析）
+
+    返回的对象由所有调用方共享，不要原地修改；需要修改时先复制。
+    文件不存在时抛出 FileNotFoundError，解析失败时抛出 json.JSONDecodeError。
+    """
+    key = str(path)
+    signature = file_signature(key)
+    if signature is None:
+        raise FileNotFoundError(key)
+    with _parsed_cache_lock:
+        cached = _parsed_cache.get(key)
+        if cached and cached[0] == signature:
+            parsed_cache_stats["hits"] += 1
+            return cached[1]
+        parsed_cache_stats["misses"] += 1
+    with open(key, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    # 读取期间文件若被替换，缓存的是新内容配旧签名，下次读取会因签名不同而重新解析
+    with _parsed_cache_lock:
+        _parsed_cache[key] = (signature, data)
+    return data
+
+
+def forget_parsed(path):
+    with _parsed_cache_lock:
+        _parsed_cache.pop(str(path), None)
+
+
+# 数据文件锁：{path: {"lock": RLock, "depth": 同一线程的嵌套层数, "fd": 持有 flock 的 .lock 文件}}
+_file_locks = {}
+_file_locks_guard = threading.Lock()
+
+
+@contextmanager
+def data_file_lock(path):
+    """数据文件的排他锁，同一线程可重入
+
+    进程内用 RLock；进程间对旁边的 <文件名>.lock 加 fcntl.flock（数据文件本身会被
+    os.replace 换掉，不能直接锁它）。多个 worker 进程共享同一数据目录时，包在锁里的
+    读-改-写不会互相覆盖。
+    """
+    key = str(path)
+    with _file_locks_guard:
+        holder = _file_locks.setdefault(key, {"lock": threading.RLock(), "depth": 0, "fd": None})
+    with holder["lock"]:
+        if holder["depth"] == 0 and fcntl is not None:
+            Path(key).parent.mkdir(parents=True, exist_ok=True)
+            fd = os.open(key + ".lock", os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            except BaseException:
+                os.close(fd)
+                raise
+            holder["fd"] = fd
+        holder["depth"] += 1
+        try:
+            yield
+        finally:
+            holder["depth"] -= 1
+            if holder["depth"] == 0 and holder["fd"] is not None:
+                # 关闭文件即释放 flock
+                os.close(holder["fd"])
+                holder["fd"] = None
+
+
+def atomic_write_json(path, data, indent=None):
+    """先写同目录下的临时文件再 os.replace，写到一半崩溃也不会留下半个文件；返回写入的字节数"""
+    return atomic_write_bytes(path, json.dumps(data, ensure_ascii=False, indent=indent).encode("utf-8"))
+
+
+# 进程的 umask，只能通过设置来读取，启动时读一次
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def new_file_mode(path):
+    """替换后文件应有的权限：沿用已有文件的，新文件与 open() 创建的一致（0666 & ~umask）"""
+    try:
+        return os.stat(path).st_mode & 0o7777
+    except OSError:
+        return 0o666 & ~_UMASK
+
+
+def atomic_write_bytes(path, payload):
+    p = Path(path)
+    if not p.parent.exists():
+        p.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=str(p.parent), prefix=f".{p.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            # mkstemp 总是创建 0600 的文件
+            if hasattr(os, "fchmod"):
+                os.fchmod(f.fileno(), new_file_mode(p))
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, str(p))
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+    forget_parsed(path)
+    return len(payload)
+
+
+def load_students_json():
     # If the students file doesn't exist, return an empty list so module import
     # or background threads do not crash after a layout change.
     if not Path(STUDENTS_FILE).exists():
         return []
     try:
-        with open(STUDENTS_FILE, "r", encoding="utf-8") as f:
-            data = json.load(f)
+        data = read_json_cached(STUDENTS_FILE)
     except json.JSONDecodeError as e:
         # Backup corrupt file and create a fresh empty students file to avoid API 500s
         try:
@@ -111,7 +358,7 @@ def load_students():
             if not p.parent.exists():
                 p.parent.mkdir(parents=True, exist_ok=True)
             with open(str(p), 'w', encoding='utf-8') as fw:
-                json.dump({"students": []}, fw, ensure_ascii=False, indent=2)
+                json.dump({"schema_version": STUDENTS_SCHEMA_VERSION, "students": []}, fw, ensure_ascii=False, indent=2)
             # debug output removed
         except Exception:
             # debug output removed
@@ -123,59 +370,414 @@ def load_students():
 
     # 支持两种结构：{ "students": [...] } 或直接列表
     if isinstance(data, dict) and "students" in data:
-        students = data["students"]
-    else:
-        students = data
-    # 确保每一项都有 scores 字段（5个阶段）
-    mutated = False
-    for s in students:
-        if not isinstance(s, dict):
-            continue
-        # 迁移旧的 score 字段到 scores 数组
-        if "score" in s and "scores" not in s:
-            s["scores"] = init_scores()
-            del s["score"]
-            mutated = True
-        elif "scores" not in s:
-            s["scores"] = init_scores()
-            mutated = True
-        else:
-            # 确保 scores 是长度为5的列表
-            if not isinstance(s["scores"], list) or len(s["scores"]) != 5:
-                s["scores"] = init_scores()
-                mutated = True
-            else:
-                # 规范化每个分数
-                normalized = [clamp_score(sc) for sc in s["scores"]]
-                if normalized != s["scores"]:
-                    s["scores"] = normalized
-                    mutated = True
-    if mutated:
-        save_students(students)
-    return students
+        return data["students"]
+    return data
+
+
+def normalize_student_record(s):
+    """规范化一条学员记录：旧 score 字段迁移为 scores，scores 补齐为 5 个阶段并限定范围；返回是否有改动"""
+    # 迁移旧的 score 字段到 scores 数组
+    if "score" in s and "scores" not in s:
+        s["scores"] = init_scores()
+        del s["score"]
+        return True
+    # 确保 scores 是长度为5的列表
+    if not isinstance(s.get("scores"), list) or len(s["scores"]) != 5:
+        s["scores"] = init_scores()
+        return True
+    # 规范化每个分数
+    normalized = [clamp_score(sc) for sc in s["scores"]]
+    if normalized != s["scores"]:
+        s["scores"] = normalized
+        return True
+    return False
+
+
+def save_students_json(students):
+    written = atomic_write_json(STUDENTS_FILE, {"schema_version": STUDENTS_SCHEMA_VERSION, "students": students}, indent=2)
+    bump_data_generation()
+    return written
+
+
+def load_state_json():
+    if not os.path.exists(STATE_FILE):
+        return {}
+    return read_json_cached(STATE_FILE)
+
+
+def save_state_json(state):
+    written = atomic_write_json(STATE_FILE, state, indent=2)
+    bump_data_generation()
+    return written
+
+
+# ==================== SQLite 存储 ====================
+# 每张表以学员姓名为主键，data 列保存与 JSON 文件中相同结构的对象。
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS students (
+    name TEXT PRIMARY KEY,
+    repo TEXT,
+    repo_key TEXT,
+    position INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_students_repo ON students(repo);
+CREATE INDEX IF NOT EXISTS idx_students_repo_key ON students(repo_key);
+CREATE INDEX IF NOT EXISTS idx_students_position ON students(position);
+CREATE TABLE IF NOT EXISTS state (
+    name TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS remarks (
+    name TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS score_history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_score_history_name ON score_history(name, id);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('generation', 0);
+"""
+
+# 学员与抓取状态的每次改动都让 meta.generation 加一，其他进程据此发现数据变化
+SQLITE_SCHEMA += "".join(
+    f"CREATE TRIGGER IF NOT EXISTS {table}_{op.lower()}_generation AFTER {op} ON {table} "
+    "BEGIN UPDATE meta SET value = value + 1 WHERE key = 'generation'; END;\n"
+    for table in ("students", "state") for op in ("INSERT", "UPDATE", "DELETE")
+)
+
+_sqlite_local = threading.local()
+_sqlite_ready = set()
+_sqlite_ready_lock = threading.Lock()
+
+
+def use_sqlite():
+    return STORAGE_BACKEND == "sqlite"
+
+
+def sqlite_path():
+    return SQLITE_DB or state_sibling_file(SQLITE_DB_NAME)
+
+
+def get_db():
+    """当前线程的 SQLite 连接；WAL 模式下读不阻塞写、写不阻塞读"""
+    path = sqlite_path()
+    conns = getattr(_sqlite_local, "conns", None)
+    if conns is None:
+        conns = _sqlite_local.conns = {}
+    conn = conns.get(path)
+    if conn is None:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        # isolation_level=None：自动提交，需要事务时由 db_transaction 显式 BEGIN
+        conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        with _sqlite_ready_lock:
+            if path not in _sqlite_ready:
+                conn.executescript(SQLITE_SCHEMA)
+                _sqlite_ready.add(path)
+        conns[path] = conn
+    return conn
+
+
+@contextmanager
+def db_transaction():
+    """写事务：BEGIN IMMEDIATE 先拿写锁，异常时回滚；已在事务中时直接并入外层事务"""
+    conn = get_db()
+    if conn.in_transaction:
+        yield conn
+        return
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+    # 提交后其他连接才看得到新数据，此时再让缓存失效
+    bump_data_generation()
+
+
+def student_row(student, position):
+    repo = student.get("repo") or ""
+    return (student.get("name"), repo, repo_meta(repo)["key"], position, json.dumps(student, ensure_ascii=False))
+
+
+def sqlite_load_students():
+    rows = get_db().execute("SELECT data FROM students ORDER BY position").fetchall()
+    return [json.loads(data) for (data,) in rows]
+
+
+def sqlite_save_students(students):
+    rows = [student_row(s, i) for i, s in enumerate(students) if isinstance(s, dict) and s.get("name")]
+    with db_transaction() as conn:
+        conn.execute("DELETE FROM students")
+        conn.executemany("INSERT OR REPLACE INTO students (name, repo, repo_key, position, data) VALUES (?, ?, ?, ?, ?)", rows)
+        conn.execute(f"PRAGMA user_version = {STUDENTS_SCHEMA_VERSION}")
+
+
+def sqlite_load_keyed(table):
+    rows = get_db().execute(f"SELECT name, data FROM {table}").fetchall()
+    return {name: json.loads(data) for name, data in rows}
+
+
+def sqlite_save_keyed(table, mapping):
+    rows = [(name, json.dumps(value, ensure_ascii=False)) for name, value in mapping.items()]
+    with db_transaction() as conn:
+        conn.execute(f"DELETE FROM {table}")
+        conn.executemany(f"INSERT INTO {table} (name, data) VALUES (?, ?)", rows)
+
+
+def sqlite_get_keyed(table, name):
+    row = get_db().execute(f"SELECT data FROM {table} WHERE name = ?", (name,)).fetchone()
+    return json.loads(row[0]) if row else None
+
+
+def sqlite_put_keyed(table, entries):
+    rows = [(name, json.dumps(value, ensure_ascii=False)) for name, value in entries.items()]
+    with db_transaction() as conn:
+        conn.executemany(f"INSERT OR REPLACE INTO {table} (name, data) VALUES (?, ?)", rows)
+    return sum(len(data.encode("utf-8")) for _, data in rows)
+
+
+def sqlite_find_student(column, value):
+    row = get_db().execute(f"SELECT data FROM students WHERE {column} = ? ORDER BY position LIMIT 1", (value,)).fetchone()
+    return json.loads(row[0]) if row else None
+
+
+# ==================== 存储接口 ====================
+# 批量读写（列表、排行榜、导出、导入）用 load_* / save_*；
+# 单个学员的读写用 get_* / put_*，SQLite 后端下只读写一行。
+# JSON 后端的 load_* 返回共享的解析缓存，只读；get_* 返回可以修改的副本。
+
+@contextmanager
+def storage_write(*paths):
+    """包住一次完整的读-改-写，跨线程、跨进程互斥
+
+    JSON 后端锁住涉及的数据文件（data_file_lock，按路径排序加锁避免死锁）；
+    SQLite 后端开一个 BEGIN IMMEDIATE 事务，其中的 get_* / put_* 都在同一事务内。
+    """
+    if use_sqlite():
+        with db_transaction():
+            yield
+        return
+    with ExitStack() as stack:
+        for path in sorted({str(p) for p in paths}):
+            stack.enter_context(data_file_lock(path))
+        yield
+
+
+def load_students():
+    if use_sqlite():
+        return sqlite_load_students()
+    return load_students_json()
 
 
 def save_students(students):
-    p = Path(STUDENTS_FILE)
-    if not p.parent.exists():
-        p.parent.mkdir(parents=True, exist_ok=True)
-    with open(str(p), "w", encoding="utf-8") as f:
-        json.dump({"students": students}, f, ensure_ascii=False, indent=2)
+    if use_sqlite():
+        return sqlite_save_students(students)
+    return save_students_json(students)
+
+
+def students_schema_version():
+    """当前学员数据的结构版本（JSON 为 schema_version 字段，SQLite 为 PRAGMA user_version）"""
+    if use_sqlite():
+        return get_db().execute("PRAGMA user_version").fetchone()[0]
+    try:
+        data = read_json_cached(STUDENTS_FILE)
+    except Exception:
+        # 没有（或无法解析）学员文件，无需迁移
+        return STUDENTS_SCHEMA_VERSION
+    if isinstance(data, dict):
+        return data.get("schema_version", 1)
+    return 1
+
+
+def migrate_students_schema():
+    """把学员数据一次性升级到 STUDENTS_SCHEMA_VERSION（启动时与 scripts/migrate_schema.py 调用）
+
+    已是最新版本时直接返回 None；否则规范化全部记录并写回，返回改动的记录数。
+    """
+    if students_schema_version() >= STUDENTS_SCHEMA_VERSION:
+        return None
+    with storage_write(STUDENTS_FILE):
+        # 可能有其他进程刚完成迁移
+        if students_schema_version() >= STUDENTS_SCHEMA_VERSION:
+            return None
+        students = [dict(s) if isinstance(s, dict) else s for s in load_students()]
+        changed = sum(1 for s in students if isinstance(s, dict) and normalize_student_record(s))
+        save_students(students)
+    return changed
 
 
 def load_state():
-    if not os.path.exists(STATE_FILE):
-        return {}
-    with open(STATE_FILE, "r", encoding="utf-8") as f:
-        return json.load(f)
+    if use_sqlite():
+        return sqlite_load_keyed("state")
+    return load_state_json()
 
 
 def save_state(state):
-    p = Path(STATE_FILE)
-    if not p.parent.exists():
-        p.parent.mkdir(parents=True, exist_ok=True)
-    with open(str(p), "w", encoding="utf-8") as f:
-        json.dump(state, f, ensure_ascii=False, indent=2)
+    if use_sqlite():
+        return sqlite_save_keyed("state", state)
+    return save_state_json(state)
+
+
+# 学员索引：{"source": 建索引用的学员列表, "by_name" / "by_repo" / "by_key": -> 学员, "positions": 姓名 -> 下标}
+# JSON 后端的 load_students() 在文件未变时返回同一个列表对象，索引只在文件变化后重建一次
+_student_registry = {"source": None, "by_name": {}, "by_repo": {}, "by_key": {}, "positions": {}}
+_student_registry_lock = threading.Lock()
+
+
+def student_registry():
+    """当前学员列表的索引，单个学员的查找都是字典查找
+
+    by_repo 以原始仓库地址为键，by_key 以 canonical_repo 为键；同名（同仓库）时与
+    线性查找一样取第一个。返回的学员对象与 load_students() 共享，不要原地修改。
+    """
+    global _student_registry
+    students = load_students()
+    registry = _student_registry
+    if registry["source"] is students:
+        return registry
+    with _student_registry_lock:
+        if _student_registry["source"] is students:
+            return _student_registry
+        registry = {"source": students, "by_name": {}, "by_repo": {}, "by_key": {}, "positions": {}}
+        for i, s in enumerate(students):
+            if not isinstance(s, dict):
+                continue
+            name = s.get("name")
+            repo = s.get("repo")
+            if name and name not in registry["by_name"]:
+                registry["by_name"][name] = s
+                registry["positions"][name] = i
+            if repo:
+                registry["by_repo"].setdefault(repo, s)
+                key = repo_meta(repo)["key"]
+                if key:
+                    registry["by_key"].setdefault(key, s)
+        _student_registry = registry
+    return registry
+
+
+def get_student(name):
+    """按姓名查找学员，不存在时返回 None"""
+    if use_sqlite():
+        return sqlite_find_student("name", name)
+    return copy.deepcopy(student_registry()["by_name"].get(name))
+
+
+def get_student_by_repo(repo):
+    """按（规范化后的）仓库地址查找学员"""
+    if use_sqlite():
+        return sqlite_find_student("repo", repo)
+    return copy.deepcopy(student_registry()["by_repo"].get(repo))
+
+
+def get_student_by_repo_key(key):
+    """按 canonical_repo 得到的 owner/repo 查找学员（webhook 使用）"""
+    if use_sqlite():
+        return sqlite_find_student("repo_key", key)
+    return copy.deepcopy(student_registry()["by_key"].get(key))
+
+
+def put_student(student, old_name=None):
+    """新增或更新一个学员；old_name 与当前姓名不同时表示改名，保留原来的位置"""
+    key = old_name or student.get("name")
+    if use_sqlite():
+        with db_transaction() as conn:
+            row = conn.execute("SELECT position FROM students WHERE name = ?", (key,)).fetchone()
+            if row:
+                position = row[0]
+                conn.execute("DELETE FROM students WHERE name = ?", (key,))
+            else:
+                position = conn.execute("SELECT COALESCE(MAX(position), -1) + 1 FROM students").fetchone()[0]
+            conn.execute(
+                "INSERT OR REPLACE INTO students (name, repo, repo_key, position, data) VALUES (?, ?, ?, ?, ?)",
+                student_row(student, position),
+            )
+        return
+    with storage_write(STUDENTS_FILE):
+        registry = student_registry()
+        students = list(registry["source"])
+        index = registry["positions"].get(key)
+        if index is None:
+            students.append(student)
+        else:
+            students[index] = student
+        save_students(students)
+
+
+def delete_student(name):
+    """删除学员，返回是否存在"""
+    if use_sqlite():
+        with db_transaction() as conn:
+            return conn.execute("DELETE FROM students WHERE name = ?", (name,)).rowcount > 0
+    with storage_write(STUDENTS_FILE):
+        registry = student_registry()
+        if name not in registry["by_name"]:
+            return False
+        save_students([s for s in registry["source"] if s.get("name") != name])
+    return True
+
+
+def get_state_entry(name):
+    """单个学员的抓取状态（不存在时为空字典）"""
+    if use_sqlite():
+        return sqlite_get_keyed("state", name) or {}
+    return dict(load_state().get(name, {}))
+
+
+def put_state_entries(entries):
+    """写入若干学员的抓取状态 {name: entry}，一次写入；返回写入的字节数"""
+    if not entries:
+        return 0
+    with storage_write(STATE_FILE):
+        if use_sqlite():
+            return sqlite_put_keyed("state", entries)
+        state = dict(load_state())
+        state.update(entries)
+        return save_state(state)
+
+
+def put_state_entry(name, entry):
+    return put_state_entries({name: entry})
+
+
+def merge_state_changes(changes):
+    """把后台检查的改动合并进存储中的当前条目，一次写入；返回写入的字节数
+
+    changes 为 {name: (before, after)}，before 是检查开始时读到的条目。只写入
+    before -> after 之间变化的字段，检查期间其他写入改动的字段保留；USER_STATE_FIELDS
+    存储中已有时不覆盖。期间 webhook 写入了比本轮看到的更新的 last_known_pushed_at 时，
+    存储中的条目更新，丢弃本轮对该条目的全部改动。
+    """
+    if not changes:
+        return 0
+    with storage_write(STATE_FILE):
+        entries = {}
+        for name, (before, after) in changes.items():
+            current = get_state_entry(name)
+            stored = current.get("last_known_pushed_at")
+            if (stored != before.get("last_known_pushed_at")
+                    and (parse_timestamp(stored) or 0) > (parse_timestamp(after.get("last_known_pushed_at")) or 0)):
+                continue
+            for key in before.keys() | after.keys():
+                if key in USER_STATE_FIELDS and key in current:
+                    continue
+                if key not in after:
+                    current.pop(key, None)
+                elif key not in before or before[key] != after[key]:
+                    current[key] = after[key]
+            entries[name] = current
+        return put_state_entries(entries)
 
 
 def normalize_settings(data):
@@ -183,14 +785,18 @@ def normalize_settings(data):
     if isinstance(data, dict):
         for key, default in DEFAULT_SETTINGS.items():
             raw = data.get(key, default)
+            if key in SETTING_CHOICES:
+                settings[key] = raw if raw in SETTING_CHOICES[key] else default
+                continue
             try:
                 value = int(raw)
             except (TypeError, ValueError):
                 value = default
-            if value < 5:
-                value = 5
-            if value > 3600:
-                value = 3600
+            low, high = SETTING_RANGES.get(key, (5, 3600))
+            if value < low:
+                value = low
+            if value > high:
+                value = high
             settings[key] = value
     return settings
 
@@ -198,18 +804,12 @@ def normalize_settings(data):
 def load_settings():
     if not os.path.exists(SETTINGS_FILE):
         return DEFAULT_SETTINGS.copy()
-    with open(SETTINGS_FILE, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    return normalize_settings(data)
+    return normalize_settings(read_json_cached(SETTINGS_FILE))
 
 
 def save_settings(settings):
     normalized = normalize_settings(settings)
-    p = Path(SETTINGS_FILE)
-    if not p.parent.exists():
-        p.parent.mkdir(parents=True, exist_ok=True)
-    with open(str(p), "w", encoding="utf-8") as f:
-        json.dump(normalized, f, ensure_ascii=False, indent=2)
+    atomic_write_json(SETTINGS_FILE, normalized, indent=2)
     return normalized
 
 
@@ -217,87 +817,666 @@ def iso_now():
     return datetime.now(timezone.utc).isoformat()
 
 
-def get_cached_response(cache_key):
-    """获取缓存的响应"""
+# 数据代数：学员或抓取状态每写入一次加一（存储层的 save_* / 事务提交后调用 bump_data_generation）；
+# 其他进程或手工编辑造成的变化由 storage_signature() 发现，同样加一
+_data_generation = {"value": 0, "signature": None}
+_data_generation_lock = threading.Lock()
+
+
+def storage_signature():
+    """学员与抓取状态的存储签名，任何进程写入后都会变化"""
+    if use_sqlite():
+        row = get_db().execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()
+        return row[0] if row else None
+    return (file_signature(STUDENTS_FILE), file_signature(STATE_FILE))
+
+
+def data_generation():
+    """当前数据代数；要缓存由数据算出的结果时，先取代数再读数据"""
+    signature = storage_signature()
+    with _data_generation_lock:
+        if signature != _data_generation["signature"]:
+            _data_generation["signature"] = signature
+            _data_generation["value"] += 1
+        return _data_generation["value"]
+
+
+def bump_data_generation():
+    """写入学员或抓取状态之后调用（数据已对其他读者可见）"""
+    signature = storage_signature()
+    with _data_generation_lock:
+        _data_generation["signature"] = signature
+        _data_generation["value"] += 1
+        return _data_generation["value"]
+
+
+def get_cached_response(cache_key, generation=None):
+    """获取缓存的响应；缓存时的数据代数与当前（或给定的）代数不同则视为未命中"""
+    if generation is None:
+        generation = data_generation()
     with cache_lock:
         cached = api_cache.get(cache_key)
-        if cached and cached['data'] is not None:
-            elapsed = time.time() - cached['timestamp']
-            if elapsed < CACHE_DURATION:
-                return cached['data']
+        if cached and cached['data'] is not None and cached['generation'] == generation:
+            return cached['data']
     return None
 
 
-def set_cached_response(cache_key, data):
-    """设置缓存响应"""
+def set_cached_response(cache_key, data, generation=None):
+    """设置缓存响应，generation 为读取数据前取得的代数"""
+    if generation is None:
+        generation = data_generation()
     with cache_lock:
         api_cache[cache_key] = {
             'data': data,
-            'timestamp': time.time()
+            'generation': generation
         }
 
 
 def invalidate_cache():
     """清空所有缓存"""
+    bump_data_generation()
     with cache_lock:
-        for key in api_cache:
-            api_cache[key] = {'data': None, 'timestamp': 0}
+        api_cache.clear()
+
+
+def cached_response_body(cache_key, build):
+    """按数据代数缓存 build() 生成的响应体（bytes），数据未变时不重建也不重新序列化
+
+    返回 (body, etag)。ETag 是响应体的摘要，每个数据代数只计算一次；
+    由内容得出，多个 worker 进程对同一份数据给出相同的 ETag。
+    """
+    generation = data_generation()
+    cached = get_cached_response(cache_key, generation)
+    if cached is None:
+        body = build()
+        cached = (body, hashlib.sha1(body).hexdigest()[:20])
+        set_cached_response(cache_key, cached, generation)
+    return cached
+
+
+def json_body(data):
+    """与 jsonify 相同的序列化结果（bytes）"""
+    return app.json.response(data).get_data()
+
+
+def conditional_json(body, etag):
+    resp = app.response_class(body, mimetype=app.json.mimetype)
+    resp.set_etag(etag)
+    # 浏览器每次都带上校验值来问服务器，数据没变只收到一个 304
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp.make_conditional(request)
+
+
+def cached_json_response(cache_key, build):
+    """带强 ETag 的缓存 JSON 响应；If-None-Match 匹配时返回 304，不发送响应体"""
+    body, etag = cached_response_body(cache_key, lambda: json_body(build()))
+    return conditional_json(body, etag)
+
+
+# 事件推送（/api/events，Server-Sent Events）：每个连接一个有界队列
+_event_subscribers = set()
+_event_lock = threading.Lock()
+_event_counter = 0
+
+
+def publish_event(kind, data=None):
+    """向所有事件流连接推送一条事件
+
+    kind: score（打分）、roster（增删改、导入学员）、state（抓取状态、已查看标记）、remarks（导师备注）。
+    """
+    global _event_counter
+    with _event_lock:
+        _event_counter += 1
+        event = (_event_counter, kind, data or {})
+        for q in list(_event_subscribers):
+            try:
+                q.put_nowait(event)
+            except queue.Full:
+                # 读得太慢的连接直接断开，浏览器重连后重新同步
+                _event_subscribers.discard(q)
+
+
+def publish_state_event(names):
+    names = sorted(names)
+    data = {"count": len(names)}
+    if len(names) <= EVENT_NAMES_LIMIT:
+        data["names"] = names
+    publish_event("state", data)
+
+
+def format_sse(event_id, kind, data):
+    return f"id: {event_id}\nevent: {kind}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def event_stream(q):
+    """事件流生成器；空闲时发送心跳，期间数据代数变化（其他进程写入、手工编辑）则推送 data 事件"""
+    seen = data_generation()
+    try:
+        yield f"retry: {EVENTS_RETRY_MS}\n\n"
+        while True:
+            try:
+                event = q.get(timeout=EVENTS_KEEPALIVE_SECONDS)
+            except queue.Empty:
+                event = None
+            with _event_lock:
+                if q not in _event_subscribers:
+                    return
+            if event:
+                seen = data_generation()
+                yield format_sse(*event)
+                continue
+            generation = data_generation()
+            if generation != seen:
+                seen = generation
+                yield format_sse(0, "data", {"generation": generation})
+            else:
+                yield ": keepalive\n\n"
+    finally:
+        with _event_lock:
+            _event_subscribers.discard(q)
+
+
+# 最近一轮后台检查的统计：检查总数、重新统计提交数的仓库、跳过的仓库、失败数
+last_sweep_report = {}
 
+# check_repo 返回的 commits_count：因配额不足推迟到下一轮（区别于请求失败的 -1）
+DEFERRED = -2
 
-def check_all():
+
+def check_repo(repo, synced_pushed_at=None):
+    """检查单个仓库，返回 (repo_info, commits_count)；在线程池中执行
+
+    synced_pushed_at 是上次统计提交数时的 pushed_at；仓库没有新的推送时
+    不再重新统计，commits_count 返回 None 表示沿用已保存的值。
+    """
+    if not wait_for_rate_budget("core", 1):
+        # 配额不足，本轮跳过，不把失败写入状态
+        return None, DEFERRED
+    info = fetch_repo_info(repo)
+    if not info:
+        return None, -1
+    pushed_at = info.get("pushed_at")
+    if pushed_at and pushed_at == synced_pushed_at:
+        return info, None
+    if not wait_for_rate_budget("core", REST_CALLS_PER_REPO - 1):
+        return None, DEFERRED
+    return info, fetch_commits_count(repo)
+
+
+def sweep_rest(targets, concurrency, synced=None):
+    """REST 后端：每个仓库单独请求，逐个产出 (name, repo_info, commits_count)"""
+    synced = synced or {}
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = {pool.submit(check_repo, repo, synced.get(name)): name for name, repo in targets}
+        for future in as_completed(futures):
+            try:
+                info, commits_count = future.result()
+            except Exception:
+                continue
+            yield futures[future], info, commits_count
+
+
+def check_repo_batch(repos):
+    """GraphQL 批量检查；配额不足时返回空结果"""
+    if not wait_for_rate_budget("graphql", 1):
+        return {repo: (None, DEFERRED) for repo in repos}
+    return fetch_repos_graphql(repos)
+
+
+def sweep_graphql(targets, concurrency, batch_size):
+    """GraphQL 后端：每批 batch_size 个仓库合并为一次查询"""
+    batches = [targets[i:i + batch_size] for i in range(0, len(targets), batch_size)]
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = {pool.submit(check_repo_batch, [repo for _, repo in batch]): batch for batch in batches}
+        for future in as_completed(futures):
+            try:
+                results = future.result()
+            except Exception:
+                continue
+            for name, repo in futures[future]:
+                info, commits_count = results.get(repo, (None, -1))
+                yield name, info, commits_count
+
+
+def parse_timestamp(value):
+    """ISO 8601 字符串转 Unix 时间戳，无法解析时返回 None"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def prepare_sweep(due_only=False):
+    """读取一轮检查所需的数据，返回 (state, settings, targets, synced)
+
+    targets 为待检查的 (name, repo)，按到期时间排序，同时到期的按最近推送时间倒序；
+    due_only 为 True 时只包含 next_check_at 已到期的仓库。
+    synced 为 name -> commits_pushed_at。
+    """
     students = load_students()
-    state = load_state()
-    changed = False
+    # apply_sweep_results 会原地修改 state 条目，不能直接改共享的解析缓存
+    state = copy.deepcopy(load_state())
+    settings = load_settings()
+    now = time.time()
+    queue = []
     for s in students:
         name = s.get("name")
         repo = s.get("repo")
         if not name or not repo:
             continue
-        info = fetch_repo_info(repo)
+        entry = state.get(name, {})
+        # 从未检查过的仓库立即到期
+        due = parse_timestamp(entry.get("next_check_at")) or 0
+        if due_only and due > now:
+            continue
+        # 最近有推送的仓库优先，配额不足时先保证活跃学员的数据
+        pushed = parse_timestamp(entry.get("last_known_pushed_at")) or 0
+        heapq.heappush(queue, (min(due, now), -pushed, name, repo))
+    targets = [heapq.heappop(queue)[2:] for _ in range(len(queue))]
+    # 仓库 pushed_at 没变时无需重新统计提交数
+    synced = {name: state[name].get("commits_pushed_at") for name, _ in targets
+              if name in state and "commits_count" in state[name]}
+    return state, settings, targets, synced
+
+
+def schedule_next_check(entry, outcome, settings, now=None):
+    """根据本次检查结果计算下一次检查时间，写入 entry
+
+    outcome: "pushed"（有新推送，按基础间隔检查）、"idle"（无变化，间隔翻倍）、
+    "error"（404 或请求失败，单独的错误退避）。间隔上限为 poll_max_interval_seconds。
+    """
+    now = time.time() if now is None else now
+    base = settings.get("server_poll_interval_seconds", POLL_INTERVAL)
+    ceiling = max(settings.get("poll_max_interval_seconds", POLL_MAX_INTERVAL), base)
+    if outcome == "error":
+        interval = min(max(entry.get("error_backoff_seconds", 0) * 2, base), ceiling)
+        entry["error_backoff_seconds"] = interval
+    else:
+        entry.pop("error_backoff_seconds", None)
+        if outcome == "pushed":
+            interval = base
+        else:
+            interval = min(max(entry.get("poll_interval_seconds", 0) * 2, base), ceiling)
+        entry["poll_interval_seconds"] = interval
+    entry["next_check_at"] = datetime.fromtimestamp(now + interval, timezone.utc).isoformat()
+    return interval
+
+
+def seconds_until_next_due(settings):
+    """距离最早到期仓库的秒数，限制在 [POLL_MIN_WAKE, server_poll_interval_seconds]"""
+    base = settings.get("server_poll_interval_seconds", POLL_INTERVAL)
+    state = load_state()
+    now = time.time()
+    wait = base
+    for s in load_students():
+        name = s.get("name")
+        if not name or not s.get("repo"):
+            continue
+        due = parse_timestamp(state.get(name, {}).get("next_check_at")) or 0
+        wait = min(wait, due - now)
+    return max(wait, POLL_MIN_WAKE)
+
+
+def apply_sweep_results(state, results, total, started, settings=None):
+    """把 (name, repo_info, commits_count) 结果合并进 state、安排下次检查并记录本轮统计
+
+    有变化的条目先攒在内存里，每隔 STATE_FLUSH_INTERVAL 秒与本轮结束时各合并写入一次，
+    报告中的 state_writes / bytes_written 为本轮写入次数与字节数。
+    """
+    settings = settings or load_settings()
+    report = {
+        "started_at": datetime.fromtimestamp(started, timezone.utc).isoformat(),
+        "total": total,
+        "refreshed": 0,
+        "skipped": 0,
+        "failed": 0,
+        "deferred": 0,
+    }
+    pending = {}
+    last_flush = time.time()
+    report["state_writes"] = 0
+    report["bytes_written"] = 0
+
+    def flush():
+        # state 是检查开始时的快照，期间 webhook / 标记已查看的写入只能按字段合并，不能整条覆盖
+        report["bytes_written"] += merge_state_changes(pending)
+        report["state_writes"] += 1
+        publish_state_event(pending)
+        pending.clear()
+
+    for name, info, commits_count in results:
+        if pending and time.time() - last_flush >= STATE_FLUSH_INTERVAL:
+            flush()
+            last_flush = time.time()
         if not info:
+            if commits_count == DEFERRED:
+                report["deferred"] += 1
+                continue
+            report["failed"] += 1
+            before = copy.deepcopy(state.get(name, {}))
+            schedule_next_check(state.setdefault(name, {}), "error", settings)
+            pending[name] = (before, state[name])
             continue
+        if commits_count is None:
+            report["skipped"] += 1
+        elif commits_count < 0:
+            # 仓库信息取到了但提交数统计失败：照常记录 pushed_at，commits_pushed_at 不变，下一轮重新统计
+            report["failed"] += 1
+        else:
+            report["refreshed"] += 1
         pushed_at = info.get("pushed_at")  # ISO 8601 string or None
         prev = state.get(name, {})
+        before = copy.deepcopy(prev)
 
         # Update pushed_at if changed
-        if pushed_at and prev.get("last_known_pushed_at") != pushed_at:
+        pushed = bool(pushed_at and prev.get("last_known_pushed_at") != pushed_at)
+        if pushed:
             prev["last_known_pushed_at"] = pushed_at
             if "last_viewed_at" not in prev:
                 prev["last_viewed_at"] = None
-            changed = True
 
-        # Fetch and update commits count periodically
-        commits_count = fetch_commits_count(repo)
         # Update if: 1) we got a valid count (>= 0), 2) it's different from current, or 3) it's the first time
-        if commits_count >= 0:
+        if commits_count is not None and commits_count >= 0:
             current_count = prev.get("commits_count", None)
             # Always update if we don't have a count yet, or if the count changed
             if current_count is None or current_count != commits_count:
                 prev["commits_count"] = commits_count
-                changed = True
+            # 记录统计提交数时的 pushed_at，下轮据此判断是否需要重新统计
+            if pushed_at and prev.get("commits_pushed_at") != pushed_at:
+                prev["commits_pushed_at"] = pushed_at
+
+        state[name] = prev
+        # 每个检查过的条目至少下次检查时间会变化
+        schedule_next_check(prev, "pushed" if pushed else "idle", settings)
+        pending[name] = (before, prev)
+
+    if pending:
+        flush()
+    flush_http_cache()
+    report["duration_seconds"] = round(time.time() - started, 3)
+    report["circuit_open"] = circuit_open_hosts()
+    last_sweep_report.clear()
+    last_sweep_report.update(report)
+    return state
 
-        if changed:
-            state[name] = prev
-            save_state(state)  # Save immediately after each student
-            changed = False  # Reset for next student
 
-    return state
+def check_repo_git(repo):
+    """git 镜像后端：更新镜像后在本地统计，不消耗 API 配额"""
+    path = sync_git_mirror(repo)
+    if not path:
+        return None, -1
+    info = git_repo_info(path)
+    if not info:
+        return None, -1
+    return info, git_commits_count(path)
+
+
+def sweep_git(targets, concurrency):
+    """git 镜像后端：并发 fetch 各仓库镜像"""
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = {pool.submit(check_repo_git, repo): name for name, repo in targets}
+        for future in as_completed(futures):
+            try:
+                info, commits_count = future.result()
+            except Exception:
+                continue
+            yield futures[future], info, commits_count
+
+
+def check_all(due_only=False):
+    """检查所有学员仓库；due_only 为 True 时只检查到期的仓库（后台轮询使用）"""
+    started = time.time()
+    state, settings, targets, synced = prepare_sweep(due_only)
+    concurrency = settings.get("poll_concurrency", POLL_CONCURRENCY)
+    # 连接池与并发数一致，避免线程等待连接
+    get_http_session(concurrency)
+
+    backend = settings.get("fetch_backend")
+    if backend == "graphql":
+        results = sweep_graphql(targets, concurrency, settings.get("graphql_batch_size", GRAPHQL_BATCH_SIZE))
+    elif backend == "git":
+        results = sweep_git(targets, concurrency)
+    else:
+        results = sweep_rest(targets, concurrency, synced)
+    return apply_sweep_results(state, results, len(targets), started, settings)
 
 
 def background_loop():
     while True:
         try:
-            check_all()
+            check_all(due_only=True)
         except Exception:
             pass
-        settings = load_settings()
-        interval = settings.get("server_poll_interval_seconds", POLL_INTERVAL)
-        time.sleep(interval)
+        try:
+            interval = seconds_until_next_due(load_settings())
+        except Exception:
+            interval = POLL_INTERVAL
+        # 配额耗尽时一直暂停到 GitHub 重置配额
+        time.sleep(max(interval, rate_limit_pause_seconds()))
+
+
+# ==================== asyncio 轮询引擎 ====================
+# 与 background_loop 二选一：所有 GitHub I/O 在同一个事件循环上完成，
+# 用信号量限制并发，写入同样结构的 state.json。
+
+async def async_wait_for_rate_budget(resource="core", cost=1):
+    delay = reserve_rate_budget(resource, cost)
+    if delay is None:
+        return False
+    if delay > 0:
+        await asyncio.sleep(delay)
+    return True
+
+
+async def async_github_get(session, api_url, params=None, transform=None):
+    """github_get 的 aiohttp 版本，共用同一份条件请求缓存"""
+    key = http_cache_key(api_url, params)
+    headers, cached = conditional_headers(key)
+    if negative_cache_hit(cached):
+        return cached["negative"], None, CaseInsensitiveDict()
+    status, resp_headers, data = await async_resilient_request(
+        session, "GET", api_url, headers=headers, params=params
+    )
+    note_rate_limit(resp_headers)
+    if status == 304 and cached:
+        return 200, cached.get("data"), not_modified_headers(resp_headers, cached)
+    if status != 200:
+        if status in NEGATIVE_STATUSES:
+            await asyncio.to_thread(store_negative, key, status)
+        return status, None, resp_headers
+    if transform is not None:
+        data = transform(data)
+    store_validators(key, resp_headers, data)
+    return 200, data, resp_headers
+
+
+async def async_fetch_repo_info(session, repo_url):
+    owner, repo = repo_owner_and_name(repo_url)
+    if not owner or not repo:
+        return None
+    try:
+        status, info, _ = await async_github_get(
+            session, f"{GITHUB_API_URL}/repos/{owner}/{repo}", transform=trim_repo_info
+        )
+    except Exception:
+        return None
+    return info if status == 200 else None
+
 
+async def async_fetch_commits_count(session, repo_url):
+    owner, repo = repo_owner_and_name(repo_url)
+    if not owner or not repo:
+        return 0
+    api_url = f"{GITHUB_API_URL}/repos/{owner}/{repo}/commits"
+    try:
+        status, _, headers = await async_github_get(session, api_url, params={"per_page": 1}, transform=lambda body: None)
+        if status == 404:
+            return 0
+        if status != 200:
+            return -1
+        last_page = last_page_from_link(headers.get("Link", ""))
+        if last_page is not None:
+            return last_page
+        status, count, _ = await async_github_get(session, api_url, params={"per_page": 100}, transform=count_commits_page)
+        return count if status == 200 else 0
+    except Exception:
+        return -1
 
-# 启动后台检查线程（守护线程）
-t = threading.Thread(target=background_loop, daemon=True)
-t.start()
+
+async def async_fetch_repos_graphql(session, repo_urls):
+    query, variables, aliases = build_graphql_query(repo_urls)
+    if not aliases:
+        return {}
+    try:
+        status, headers, body = await async_resilient_request(
+            session,
+            "POST",
+            GITHUB_GRAPHQL_URL,
+            headers=graphql_headers(),
+            json={"query": query, "variables": variables},
+        )
+        note_rate_limit(headers)
+        if status != 200:
+            return {}
+        data = (body or {}).get("data") or {}
+    except Exception:
+        return {}
+    return parse_graphql_results(data, aliases)
+
+
+async def async_check_repo(session, semaphore, name, repo, synced_pushed_at=None):
+    """check_repo 的 asyncio 版本，返回 (name, repo_info, commits_count)"""
+    async with semaphore:
+        if not await async_wait_for_rate_budget("core", 1):
+            return name, None, DEFERRED
+        info = await async_fetch_repo_info(session, repo)
+        if not info:
+            return name, None, -1
+        pushed_at = info.get("pushed_at")
+        if pushed_at and pushed_at == synced_pushed_at:
+            return name, info, None
+        if not await async_wait_for_rate_budget("core", REST_CALLS_PER_REPO - 1):
+            return name, None, DEFERRED
+        return name, info, await async_fetch_commits_count(session, repo)
+
+
+async def async_check_batch(session, semaphore, batch):
+    async with semaphore:
+        if not await async_wait_for_rate_budget("graphql", 1):
+            return [(name, None, DEFERRED) for name, _ in batch]
+        results = await async_fetch_repos_graphql(session, [repo for _, repo in batch])
+    return [(name, *results.get(repo, (None, -1))) for name, repo in batch]
+
+
+async def async_check_all(session, due_only=False):
+    """check_all 的 asyncio 版本；文件读写放到线程里，不阻塞事件循环"""
+    started = time.time()
+    state, settings, targets, synced = await asyncio.to_thread(prepare_sweep, due_only)
+    semaphore = asyncio.Semaphore(settings.get("async_poll_concurrency", ASYNC_POLL_CONCURRENCY))
+
+    results = []
+    if settings.get("fetch_backend") == "git":
+        async def check_git(name, repo):
+            async with semaphore:
+                return (name, *await asyncio.to_thread(check_repo_git, repo))
+        done = await asyncio.gather(*(check_git(name, repo) for name, repo in targets), return_exceptions=True)
+        results = [item for item in done if not isinstance(item, BaseException)]
+    elif settings.get("fetch_backend") == "graphql":
+        batch_size = settings.get("graphql_batch_size", GRAPHQL_BATCH_SIZE)
+        batches = [targets[i:i + batch_size] for i in range(0, len(targets), batch_size)]
+        done = await asyncio.gather(*(async_check_batch(session, semaphore, b) for b in batches), return_exceptions=True)
+        for item in done:
+            if not isinstance(item, BaseException):
+                results.extend(item)
+    else:
+        done = await asyncio.gather(
+            *(async_check_repo(session, semaphore, name, repo, synced.get(name)) for name, repo in targets),
+            return_exceptions=True,
+        )
+        results = [item for item in done if not isinstance(item, BaseException)]
+    return await asyncio.to_thread(apply_sweep_results, state, results, len(targets), started, settings)
+
+
+async def async_background_loop():
+    timeout = aiohttp.ClientTimeout(total=ASYNC_REQUEST_TIMEOUT)
+    # 并发由信号量控制，连接器本身不再限制连接数
+    connector = aiohttp.TCPConnector(limit=0)
+    async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+        while True:
+            try:
+                await async_check_all(session, due_only=True)
+            except Exception:
+                pass
+            try:
+                interval = await asyncio.to_thread(seconds_until_next_due, load_settings())
+            except Exception:
+                interval = POLL_INTERVAL
+            await asyncio.sleep(max(interval, rate_limit_pause_seconds()))
+
+
+# 正在运行的 asyncio 轮询：事件循环、顶层任务与运行它的线程
+_async_poller = {"loop": None, "task": None, "thread": None}
+
+
+def run_async_poller():
+    """在当前线程运行 asyncio 轮询引擎，直到 stop_async_poller() 取消它"""
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    task = loop.create_task(async_background_loop())
+    _async_poller.update(loop=loop, task=task, thread=threading.current_thread())
+    try:
+        loop.run_until_complete(task)
+    except asyncio.CancelledError:
+        pass
+    finally:
+        loop.run_until_complete(loop.shutdown_asyncgens())
+        loop.close()
+        _async_poller.update(loop=None, task=None, thread=None)
+
+
+def stop_async_poller(timeout=5):
+    """取消 asyncio 轮询任务并等待运行它的线程退出（进程退出时自动调用）；返回线程是否已退出"""
+    loop = _async_poller.get("loop")
+    task = _async_poller.get("task")
+    thread = _async_poller.get("thread")
+    if loop is None or task is None or task.done():
+        return True
+    try:
+        loop.call_soon_threadsafe(task.cancel)
+    except RuntimeError:
+        # 事件循环已关闭
+        return True
+    if thread is not None and thread is not threading.current_thread():
+        thread.join(timeout)
+        return not thread.is_alive()
+    return True
+
+
+atexit.register(stop_async_poller)
+
+
+def start_background_poller():
+    """按 POLL_ENGINE 环境变量或 poll_engine 设置启动后台轮询（守护线程）
+
+    POLL_ENGINE=off 时不启动（压测脚本、只靠 webhook 更新的部署），返回 None。
+    """
+    engine = os.environ.get("POLL_ENGINE")
+    if engine == "off":
+        return None
+    if not engine:
+        try:
+            engine = load_settings().get("poll_engine")
+        except Exception:
+            engine = DEFAULT_SETTINGS["poll_engine"]
+    target = background_loop
+    # 未安装 aiohttp 时退回线程引擎
+    if engine == "asyncio" and aiohttp is not None:
+        target = run_async_poller
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    return thread
 
 
 # ==================== 辅助函数 ====================
@@ -317,11 +1496,66 @@ def repo_owner_and_name(repo_url):
     return None, None
 
 
+def canonical_repo(repo_url):
+    """返回小写的 owner/repo，用于比较不同写法的同一仓库；无法解析时返回 None"""
+    owner, repo = repo_owner_and_name(repo_url or "")
+    if not owner or not repo:
+        return None
+    return f"{owner}/{repo}".lower()
+
+
 def normalize_repo_url(repo_url):
     """标准化仓库 URL"""
     return repo_url.strip()
 
 
+def repo_url_hosts():
+    """允许的仓库地址 (scheme, host)：github.com，以及 GitHub Enterprise 的 GITHUB_API_URL 主机"""
+    hosts = {("https", "github.com"), ("https", "www.github.com")}
+    api = urlparse(GITHUB_API_URL)
+    if api.hostname and api.hostname != "api.github.com":
+        hosts.add((api.scheme, api.hostname))
+    return hosts
+
+
+def is_valid_repo_url(repo_url):
+    """git 镜像模式下仓库地址只接受 https://github.com/owner/repo 形式
+
+    地址会原样交给 git clone，必须挡住以 - 开头的参数注入和本地路径；
+    file:// 只在设置 ALLOW_FILE_REPOS 时放行。
+    """
+    if not isinstance(repo_url, str) or not repo_url or repo_url.startswith("-"):
+        return False
+    parsed = urlparse(repo_url)
+    if parsed.scheme == "file":
+        return ALLOW_FILE_REPOS
+    if (parsed.scheme, parsed.hostname) not in repo_url_hosts():
+        return False
+    if parsed.username or parsed.password or parsed.query or parsed.fragment:
+        return False
+    owner, repo = repo_owner_and_name(repo_url)
+    return bool(owner and repo) and not owner.startswith("-") and not repo.startswith("-")
+
+
+def repo_url_allowed(repo_url, settings=None):
+    """名单能否加入该仓库地址：git 镜像模式须通过 is_valid_repo_url；
+    REST / GraphQL 模式只从地址里取 owner/repo，不限制写法"""
+    settings = settings or load_settings()
+    return settings.get("fetch_backend") != "git" or is_valid_repo_url(repo_url)
+
+
+@functools.lru_cache(maxsize=REPO_META_CACHE_SIZE)
+def repo_meta(repo_url):
+    """解析一次仓库地址：canonical_repo、owner、repo 与头像地址；按地址缓存，返回值只读"""
+    owner, name = repo_owner_and_name(repo_url or "")
+    return {
+        "key": canonical_repo(repo_url),
+        "owner": owner,
+        "repo": name,
+        "avatar_url": get_avatar_url(repo_url or ""),
+    }
+
+
 def extract_github_username(repo_url):
     """Extract GitHub username from repo URL"""
     owner, _ = repo_owner_and_name(repo_url)
@@ -590,20 +1824,398 @@ def parse_import_text(text):
     return entries
 
 
+_http_session = None
+_http_pool_size = 0
+_http_session_lock = threading.Lock()
+
+
+def get_http_session(pool_size=None):
+    """返回所有 fetch_* 共用的 keep-alive 会话，连接池至少能容纳 pool_size 个连接"""
+    global _http_session, _http_pool_size
+    size = max(int(pool_size or POLL_CONCURRENCY), 1)
+    with _http_session_lock:
+        if _http_session is None:
+            _http_session = requests.Session()
+        if size > _http_pool_size:
+            adapter = HTTPAdapter(pool_connections=size, pool_maxsize=size)
+            _http_session.mount("https://", adapter)
+            _http_session.mount("http://", adapter)
+            _http_pool_size = size
+        return _http_session
+
+
+def github_headers():
+    """GitHub REST API 请求头"""
+    headers = {"Accept": "application/vnd.github.v3+json"}
+    if GITHUB_TOKEN:
+        headers["Authorization"] = f"token {GITHUB_TOKEN}"
+    return headers
+
+
+# GitHub 配额跟踪：{resource: {"limit", "remaining", "reset", "next_at"}}
+rate_limits = {}
+rate_limit_lock = threading.Lock()
+
+
+def note_rate_limit(headers):
+    """从响应头记录 X-RateLimit-* 配额信息"""
+    try:
+        remaining = int(headers.get("X-RateLimit-Remaining"))
+        reset = float(headers.get("X-RateLimit-Reset"))
+    except (TypeError, ValueError):
+        return
+    resource = headers.get("X-RateLimit-Resource") or "core"
+    try:
+        limit = int(headers.get("X-RateLimit-Limit"))
+    except (TypeError, ValueError):
+        limit = None
+    with rate_limit_lock:
+        entry = rate_limits.setdefault(resource, {"next_at": 0})
+        entry["remaining"] = remaining
+        entry["reset"] = reset
+        if limit:
+            entry["limit"] = limit
+
+
+def reserve_rate_budget(resource="core", cost=1):
+    """为 cost 个请求预留配额，返回需要等待的秒数；配额不足时返回 None。
+
+    配额充足时返回 0；配额偏低时把请求均匀分布到重置前；
+    配额耗尽或需要等待过久时返回 None，由调用方推迟到下一轮。
+    """
+    with rate_limit_lock:
+        entry = rate_limits.get(resource)
+        now = time.time()
+        if not entry or "remaining" not in entry or now >= entry["reset"]:
+            return 0
+        budget = entry["remaining"] - RATE_LIMIT_RESERVE
+        if budget < cost:
+            return None
+        limit = entry.get("limit") or budget
+        delay = 0
+        if budget < limit * RATE_LIMIT_PACE_RATIO:
+            interval = (entry["reset"] - now) * cost / budget
+            slot = max(now, entry["next_at"])
+            delay = slot - now
+            if delay > RATE_LIMIT_MAX_WAIT:
+                return None
+            entry["next_at"] = slot + interval
+        # 先按最坏情况扣减，真实值以下一次响应头为准（304 不计配额）
+        entry["remaining"] -= cost
+    return delay
+
+
+def wait_for_rate_budget(resource="core", cost=1):
+    """轮询线程在发请求前调用：按剩余配额节流，返回 False 表示本轮应跳过"""
+    delay = reserve_rate_budget(resource, cost)
+    if delay is None:
+        return False
+    if delay > 0:
+        time.sleep(delay)
+    return True
+
+
+def rate_limit_pause_seconds():
+    """配额耗尽时返回距离重置的秒数，否则返回 0"""
+    now = time.time()
+    pause = 0
+    with rate_limit_lock:
+        for entry in rate_limits.values():
+            if "remaining" in entry and entry["remaining"] <= RATE_LIMIT_RESERVE and entry["reset"] > now:
+                pause = max(pause, entry["reset"] - now)
+    return pause
+
+
+# 断路器：{host: {"failures", "open_until", "probing"}}
+circuit_breakers = {}
+circuit_lock = threading.Lock()
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """断路器打开期间快速失败，沿用 requests 的异常类型以便现有的 except 分支处理"""
+
+
+def circuit_allows(host):
+    """断路器是否放行对 host 的请求；冷却结束后只放行一个试探请求（半开）"""
+    with circuit_lock:
+        breaker = circuit_breakers.get(host)
+        if not breaker or not breaker["open_until"]:
+            return True
+        if time.time() < breaker["open_until"] or breaker["probing"]:
+            return False
+        breaker["probing"] = True
+        return True
+
+
+def record_circuit_result(host, ok):
+    """记录一次请求结果：成功即关闭断路器，连续失败达到阈值则打开"""
+    with circuit_lock:
+        breaker = circuit_breakers.setdefault(host, {"failures": 0, "open_until": 0, "probing": False})
+        breaker["probing"] = False
+        if ok:
+            breaker["failures"] = 0
+            breaker["open_until"] = 0
+            return
+        breaker["failures"] += 1
+        if breaker["failures"] >= CIRCUIT_FAILURE_THRESHOLD:
+            breaker["open_until"] = time.time() + CIRCUIT_COOLDOWN
+
+
+def release_circuit_probe(host):
+    """请求被取消 / 中断、结果未知时结束试探，下一次请求重新试探"""
+    with circuit_lock:
+        breaker = circuit_breakers.get(host)
+        if breaker:
+            breaker["probing"] = False
+
+
+def circuit_open_hosts():
+    """当前处于打开状态的 host 列表（用于轮询报告）"""
+    now = time.time()
+    with circuit_lock:
+        return sorted(h for h, b in circuit_breakers.items() if b["open_until"] > now)
+
+
+def retry_delay(attempt):
+    """第 attempt 次重试前的等待时间：指数退避 + 全抖动，避免大量请求同时重试"""
+    return random.uniform(0, RETRY_BASE_DELAY * (2 ** attempt))
+
+
+def resilient_request(method, url, **kwargs):
+    """所有 GitHub 请求的统一出口：断路器 + 对瞬时错误的抖动重试
+
+    超时、连接错误与 5xx 会重试；重试用尽后 5xx 照常返回响应，异常则抛出。
+    断路器打开时抛出 CircuitOpenError，不发请求。
+    """
+    host = urlparse(url).netloc
+    for attempt in range(RETRY_ATTEMPTS):
+        if not circuit_allows(host):
+            raise CircuitOpenError(f"circuit open for {host}")
+        try:
+            resp = get_http_session().request(method, url, **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            record_circuit_result(host, False)
+            if attempt == RETRY_ATTEMPTS - 1:
+                raise
+        except Exception:
+            # 其他错误（响应体损坏、地址非法等）不重试，但必须记一次失败，否则半开的试探请求永远不结束
+            record_circuit_result(host, False)
+            raise
+        except BaseException:
+            release_circuit_probe(host)
+            raise
+        else:
+            if resp.status_code not in RETRY_STATUSES:
+                record_circuit_result(host, True)
+                return resp
+            record_circuit_result(host, False)
+            if attempt == RETRY_ATTEMPTS - 1:
+                return resp
+        time.sleep(retry_delay(attempt))
+
+
+async def async_resilient_request(session, method, url, **kwargs):
+    """resilient_request 的 aiohttp 版本，与线程引擎共用断路器
+
+    返回 (status, headers, data)；只有 200 时才解析 JSON，其余 data 为 None。
+    """
+    host = urlparse(url).netloc
+    for attempt in range(RETRY_ATTEMPTS):
+        if not circuit_allows(host):
+            raise CircuitOpenError(f"circuit open for {host}")
+        try:
+            async with session.request(method, url, **kwargs) as resp:
+                data = await resp.json(content_type=None) if resp.status == 200 else None
+                status, headers = resp.status, resp.headers
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+            record_circuit_result(host, False)
+            if attempt == RETRY_ATTEMPTS - 1:
+                raise
+        except Exception:
+            # ClientPayloadError、resp.json() 的 ValueError 等
+            record_circuit_result(host, False)
+            raise
+        except BaseException:
+            # CancelledError：轮询被停止，结果未知
+            release_circuit_probe(host)
+            raise
+        else:
+            if status not in RETRY_STATUSES:
+                record_circuit_result(host, True)
+                return status, headers, data
+            record_circuit_result(host, False)
+            if attempt == RETRY_ATTEMPTS - 1:
+                return status, headers, data
+        await asyncio.sleep(retry_delay(attempt))
+
+
+# 条件请求缓存：{url: {"etag", "last_modified", "link", "data"}}
+_http_cache = None
+_http_cache_dirty = False
+_http_cache_lock = threading.Lock()
+
+
+def state_sibling_file(name):
+    """与 state.json 同目录的数据文件路径"""
+    return str(Path(STATE_FILE).with_name(name))
+
+
+def http_cache_file():
+    return state_sibling_file(HTTP_CACHE_NAME)
+
+
+def _load_http_cache():
+    """Load the validator cache once (caller holds _http_cache_lock)"""
+    global _http_cache
+    if _http_cache is None:
+        _http_cache = {}
+        try:
+            with open(http_cache_file(), "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if isinstance(data, dict):
+                _http_cache = data
+        except Exception:
+            pass
+    return _http_cache
+
+
+def flush_http_cache():
+    """把有变动的校验缓存写回磁盘"""
+    global _http_cache_dirty
+    with _http_cache_lock:
+        if not _http_cache_dirty or _http_cache is None:
+            return
+        atomic_write_json(http_cache_file(), _http_cache)
+        _http_cache_dirty = False
+
+
+def http_cache_key(api_url, params=None):
+    if not params:
+        return api_url
+    return api_url + "?" + "&".join(f"{k}={v}" for k, v in sorted(params.items()))
+
+
+def conditional_headers(key):
+    """返回 (请求头, 缓存条目)；有缓存时附带 If-None-Match / If-Modified-Since"""
+    headers = github_headers()
+    with _http_cache_lock:
+        cached = _load_http_cache().get(key)
+    if cached:
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+    return headers, cached
+
+
+def not_modified_headers(resp_headers, cached):
+    """304 响应头补上缓存的 Link，供分页计数使用"""
+    headers = CaseInsensitiveDict(resp_headers)
+    if cached.get("link"):
+        headers["Link"] = cached["link"]
+    return headers
+
+
+def store_validators(key, resp_headers, data):
+    """保存 200 响应的校验信息与（已精简的）响应体"""
+    global _http_cache_dirty
+    etag = resp_headers.get("ETag")
+    last_modified = resp_headers.get("Last-Modified")
+    if not etag and not last_modified:
+        return
+    with _http_cache_lock:
+        _load_http_cache()[key] = {
+            "etag": etag,
+            "last_modified": last_modified,
+            "link": resp_headers.get("Link"),
+            "data": data,
+        }
+        _http_cache_dirty = True
+
+
+def negative_cache_hit(cached):
+    """缓存条目是否为未过期的 404 / 451 结果"""
+    return bool(cached and cached.get("negative") and cached.get("expires", 0) > time.time())
+
+
+def store_negative(key, status):
+    """缓存 404 / 451 结果，有效期由 negative_cache_seconds 设置决定（0 为不缓存）"""
+    global _http_cache_dirty
+    ttl = load_settings().get("negative_cache_seconds", NEGATIVE_CACHE_SECONDS)
+    if ttl <= 0:
+        return
+    with _http_cache_lock:
+        _load_http_cache()[key] = {"negative": status, "expires": time.time() + ttl}
+        _http_cache_dirty = True
+
+
+def github_get(api_url, params=None, transform=None, use_cache=True):
+    """带 ETag / Last-Modified 条件请求的 GET。
+
+    返回 (status_code, data, headers)。200 时 data 为 transform(resp.json())
+    并写入缓存；304 时直接返回缓存的 data（不解析 JSON），status_code 记为 200。
+    404 / 451 会被负缓存，有效期内直接返回该状态码而不发请求。
+    其他状态码 data 为 None。use_cache 为 False 时发普通 GET，不读写校验缓存。
+    """
+    key = http_cache_key(api_url, params)
+    if use_cache:
+        headers, cached = conditional_headers(key)
+        if negative_cache_hit(cached):
+            return cached["negative"], None, CaseInsensitiveDict()
+    else:
+        headers, cached = github_headers(), None
+    resp = resilient_request("GET", api_url, headers=headers, timeout=10, params=params)
+    note_rate_limit(resp.headers)
+    if resp.status_code == 304 and cached:
+        return 200, cached.get("data"), not_modified_headers(resp.headers, cached)
+    if resp.status_code != 200:
+        if use_cache and resp.status_code in NEGATIVE_STATUSES:
+            store_negative(key, resp.status_code)
+        return resp.status_code, None, resp.headers
+
+    data = resp.json()
+    if transform is not None:
+        data = transform(data)
+    if use_cache:
+        store_validators(key, resp.headers, data)
+    return 200, data, resp.headers
+
+
+# 只保留轮询需要的仓库字段，避免校验缓存过大
+REPO_INFO_FIELDS = ("full_name", "html_url", "default_branch", "pushed_at", "updated_at", "size")
+
+
+def trim_repo_info(body):
+    if not isinstance(body, dict):
+        return None
+    return {k: body.get(k) for k in REPO_INFO_FIELDS}
+
+
+def count_commits_page(commits):
+    return len(commits) if isinstance(commits, list) else 0
+
+
+def last_page_from_link(link_header):
+    """从 Link 头解析 rel="last" 的页码（per_page=1 时即提交总数），没有时返回 None"""
+    if 'rel="last"' not in (link_header or ""):
+        return None
+    match = re.search(r'page=(\d+)>; rel="last"', link_header)
+    if match:
+        return int(match.group(1))
+    return None
+
+
 def fetch_repo_info(repo_url):
     """获取仓库信息"""
     owner, repo = repo_owner_and_name(repo_url)
     if not owner or not repo:
         return None
-    api_url = f"https://api.github.com/repos/{owner}/{repo}"
-    headers = {"Accept": "application/vnd.github.v3+json"}
-    if GITHUB_TOKEN:
-        headers["Authorization"] = f"token {GITHUB_TOKEN}"
+    api_url = f"{GITHUB_API_URL}/repos/{owner}/{repo}"
     try:
-        resp = requests.get(api_url, headers=headers, timeout=10)
-        if resp.status_code != 200:
+        status, info, _ = github_get(api_url, transform=trim_repo_info)
+        if status != 200:
             return None
-        return resp.json()
+        return info
     except Exception:
         # debug output removed
         return None
@@ -614,42 +2226,237 @@ def fetch_commits_count(repo_url):
     owner, repo = repo_owner_and_name(repo_url)
     if not owner or not repo:
         return 0
-    api_url = f"https://api.github.com/repos/{owner}/{repo}/commits"
-    headers = {"Accept": "application/vnd.github.v3+json"}
-    if GITHUB_TOKEN:
-        headers["Authorization"] = f"token {GITHUB_TOKEN}"
+    api_url = f"{GITHUB_API_URL}/repos/{owner}/{repo}/commits"
     try:
         # Try to get the first page with per_page=1 to check pagination
-        resp = requests.get(api_url, headers=headers, timeout=10, params={"per_page": 1})
-        if resp.status_code == 404:
+        status, _, headers = github_get(api_url, params={"per_page": 1}, transform=lambda body: None)
+        if status == 404:
             # Repository not found or empty
             return 0
-        if resp.status_code != 200:
+        if status != 200:
             # Other errors, return -1 to indicate we should retry
             return -1
 
         # Check if there's a Link header with pagination info
-        link_header = resp.headers.get('Link', '')
-        if 'rel="last"' in link_header:
-            # Extract last page number (this is the total count when per_page=1)
-            import re
-            match = re.search(r'page=(\d+)>; rel="last"', link_header)
-            if match:
-                return int(match.group(1))
+        last_page = last_page_from_link(headers.get('Link', ''))
+        if last_page is not None:
+            return last_page
 
         # If no pagination, the repository has fewer commits than per_page
         # Get actual count by requesting without pagination limit
-        resp2 = requests.get(api_url, headers=headers, timeout=10, params={"per_page": 100})
-        if resp2.status_code == 200:
-            commits = resp2.json()
-            if isinstance(commits, list):
-                return len(commits)
+        status, count, _ = github_get(api_url, params={"per_page": 100}, transform=count_commits_page)
+        if status == 200:
+            return count
         return 0
     except Exception:
         # debug output removed
         return -1
 
 
+GRAPHQL_REPO_FIELDS = """
+    pushedAt
+    defaultBranchRef {
+      target {
+        ... on Commit {
+          history { totalCount }
+        }
+      }
+    }
+"""
+
+
+def build_graphql_query(repo_urls):
+    """为一批仓库构造带别名的 GraphQL 查询，返回 (query, variables, aliases)
+
+    aliases 把 r0, r1 ... 映射回仓库 URL。
+    """
+    params = []
+    fields = []
+    variables = {}
+    aliases = {}
+    for i, repo_url in enumerate(repo_urls):
+        owner, repo = repo_owner_and_name(repo_url)
+        if not owner or not repo:
+            continue
+        alias = f"r{i}"
+        params.append(f"$o{i}: String!, $n{i}: String!")
+        fields.append(f"  {alias}: repository(owner: $o{i}, name: $n{i}) {{{GRAPHQL_REPO_FIELDS}  }}")
+        variables[f"o{i}"] = owner
+        variables[f"n{i}"] = repo
+        aliases[alias] = repo_url
+    query = "query(" + ", ".join(params) + ") {\n" + "\n".join(fields) + "\n}"
+    return query, variables, aliases
+
+
+def graphql_headers():
+    headers = {"Content-Type": "application/json"}
+    if GITHUB_TOKEN:
+        headers["Authorization"] = f"bearer {GITHUB_TOKEN}"
+    return headers
+
+
+def fetch_repos_graphql(repo_urls):
+    """用一次 GraphQL 查询获取一批仓库的 pushedAt 与默认分支提交总数
+
+    返回 {repo_url: (repo_info, commits_count)}，repo_info 只含 pushed_at；
+    仓库不存在时 repo_info 为 None。整批失败时返回空字典。
+    """
+    query, variables, aliases = build_graphql_query(repo_urls)
+    if not aliases:
+        return {}
+    headers = graphql_headers()
+    try:
+        resp = resilient_request(
+            "POST",
+            GITHUB_GRAPHQL_URL,
+            headers=headers,
+            timeout=30,
+            json={"query": query, "variables": variables},
+        )
+        note_rate_limit(resp.headers)
+        if resp.status_code != 200:
+            return {}
+        data = (resp.json() or {}).get("data") or {}
+    except Exception:
+        # debug output removed
+        return {}
+    return parse_graphql_results(data, aliases)
+
+
+def parse_graphql_results(data, aliases):
+    """把 GraphQL data 按别名还原为 {repo_url: (repo_info, commits_count)}"""
+    results = {}
+    for alias, repo_url in aliases.items():
+        node = data.get(alias)
+        if not node:
+            # 仓库不存在或无权限（GraphQL 对该别名返回 null）
+            results[repo_url] = (None, -1)
+            continue
+        branch = node.get("defaultBranchRef") or {}
+        history = (branch.get("target") or {}).get("history") or {}
+        # 空仓库没有默认分支，提交数记为 0
+        commits_count = history.get("totalCount", 0) if branch else 0
+        results[repo_url] = ({"pushed_at": node.get("pushedAt")}, commits_count)
+    return results
+
+
+def git_mirror_dir():
+    return GIT_MIRROR_DIR or state_sibling_file("git_mirrors")
+
+
+def git_mirror_path(repo_url):
+    """仓库对应的裸镜像目录；无法解析仓库地址时返回 None"""
+    key = canonical_repo(repo_url)
+    if not key:
+        return None
+    name = key.replace("/", "__")
+    if urlparse(repo_url.strip()).netloc.lower() not in ("github.com", "www.github.com"):
+        # 非 GitHub 地址（如 file://）的路径段不一定是 owner/repo，加上完整地址的摘要避免重名
+        name += "__" + hashlib.sha1(repo_url.strip().encode("utf-8")).hexdigest()[:10]
+    return str(Path(git_mirror_dir()) / (name + ".git"))
+
+
+def run_git(args, cwd=None):
+    """运行 git 命令，成功时返回 stdout，失败或超时返回 None"""
+    try:
+        result = subprocess.run(
+            ["git"] + args,
+            cwd=cwd,
+            capture_output=True,
+            text=True,
+            timeout=GIT_TIMEOUT,
+            env={**os.environ, "GIT_TERMINAL_PROMPT": "0"},
+        )
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    if result.returncode != 0:
+        return None
+    return result.stdout
+
+
+def sync_git_mirror(repo_url):
+    """首次 clone --mirror，之后 git fetch 更新；返回镜像路径，失败返回 None"""
+    path = git_mirror_path(repo_url)
+    if not path:
+        return None
+    if Path(path).exists():
+        ok = run_git(["fetch", "--prune", "--quiet", "origin"], cwd=path)
+    else:
+        repo_url = repo_url.strip()
+        # 名单可能是旧数据或手工编辑的，clone 前再校验一次
+        if not is_valid_repo_url(repo_url):
+            return None
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        ok = run_git(["clone", "--mirror", "--quiet", "--", repo_url, path])
+    return path if ok is not None else None
+
+
+def git_mirror_synced_at(repo_url):
+    """镜像最近一次 clone / fetch 的时间（ISO），镜像不存在时返回 None"""
+    path = git_mirror_path(repo_url)
+    if not path:
+        return None
+    for marker in (Path(path) / "FETCH_HEAD", Path(path)):
+        if marker.exists():
+            return datetime.fromtimestamp(marker.stat().st_mtime, timezone.utc).isoformat()
+    return None
+
+
+def git_repo_info(path):
+    """从镜像得到与 fetch_repo_info 相同形状的信息：pushed_at 取所有分支上最新的提交时间"""
+    out = run_git(["log", "-1", "--all", "--format=%cI%x1f%H"], cwd=path)
+    if out is None:
+        return None
+    if not out.strip():
+        # 空仓库
+        return {"pushed_at": None, "head_sha": None}
+    committed, sha = out.strip().split("\x1f")
+    return {"pushed_at": webhook_timestamp(committed), "head_sha": sha}
+
+
+def git_commits_count(path):
+    """默认分支（镜像的 HEAD）上的准确提交数"""
+    out = run_git(["rev-list", "--count", "HEAD"], cwd=path)
+    if out is None:
+        # 空仓库没有 HEAD
+        return 0
+    try:
+        return int(out.strip())
+    except ValueError:
+        return -1
+
+
+def git_commit_history(repo_url, limit=30, since=None):
+    """从镜像读取默认分支的提交历史，格式与 parse_commit_history 相同；镜像不存在时返回 None"""
+    path = git_mirror_path(repo_url)
+    if not path or not Path(path).exists():
+        return None
+    args = ["log", "--format=%H%x1f%aI%x1f%an%x1f%s"]
+    if limit:
+        args.append(f"-n{int(limit)}")
+    if since:
+        args.append(f"--since={since}")
+    out = run_git(args + ["HEAD"], cwd=path)
+    if out is None:
+        return []
+    owner, repo = repo_owner_and_name(repo_url)
+    web_base = f"https://github.com/{owner}/{repo}" if "github.com" in repo_url else ""
+    history = []
+    for line in out.splitlines():
+        parts = line.split("\x1f", 3)
+        if len(parts) != 4:
+            continue
+        sha, date, author, message = parts
+        history.append({
+            "sha": sha[:7],
+            "message": message,
+            "date": webhook_timestamp(date),
+            "author": author,
+            "url": f"{web_base}/commit/{sha}" if web_base else ""
+        })
+    return history
+
+
 # ==================== Flask 路由 ====================
 
 @app.route("/")
@@ -691,12 +2498,210 @@ def leaderboard_page():
         return "内部错误", 500
 
 
+# 列表快照：每个数据代数构建一次 {"generation", "version", "rows", "by_name", "order", "body", "etag"}。
+# 代数变化时与上一快照逐行比较，变化记入 history：(代数, 上一快照代数, 变化的姓名, 删除的姓名, 顺序是否变化)
+LIST_INSTANCE = os.urandom(4).hex()  # 版本号带上进程标识，其他进程发出的版本按过期处理
+_list_snapshot = {"generation": None, "by_name": {}, "order": []}
+_list_history = deque(maxlen=LIST_HISTORY_LIMIT)
+_list_snapshot_lock = threading.Lock()
+
+
+def list_snapshot():
+    """当前数据代数的列表快照；数据变化后第一次调用时重建并记录与上一快照的差异"""
+    global _list_snapshot
+    generation = data_generation()
+    with _list_snapshot_lock:
+        previous = _list_snapshot
+        if previous["generation"] == generation:
+            return previous
+        rows = build_list_rows()
+        by_name = {r["name"]: r for r in rows}
+        order = [r["name"] for r in rows]
+        if previous["generation"] is not None:
+            changed = {name for name, row in by_name.items() if previous["by_name"].get(name) != row}
+            deleted = set(previous["by_name"]) - set(by_name)
+            _list_history.append((generation, previous["generation"], changed, deleted, order != previous["order"]))
+        body = json_body(rows)
+        _list_snapshot = {
+            "generation": generation,
+            "version": f"{LIST_INSTANCE}.{generation}",
+            "rows": rows,
+            "by_name": by_name,
+            "order": order,
+            "body": body,
+            "etag": hashlib.sha1(body).hexdigest()[:20],
+            "search": [list_search_key(r) for r in rows],
+            "summary": list_summary(rows),
+            "queries": {},
+        }
+        return _list_snapshot
+
+
+def list_changes_since(snapshot, since):
+    """since 版本之后变化的行：{"version", "full": False, "rows", "deleted", "summary"[, "order"]}
+
+    summary 为整个名单的统计，只加载了部分行的页面据此更新统计卡片。
+    since 不是本进程发出的版本、或早于保留的历史时返回 None（调用方发送完整列表）。
+    """
+    instance, _, generation = (since or "").partition(".")
+    if instance != LIST_INSTANCE or not generation.isdigit():
+        return None
+    generation = int(generation)
+    with _list_snapshot_lock:
+        entries = [entry for entry in _list_history
+                   if generation < entry[0] <= snapshot["generation"]]
+    # 历史要能从 since 连续接到当前快照
+    if not entries or entries[0][1] > generation:
+        return None
+    changed = set().union(*(entry[2] for entry in entries))
+    deleted = set().union(*(entry[3] for entry in entries))
+    by_name = snapshot["by_name"]
+    delta = {
+        "version": snapshot["version"],
+        "full": False,
+        "rows": [by_name[name] for name in snapshot["order"] if name in changed],
+        "deleted": sorted(name for name in changed | deleted if name not in by_name),
+        "summary": snapshot["summary"],
+    }
+    if any(entry[4] for entry in entries):
+        delta["order"] = snapshot["order"]
+    return delta
+
+
+def pinyin_initials(name):
+    return "".join(PINYIN_INITIALS.get(ch, "") for ch in name or "")
+
+
+def list_search_key(row):
+    """一行的搜索索引：(小写姓名, 小写仓库地址, 拼音首字母)，随快照构建一次"""
+    return ((row["name"] or "").lower(), (row["repo"] or "").lower(), pinyin_initials(row["name"]))
+
+
+def list_summary(rows):
+    """整个名单的统计（不受筛选与分页影响），分页时页面用它显示顶部统计卡片"""
+    total = len(rows)
+    return {
+        "total": total,
+        "updated": sum(1 for r in rows if r["updated_since_view"]),
+        "avg_score": sum(r["avg_score"] for r in rows) / total if total else 0,
+    }
+
+
+def list_query(snapshot, q="", updated_only=False, sort=None, descending=None):
+    """按搜索词、"仅已更新"与排序字段筛选快照，返回行下标列表
+
+    同一快照上的结果按参数缓存，翻页时不再重复筛选和排序。
+    """
+    key = (q, updated_only, sort, descending)
+    cached = snapshot["queries"].get(key)
+    if cached is not None:
+        return cached
+    rows = snapshot["rows"]
+    indexes = range(len(rows))
+    if updated_only:
+        indexes = [i for i in indexes if rows[i]["updated_since_view"]]
+    if q:
+        search = snapshot["search"]
+        indexes = [i for i in indexes
+                   if q in search[i][0] or q in search[i][1] or q in search[i][2]]
+    if sort:
+        sort_key, default_desc = LIST_SORT_FIELDS[sort]
+        reverse = default_desc if descending is None else descending
+        # sorted 是稳定排序，同值的行保持名单原有顺序
+        indexes = sorted(indexes, key=lambda i: sort_key(rows[i]), reverse=reverse)
+    indexes = list(indexes)
+    if len(snapshot["queries"]) >= LIST_QUERY_CACHE_SIZE:
+        snapshot["queries"].clear()
+    snapshot["queries"][key] = indexes
+    return indexes
+
+
+def list_page_response(snapshot, args):
+    """/api/list 的分页查询：{"version", "total", "rows", "next_cursor", "summary"}
+
+    cursor 是上一页返回的 next_cursor（结果中的偏移量）；翻页期间数据变化时 version 会不同，
+    调用方应从第一页重新获取。
+    """
+    q = (args.get("q") or "").strip().lower()
+    updated_only = args.get("updated_only", "").lower() in ("1", "true", "yes")
+    sort = args.get("sort") or None
+    if sort is not None and sort not in LIST_SORT_FIELDS:
+        return jsonify({"ok": False, "error": "invalid sort"}), 400
+    order = args.get("order")
+    if order not in (None, "asc", "desc"):
+        return jsonify({"ok": False, "error": "invalid order"}), 400
+    descending = None if order is None else order == "desc"
+    try:
+        limit = int(args.get("limit", LIST_PAGE_LIMIT_MAX))
+        offset = int(args.get("cursor") or 0)
+    except ValueError:
+        return jsonify({"ok": False, "error": "invalid limit or cursor"}), 400
+    if limit < 1 or offset < 0:
+        return jsonify({"ok": False, "error": "invalid limit or cursor"}), 400
+    limit = min(limit, LIST_PAGE_LIMIT_MAX)
+
+    indexes = list_query(snapshot, q, updated_only, sort, descending)
+    end = offset + limit
+    rows = snapshot["rows"]
+    page = {
+        "version": snapshot["version"],
+        "total": len(indexes),
+        "rows": [rows[i] for i in indexes[offset:end]],
+        "next_cursor": str(end) if end < len(indexes) else None,
+        "summary": snapshot["summary"],
+    }
+    body = json_body(page)
+    resp = conditional_json(body, hashlib.sha1(body).hexdigest()[:20])
+    resp.headers["X-List-Version"] = snapshot["version"]
+    return resp
+
+
 @app.route("/api/list")
 def api_list():
-    students = load_students()
+    """学员列表；?since=<version> 只返回该版本之后新增、修改与删除的行
+
+    完整列表的版本号在 X-List-Version 响应头里；since 已是最新版本时返回 304。
+    带 limit / cursor / q / updated_only / sort / order 任一参数时改为服务器端筛选、
+    排序与分页（见 list_page_response），不能与 since 同时使用。
+    """
+    snapshot = list_snapshot()
+    since = request.args.get("since")
+    if any(p in request.args for p in LIST_PAGE_PARAMS):
+        if since is not None:
+            return jsonify({"ok": False, "error": "since cannot be combined with paging"}), 400
+        return list_page_response(snapshot, request.args)
+    if since is None:
+        resp = conditional_json(snapshot["body"], snapshot["etag"])
+        resp.headers["X-List-Version"] = snapshot["version"]
+        return resp
+    if since == snapshot["version"]:
+        return "", 304
+    delta = list_changes_since(snapshot, since)
+    if delta is None:
+        delta = {"version": snapshot["version"], "full": True, "rows": snapshot["rows"],
+                 "summary": snapshot["summary"]}
+    return jsonify(delta)
+
+
+@app.route("/api/events")
+def api_events():
+    """Server-Sent Events：打分、名单变化、抓取状态与备注更新时推送，页面据此增量刷新"""
+    q = queue.Queue(maxsize=EVENTS_QUEUE_SIZE)
+    with _event_lock:
+        _event_subscribers.add(q)
+    resp = app.response_class(event_stream(q), mimetype="text/event-stream")
+    resp.headers["Cache-Control"] = "no-cache"
+    # 关闭反向代理（nginx）的响应缓冲，事件才能立即送达
+    resp.headers["X-Accel-Buffering"] = "no"
+    return resp
+
+
+def build_list_rows():
+    registry = student_registry()
+    students = registry["source"]
     state = load_state()
     rows = []
-    students_by_name = {s.get("name"): s for s in students if s.get("name")}
+    students_by_name = registry["by_name"]
 
     for s in students:
         name = s.get("name")
@@ -724,7 +2729,7 @@ def api_list():
                 scores = init_scores()
 
         commits_count = st.get("commits_count", 0)
-        avatar_url = get_avatar_url(repo)
+        avatar_url = repo_meta(repo)["avatar_url"]
         badges = calculate_badges(s, st)
 
         rows.append({
@@ -740,20 +2745,17 @@ def api_list():
             "badges": badges
         })
 
-    return jsonify(rows)
+    return rows
 
 
 @app.route("/api/leaderboard")
 def api_leaderboard():
     """Get leaderboard data with sorting options"""
     sort_by = request.args.get("sort_by", "avg_score")
-    cache_key = f'leaderboard_{sort_by}'
+    return cached_json_response(f'leaderboard_{sort_by}', lambda: build_leaderboard(sort_by))
 
-    # 检查缓存
-    cached = get_cached_response(cache_key)
-    if cached is not None:
-        return jsonify(cached)
 
+def build_leaderboard(sort_by):
     students = load_students()
     state = load_state()
 
@@ -772,7 +2774,7 @@ def api_leaderboard():
         total_score = sum(scores)
 
         # Get avatar URL
-        avatar_url = get_avatar_url(repo)
+        avatar_url = repo_meta(repo)["avatar_url"]
 
         # Calculate badges
         badges = calculate_badges(s, st)
@@ -801,16 +2803,14 @@ def api_leaderboard():
     for idx, item in enumerate(leaderboard, 1):
         item["rank"] = idx
 
-    # 缓存结果
-    set_cached_response(cache_key, leaderboard)
-    return jsonify(leaderboard)
+    return leaderboard
 
 
 @app.route("/api/check", methods=["POST"])
 def api_check():
     try:
         state = check_all()
-        return jsonify({"ok": True, "state": state})
+        return jsonify({"ok": True, "state": state, "sweep": dict(last_sweep_report)})
     except Exception as e:
         return jsonify({"ok": False, "error": str(e)}), 500
 
@@ -821,19 +2821,20 @@ def api_mark_viewed():
     name = data.get("name")
     if not name:
         return jsonify({"ok": False, "error": "missing name"}), 400
-    state = load_state()
-    entry = state.get(name, {})
-    entry["last_viewed_at"] = iso_now()
-    # 如果没有 last_known_pushed_at，尝试先 fetch
-    if "last_known_pushed_at" not in entry:
-        students = load_students()
-        repo = next((s.get("repo") for s in students if s.get("name") == name), None)
+    # 如果没有 last_known_pushed_at，尝试先 fetch（请求 GitHub 时不持有写锁）
+    info = None
+    if "last_known_pushed_at" not in get_state_entry(name):
+        student = get_student(name)
+        repo = student.get("repo") if student else None
         if repo:
             info = fetch_repo_info(repo)
-            if info:
-                entry["last_known_pushed_at"] = info.get("pushed_at")
-    state[name] = entry
-    save_state(state)
+    with storage_write(STATE_FILE):
+        entry = get_state_entry(name)
+        entry["last_viewed_at"] = iso_now()
+        if info and "last_known_pushed_at" not in entry:
+            entry["last_known_pushed_at"] = info.get("pushed_at")
+        put_state_entry(name, entry)
+    publish_state_event([name])
     return jsonify({"ok": True, "entry": entry})
 
 
@@ -842,7 +2843,11 @@ def api_settings():
     if request.method == "GET":
         return jsonify(load_settings())
     data = request.get_json() or {}
-    saved = save_settings(data)
+    if not isinstance(data, dict):
+        data = {}
+    # 只提交部分设置项时保留其余已保存的值
+    with data_file_lock(SETTINGS_FILE):
+        saved = save_settings({**load_settings(), **data})
     return jsonify({"ok": True, "settings": saved})
 
 
@@ -865,33 +2870,40 @@ def api_students_import():
     if not new_entries:
         return jsonify({"ok": False, "error": "no valid entries"}), 400
 
-    students = load_students()
-    existing_by_name = {s.get("name"): s for s in students if s.get("name")}
-    existing_repos = {s.get("repo") for s in students if s.get("repo")}
-    added = 0
-    updated = 0
-    skipped = 0
-    for entry in new_entries:
-        name = entry.get("name")
-        repo = entry.get("repo")
-        if not name or not repo:
-            skipped += 1
-            continue
-        if name in existing_by_name:
-            if existing_by_name[name].get("repo") != repo:
-                existing_by_name[name]["repo"] = repo
-                updated += 1
-            else:
+    with storage_write(STUDENTS_FILE):
+        registry = student_registry()
+        students = list(registry["source"])
+        positions = registry["positions"]
+        existing_repos = set(registry["by_repo"])
+        added = 0
+        updated = 0
+        skipped = 0
+        settings = load_settings()
+        for entry in new_entries:
+            name = entry.get("name")
+            repo = entry.get("repo")
+            if not name or not repo or not repo_url_allowed(repo, settings):
                 skipped += 1
-            continue
-        if repo in existing_repos:
-            skipped += 1
-            continue
-        students.append({"name": name, "repo": repo})
-        existing_repos.add(repo)
-        added += 1
+                continue
+            if name in positions:
+                i = positions[name]
+                if students[i].get("repo") != repo:
+                    # 共享的解析结果不能原地修改，换成新对象
+                    students[i] = {**students[i], "repo": repo}
+                    updated += 1
+                else:
+                    skipped += 1
+                continue
+            if repo in existing_repos:
+                skipped += 1
+                continue
+            students.append({"name": name, "repo": repo})
+            existing_repos.add(repo)
+            added += 1
 
-    save_students(students)
+        save_students(students)
+    if added or updated:
+        publish_event("roster", {"action": "import", "added": added, "updated": updated})
     return jsonify({"ok": True, "added": added, "updated": updated, "skipped": skipped})
 
 
@@ -908,15 +2920,17 @@ def api_students_add():
 
     if not name or not repo:
         return jsonify({"ok": False, "error": "missing name or repo"}), 400
+    if not repo_url_allowed(repo):
+        return jsonify({"ok": False, "error": "invalid repo"}), 400
 
-    students = load_students()
-    if any(s.get("name") == name for s in students):
-        return jsonify({"ok": False, "error": "name exists"}), 409
-    if any(s.get("repo") == repo for s in students):
-        return jsonify({"ok": False, "error": "repo exists"}), 409
+    with storage_write(STUDENTS_FILE):
+        if get_student(name):
+            return jsonify({"ok": False, "error": "name exists"}), 409
+        if get_student_by_repo(repo):
+            return jsonify({"ok": False, "error": "repo exists"}), 409
 
-    students.append({"name": name, "repo": repo, "scores": scores})
-    save_students(students)
+        put_student({"name": name, "repo": repo, "scores": scores})
+    publish_event("roster", {"action": "add", "name": name})
     return jsonify({"ok": True})
 
 
@@ -935,22 +2949,26 @@ def api_students_update():
 
     if not name or not repo or not old_name:
         return jsonify({"ok": False, "error": "missing name or repo"}), 400
-
-    students = load_students()
-    target = next((s for s in students if s.get("name") == old_name), None)
-    if not target:
-        return jsonify({"ok": False, "error": "not found"}), 404
-
-    if name != old_name and any(s.get("name") == name for s in students):
-        return jsonify({"ok": False, "error": "name exists"}), 409
-    if any(s.get("repo") == repo and s is not target for s in students):
-        return jsonify({"ok": False, "error": "repo exists"}), 409
-
-    target["name"] = name
-    target["repo"] = repo
-    if scores_provided:
-        target["scores"] = scores
-    save_students(students)
+    if not repo_url_allowed(repo):
+        return jsonify({"ok": False, "error": "invalid repo"}), 400
+
+    with storage_write(STUDENTS_FILE):
+        target = get_student(old_name)
+        if not target:
+            return jsonify({"ok": False, "error": "not found"}), 404
+
+        if name != old_name and get_student(name):
+            return jsonify({"ok": False, "error": "name exists"}), 409
+        other = get_student_by_repo(repo)
+        if other and other.get("name") != old_name:
+            return jsonify({"ok": False, "error": "repo exists"}), 409
+
+        target["name"] = name
+        target["repo"] = repo
+        if scores_provided:
+            target["scores"] = scores
+        put_student(target, old_name)
+    publish_event("roster", {"action": "update", "name": name, "old_name": old_name})
     return jsonify({"ok": True})
 
 
@@ -961,128 +2979,500 @@ def api_students_delete():
     if not name:
         return jsonify({"ok": False, "error": "missing name"}), 400
 
-    students = load_students()
-    filtered = [s for s in students if s.get("name") != name]
-    if len(filtered) == len(students):
+    if not delete_student(name):
         return jsonify({"ok": False, "error": "not found"}), 404
 
-    save_students(filtered)
+    publish_event("roster", {"action": "delete", "name": name})
     return jsonify({"ok": True})
 
 
-def load_remarks():
+def load_remarks_json():
     """Load teacher remarks for students"""
-    remarks_file = resolve_data_file('remarks.json')
-    if not os.path.exists(remarks_file):
+    if not os.path.exists(REMARKS_FILE):
         return {}
     try:
-        with open(remarks_file, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        return read_json_cached(REMARKS_FILE)
     except Exception:
         return {}
 
-def save_remarks(remarks):
+def save_remarks_json(remarks):
     """Save teacher remarks"""
-    remarks_file = resolve_data_file('remarks.json')
-    p = Path(remarks_file)
-    if not p.parent.exists():
-        p.parent.mkdir(parents=True, exist_ok=True)
-    with open(str(p), 'w', encoding='utf-8') as f:
-        json.dump(remarks, f, ensure_ascii=False, indent=2)
+    return atomic_write_json(REMARKS_FILE, remarks, indent=2)
+
+def load_remarks():
+    if use_sqlite():
+        return sqlite_load_keyed("remarks")
+    return load_remarks_json()
+
+def save_remarks(remarks):
+    if use_sqlite():
+        return sqlite_save_keyed("remarks", remarks)
+    return save_remarks_json(remarks)
+
+def get_remarks(name):
+    """One student's remarks, or None"""
+    if use_sqlite():
+        return sqlite_get_keyed("remarks", name)
+    return copy.deepcopy(load_remarks().get(name))
+
+def put_remarks(name, remarks):
+    if use_sqlite():
+        return sqlite_put_keyed("remarks", {name: remarks})
+    with storage_write(REMARKS_FILE):
+        all_remarks = dict(load_remarks())
+        all_remarks[name] = remarks
+        save_remarks(all_remarks)
+
+def parse_commit_history(commits):
+    """Reduce a GitHub commits response to the timeline fields we display"""
+    if not isinstance(commits, list):
+        return []
+    history = []
+    for commit in commits:
+        commit_data = commit.get("commit", {})
+        author_data = commit_data.get("author", {})
+        committer_data = commit_data.get("committer") or {}
+
+        history.append({
+            "sha": commit.get("sha", "")[:7],
+            "message": commit_data.get("message", "No message"),
+            "date": author_data.get("date", ""),
+            # since= 按提交时间过滤；rebase / cherry-pick 后作者时间可能早于它
+            "committed": committer_data.get("date") or author_data.get("date", ""),
+            "author": author_data.get("name", "Unknown"),
+            "url": commit.get("html_url", "")
+        })
+    return history
+
+def fetch_commit_history(repo_url, limit=30, since=None):
+    """Fetch commit history for timeline visualization
+
+    Returns an empty list on any failure; use fetch_commit_page() to tell
+    failures apart from an empty result.
+    """
+    return fetch_commit_page(repo_url, limit, since) or []
+
+def fetch_commit_page(repo_url, limit=30, since=None, page=1):
+    """Fetch one page of commit history, optionally only commits after `since`.
 
-def fetch_commit_history(repo_url, limit=30):
-    """Fetch commit history for timeline visualization"""
+    Returns None when the request fails.
+    """
     owner, repo = repo_owner_and_name(repo_url)
     if not owner or not repo:
-        return []
+        return None
 
-    api_url = f"https://api.github.com/repos/{owner}/{repo}/commits"
-    headers = {"Accept": "application/vnd.github.v3+json"}
-    if GITHUB_TOKEN:
-        headers["Authorization"] = f"token {GITHUB_TOKEN}"
+    api_url = f"{GITHUB_API_URL}/repos/{owner}/{repo}/commits"
+    params = {"per_page": limit}
+    if since:
+        params["since"] = since
+    if page > 1:
+        params["page"] = page
 
     try:
-        resp = requests.get(api_url, headers=headers, timeout=10, params={"per_page": limit})
-        if resp.status_code != 200:
-            # debug output removed
-            return []
-
-        commits = resp.json()
-        if not isinstance(commits, list):
+        # since 每次都不同，不值得保存校验信息
+        status, history, _ = github_get(api_url, params=params, transform=parse_commit_history,
+                                        use_cache=not since)
+        if status != 200:
             # debug output removed
-            return []
-
-        history = []
-        for commit in commits:
-            commit_data = commit.get("commit", {})
-            author_data = commit_data.get("author", {})
-
-            history.append({
-                "sha": commit.get("sha", "")[:7],
-                "message": commit_data.get("message", "No message"),
-                "date": author_data.get("date", ""),
-                "author": author_data.get("name", "Unknown"),
-                "url": commit.get("html_url", "")
-            })
+            return None
         return history
     except requests.exceptions.Timeout:
         # debug output removed
-        return []
+        return None
     except requests.exceptions.RequestException:
         # debug output removed
-        return []
+        return None
     except Exception:
         # debug output removed
-        return []
+        return None
 
-def load_score_history():
-    """Load historical score changes"""
-    history_file = resolve_data_file('score_history.json')
-    if not os.path.exists(history_file):
-        return {}
+def fetch_new_commits(repo_url, limit=30, since=None):
+    """Fetch the commits after `since`, following pages until a short one.
+
+    Without since the newest `limit` commits are already a complete prefix of
+    the history, so one page is enough. With since every page up to
+    COMMIT_CACHE_LIMIT commits is needed, otherwise the cache would have a gap
+    that a later since= never fills. Returns None when any page fails.
+    """
+    if not since:
+        return fetch_commit_page(repo_url, limit)
+    commits = []
+    page = 1
+    while True:
+        batch = fetch_commit_page(repo_url, COMMIT_PAGE_SIZE, since, page)
+        if batch is None:
+            return None
+        commits.extend(batch)
+        if len(batch) < COMMIT_PAGE_SIZE or len(commits) >= COMMIT_CACHE_LIMIT:
+            return commits
+        page += 1
+
+def commit_history_since(commits):
+    """since= for an incremental fetch: newest cached commit time minus an overlap"""
+    newest = max((parse_timestamp(c.get("committed") or c.get("date")) or 0 for c in commits), default=0)
+    if not newest:
+        return None
+    return datetime.fromtimestamp(newest - COMMIT_SINCE_OVERLAP, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+def load_commit_cache():
+    """Load the local per-repo commit history
+
+    Shape: {owner/repo: {"commits": [...newest first], "synced_pushed_at": iso}}.
+    synced_pushed_at is the pushed_at the history is known to be complete for.
+    The parsed file is shared via read_json_cached (re-parsed only after the
+    file changes); copy before modifying.
+    """
     try:
-        with open(history_file, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        cache = read_json_cached(state_sibling_file(COMMIT_CACHE_NAME))
     except Exception:
         return {}
+    return cache if isinstance(cache, dict) else {}
+
+def save_commit_cache(cache):
+    """Save the local commit history"""
+    return atomic_write_json(state_sibling_file(COMMIT_CACHE_NAME), cache)
+
+def merge_commits(existing, new_commits):
+    """Merge commit lists by sha, newest first, capped at COMMIT_CACHE_LIMIT"""
+    seen = set()
+    merged = []
+    for commit in list(new_commits) + list(existing or []):
+        sha = commit.get("sha")
+        if not sha or sha in seen:
+            continue
+        seen.add(sha)
+        merged.append(commit)
+    merged.sort(key=lambda c: parse_timestamp(c.get("date")) or 0, reverse=True)
+    return merged[:COMMIT_CACHE_LIMIT]
+
+def commit_cache_entry(cache, key):
+    entry = cache.get(key)
+    if isinstance(entry, dict):
+        return entry
+    return {"commits": entry if isinstance(entry, list) else [], "synced_pushed_at": None}
+
+def update_commit_cache(key, new_commits, synced_pushed_at=None):
+    """Merge commits into the local history; synced_pushed_at marks it complete up to that push"""
+    with data_file_lock(state_sibling_file(COMMIT_CACHE_NAME)):
+        # 解析缓存由所有读取方共享，不能原地修改
+        cache = dict(load_commit_cache())
+        entry = dict(commit_cache_entry(cache, key))
+        entry["commits"] = merge_commits(entry.get("commits"), new_commits)
+        if synced_pushed_at:
+            entry["synced_pushed_at"] = synced_pushed_at
+        entry["synced_at"] = iso_now()
+        cache[key] = entry
+        save_commit_cache(cache)
+    return entry
+
+def commit_history_is_stale(entry, last_known_pushed_at):
+    """The cached history misses pushes newer than the last sync"""
+    synced = parse_timestamp(entry.get("synced_pushed_at"))
+    known = parse_timestamp(last_known_pushed_at)
+    return synced is None or (known is not None and known > synced)
+
+def get_commit_history(repo_url, last_known_pushed_at=None, limit=30):
+    """Commit history for the details modal, served from the local cache.
+
+    GitHub is only asked when the repo has been pushed since the cache was
+    last synced, and then only for commits committed after the newest cached
+    one (minus COMMIT_SINCE_OVERLAP; merge_commits drops the repeats).
+    """
+    key = canonical_repo(repo_url)
+    if not key:
+        return []
+    entry = commit_cache_entry(load_commit_cache(), key)
+    commits = entry.get("commits") or []
+    if not commit_history_is_stale(entry, last_known_pushed_at):
+        return commits[:limit]
+
+    fetched = fetch_new_commits(repo_url, limit=limit, since=commit_history_since(commits))
+    flush_http_cache()
+    if fetched is None:
+        # 网络失败时退回本地缓存
+        return commits[:limit]
+    entry = update_commit_cache(key, fetched, last_known_pushed_at or iso_now())
+    return entry["commits"][:limit]
+
+# 详情弹窗的后台刷新：{owner/repo: Thread}，同一仓库同时只有一个刷新在跑
+_history_refreshes = {}
+_history_refresh_lock = threading.Lock()
+
+def _run_history_refresh(key, repo_url, last_known_pushed_at, limit):
+    try:
+        get_commit_history(repo_url, last_known_pushed_at, limit)
+    except Exception:
+        pass
+    finally:
+        with _history_refresh_lock:
+            if _history_refreshes.get(key) is threading.current_thread():
+                del _history_refreshes[key]
+
+def refresh_commit_history_async(repo_url, last_known_pushed_at=None, limit=30):
+    """Refresh a repo's history in a background thread, deduplicated per repo"""
+    key = canonical_repo(repo_url)
+    if not key:
+        return None
+    with _history_refresh_lock:
+        running = _history_refreshes.get(key)
+        if running is not None and running.is_alive():
+            return running
+        worker = threading.Thread(
+            target=_run_history_refresh,
+            args=(key, repo_url, last_known_pushed_at, limit),
+            daemon=True,
+        )
+        _history_refreshes[key] = worker
+        worker.start()
+        return worker
+
+def cached_commit_history(repo_url, last_known_pushed_at=None, limit=30):
+    """Stale-while-revalidate: return the local history at once, refresh in background
+
+    Returns (commits, synced_at, refreshing). synced_at is when the cached
+    history was last written; refreshing is True while a background fetch for
+    newer commits is pending, so the caller can poll for the update.
+    """
+    key = canonical_repo(repo_url)
+    if not key:
+        return [], None, False
+    entry = commit_cache_entry(load_commit_cache(), key)
+    refreshing = commit_history_is_stale(entry, last_known_pushed_at)
+    if refreshing:
+        refresh_commit_history_async(repo_url, last_known_pushed_at, limit)
+    return (entry.get("commits") or [])[:limit], entry.get("synced_at"), refreshing
 
-def save_score_history(history):
+def score_journal_file():
+    """分数历史日志（JSONL，只追加），与 score_history.json 同目录"""
+    return str(Path(SCORE_HISTORY_FILE).with_suffix(".jsonl"))
+
+
+# 分数历史日志的内存索引：每个学员最近 SCORE_HISTORY_LIMIT 条记录在日志中的字节偏移。
+# size 为已扫描到的位置，文件变长时只扫描新增部分；inode 变化（压缩或外部替换）时重建
+_score_index = {"path": None, "ino": None, "size": 0, "offsets": {}, "lines": 0, "dead": 0}
+_score_index_lock = threading.RLock()
+
+
+def migrate_score_history_journal():
+    """把旧版 score_history.json 转换为日志（启动时、scripts/migrate_schema.py 与 migrate_json_to_sqlite 调用，原文件保留不动）
+
+    日志已存在或没有旧文件时返回 None；否则返回转换的记录数。读取分数历史不会触发转换。
+    """
+    path = score_journal_file()
+    if os.path.exists(path) or not os.path.exists(SCORE_HISTORY_FILE):
+        return None
+    with _score_index_lock, data_file_lock(path):
+        # 可能有其他进程刚完成转换
+        if os.path.exists(path):
+            return None
+        try:
+            with open(SCORE_HISTORY_FILE, "r", encoding="utf-8") as f:
+                history = json.load(f)
+        except Exception:
+            return None
+        if not isinstance(history, dict):
+            return None
+        payload = journal_payload(history)
+        atomic_write_bytes(path, payload)
+    return payload.count(b"\n")
+
+
+def journal_payload(history):
+    return "".join(
+        json.dumps({"name": name, **item}, ensure_ascii=False) + "\n"
+        for name, items in history.items() for item in items[-SCORE_HISTORY_LIMIT:]
+    ).encode("utf-8")
+
+
+def _scan_score_journal(f, index):
+    """从 index["size"] 开始扫描日志，把每行的偏移记入索引；末尾不完整的行留到下次"""
+    pos = index["size"]
+    f.seek(pos)
+    for line in f:
+        if not line.endswith(b"\n"):
+            break
+        index["lines"] += 1
+        try:
+            name = json.loads(line)["name"]
+        except (ValueError, KeyError, TypeError):
+            index["dead"] += 1
+            pos += len(line)
+            continue
+        offsets = index["offsets"].setdefault(name, [])
+        offsets.append(pos)
+        if len(offsets) > SCORE_HISTORY_LIMIT:
+            del offsets[0]
+            index["dead"] += 1
+        pos += len(line)
+    index["size"] = pos
+
+
+def _sync_score_index():
+    """让内存索引跟上日志文件（调用方持有 _score_index_lock）"""
+    index = _score_index
+    path = score_journal_file()
+    try:
+        st = os.stat(path)
+    except OSError:
+        st = None
+    ino = st.st_ino if st else None
+    size = st.st_size if st else 0
+    if index["path"] != path or index["ino"] != ino or size < index["size"]:
+        index.update(path=path, ino=ino, size=0, offsets={}, lines=0, dead=0)
+    if size > index["size"]:
+        with open(path, "rb") as f:
+            _scan_score_journal(f, index)
+    return index
+
+
+def _read_journal_lines(path, offsets):
+    items = []
+    with open(path, "rb") as f:
+        for offset in offsets:
+            f.seek(offset)
+            item = json.loads(f.readline())
+            item.pop("name", None)
+            items.append(item)
+    return items
+
+
+def load_score_history_json():
+    """Load historical score changes"""
+    # 持有文件锁，读取期间其他进程不会压缩（替换）日志
+    with _score_index_lock, data_file_lock(score_journal_file()):
+        index = _sync_score_index()
+        if not index["offsets"]:
+            return {}
+        return {name: _read_journal_lines(index["path"], offsets)
+                for name, offsets in index["offsets"].items()}
+
+
+def save_score_history_json(history):
     """Save score history"""
-    history_file = resolve_data_file('score_history.json')
-    p = Path(history_file)
-    if not p.parent.exists():
-        p.parent.mkdir(parents=True, exist_ok=True)
-    with open(str(p), 'w', encoding='utf-8') as f:
-        json.dump(history, f, ensure_ascii=False, indent=2)
+    path = score_journal_file()
+    with _score_index_lock, data_file_lock(path):
+        written = atomic_write_bytes(path, journal_payload(history))
+        _sync_score_index()
+    return written
+
+
+def compact_score_journal():
+    """重写日志，只保留每个学员最近 SCORE_HISTORY_LIMIT 条记录；返回写入的字节数"""
+    with _score_index_lock, data_file_lock(score_journal_file()):
+        return save_score_history_json(load_score_history_json())
+
+
+def journal_score_history(name, limit=None):
+    with _score_index_lock, data_file_lock(score_journal_file()):
+        index = _sync_score_index()
+        offsets = index["offsets"].get(name, [])
+        if limit:
+            offsets = offsets[-limit:]
+        if not offsets:
+            return []
+        return _read_journal_lines(index["path"], offsets)
+
+
+def append_score_journal(name, item):
+    """追加一行分数变更；过期行多于 SCORE_JOURNAL_COMPACT_MIN 且多于有效行时压缩日志"""
+    line = (json.dumps({"name": name, **item}, ensure_ascii=False) + "\n").encode("utf-8")
+    path = score_journal_file()
+    with _score_index_lock, data_file_lock(path):
+        # 启动迁移之后才出现的旧文件：写入前先转换，以免追加的日志遮住旧记录
+        migrate_score_history_journal()
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "a+b") as f:
+            end = f.seek(0, os.SEEK_END)
+            if end:
+                f.seek(end - 1)
+                if f.read(1) != b"\n":
+                    # 上次写到一半崩溃留下的不完整行，另起一行
+                    line = b"\n" + line
+            f.write(line)
+        index = _sync_score_index()
+        if index["dead"] > max(SCORE_JOURNAL_COMPACT_MIN, index["lines"] - index["dead"]):
+            compact_score_journal()
+    return len(line)
+
+def load_score_history():
+    if not use_sqlite():
+        return load_score_history_json()
+    history = {}
+    for name, data in get_db().execute("SELECT name, data FROM score_history ORDER BY id"):
+        history.setdefault(name, []).append(json.loads(data))
+    return history
+
+def sqlite_save_score_history(history):
+    rows = [(name, json.dumps(item, ensure_ascii=False))
+            for name, items in history.items() for item in items[-SCORE_HISTORY_LIMIT:]]
+    with db_transaction() as conn:
+        conn.execute("DELETE FROM score_history")
+        conn.executemany("INSERT INTO score_history (name, data) VALUES (?, ?)", rows)
+    return len(rows)
+
+def save_score_history(history):
+    if use_sqlite():
+        return sqlite_save_score_history(history)
+    return save_score_history_json(history)
+
+def get_score_history(name, limit=None):
+    """One student's score changes, oldest first; limit keeps only the newest entries"""
+    if not use_sqlite():
+        return journal_score_history(name, limit)
+    sql = "SELECT data FROM score_history WHERE name = ? ORDER BY id DESC"
+    params = (name,)
+    if limit:
+        sql += " LIMIT ?"
+        params = (name, limit)
+    rows = get_db().execute(sql, params).fetchall()
+    return [json.loads(data) for (data,) in reversed(rows)]
 
 def record_score_change(name, phase, old_score, new_score):
     """Record a score change for trend analysis"""
-    history = load_score_history()
-    if name not in history:
-        history[name] = []
-
-    history[name].append({
+    item = {
         "timestamp": iso_now(),
         "phase": phase,
         "old_score": old_score,
         "new_score": new_score
-    })
-
-    # Keep only last 100 changes per student
-    if len(history[name]) > 100:
-        history[name] = history[name][-100:]
-
-    save_score_history(history)
+    }
+    if use_sqlite():
+        with db_transaction() as conn:
+            conn.execute("INSERT INTO score_history (name, data) VALUES (?, ?)",
+                         (name, json.dumps(item, ensure_ascii=False)))
+            # Keep only the last SCORE_HISTORY_LIMIT changes per student
+            conn.execute(
+                "DELETE FROM score_history WHERE name = ? AND id <= ("
+                "SELECT id FROM score_history WHERE name = ? ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                (name, name, SCORE_HISTORY_LIMIT),
+            )
+        return
+
+    append_score_journal(name, item)
+
+def migrate_json_to_sqlite():
+    """One-shot import of the JSON data files into the SQLite database
+
+    Replaces the database contents; the JSON files are left in place.
+    Returns the number of rows written per table.
+    """
+    students = [dict(s) for s in load_students_json() if isinstance(s, dict)]
+    for s in students:
+        normalize_student_record(s)
+    state = load_state_json()
+    remarks = load_remarks_json()
+    # SQLite 模式下启动时不转换旧版 score_history.json，这里先转换成日志再读
+    migrate_score_history_journal()
+    history = load_score_history_json()
+    sqlite_save_students(students)
+    sqlite_save_keyed("state", state)
+    sqlite_save_keyed("remarks", remarks)
+    history_rows = sqlite_save_score_history(history)
+    return {"students": len(students), "state": len(state), "remarks": len(remarks), "score_history": history_rows}
 
 @app.route("/api/students/<name>/details")
 def api_student_details(name):
     """Get detailed information for a specific student"""
-    students = load_students()
-    state = load_state()
-    remarks = load_remarks()
-    score_history = load_score_history()
-
-    student = next((s for s in students if s.get("name") == name), None)
+    student = get_student(name)
     if not student:
         return jsonify({"ok": False, "error": "not found"}), 404
 
@@ -1091,29 +3481,38 @@ def api_student_details(name):
     if not isinstance(scores, list) or len(scores) != 5:
         scores = init_scores()
 
-    st = state.get(name, {})
+    st = get_state_entry(name)
 
-    # Fetch commit history
-    commits = fetch_commit_history(repo, limit=30)
+    # Commit history from local disk only; newer commits are fetched in the
+    # background and picked up by the modal's follow-up poll
+    git_mode = load_settings().get("fetch_backend") == "git"
+    commits = git_commit_history(repo, limit=30) if git_mode else None
+    if commits is None:
+        commits, synced_at, refreshing = cached_commit_history(repo, st.get("last_known_pushed_at"), limit=30)
+        activity = commits
+    else:
+        # git 镜像模式下按每天的真实提交数统计，不受 30 条的限制
+        activity = git_commit_history(repo, limit=None, since="30 days ago") or []
+        synced_at, refreshing = git_mirror_synced_at(repo), False
 
     # Get score history
-    student_score_history = score_history.get(name, [])
+    student_score_history = get_score_history(name, limit=20)
 
     # Get remarks
-    student_remarks = remarks.get(name, {
+    student_remarks = get_remarks(name) or {
         "text": "",
         "tags": [],
         "updated_at": None
-    })
+    }
 
     # Calculate commit frequency (commits per day over last 30 days)
     commit_frequency = []
-    if commits:
+    if activity:
         from collections import defaultdict
         from datetime import datetime, timedelta
 
         commits_by_date = defaultdict(int)
-        for commit in commits:
+        for commit in activity:
             try:
                 commit_date = datetime.fromisoformat(commit["date"].replace("Z", "+00:00"))
                 date_str = commit_date.strftime("%Y-%m-%d")
@@ -1161,13 +3560,15 @@ def api_student_details(name):
             "commits_count": st.get("commits_count", 0),
             "last_pushed": st.get("last_known_pushed_at"),
             "last_viewed": st.get("last_viewed_at"),
-            "avatar_url": get_avatar_url(repo),
+            "avatar_url": repo_meta(repo)["avatar_url"],
             "badges": calculate_badges(student, st)
         },
         "commits": commits,
+        "commits_synced_at": synced_at,
+        "commits_refreshing": refreshing,
         "commit_frequency": commit_frequency,
         "score_trend": score_trend,
-        "score_history": student_score_history[-20:],
+        "score_history": student_score_history,
         "remarks": student_remarks
     }
 
@@ -1177,14 +3578,12 @@ def api_student_details(name):
 @app.route("/api/students/<name>/remarks", methods=["GET", "POST"])
 def api_student_remarks(name):
     """Get or update teacher remarks for a student"""
-    remarks = load_remarks()
-
     if request.method == "GET":
-        return jsonify(remarks.get(name, {
+        return jsonify(get_remarks(name) or {
             "text": "",
             "tags": [],
             "updated_at": None
-        }))
+        })
 
     # POST: Update remarks
     data = request.get_json() or {}
@@ -1194,14 +3593,15 @@ def api_student_remarks(name):
     if not isinstance(tags, list):
         tags = []
 
-    remarks[name] = {
+    remarks = {
         "text": text,
         "tags": tags,
         "updated_at": iso_now()
     }
 
-    save_remarks(remarks)
-    return jsonify({"ok": True, "remarks": remarks[name]})
+    put_remarks(name, remarks)
+    publish_event("remarks", {"name": name})
+    return jsonify({"ok": True, "remarks": remarks})
 
 @app.route("/api/students/score", methods=["POST"])
 def api_students_score():
@@ -1219,28 +3619,36 @@ def api_students_score():
     except Exception:
         return jsonify({"ok": False, "error": "invalid phase or score"}), 400
 
-    students = load_students()
-    target = next((s for s in students if s.get("name") == name), None)
-    if not target:
-        return jsonify({"ok": False, "error": "not found"}), 404
+    with storage_write(STUDENTS_FILE):
+        target = get_student(name)
+        if not target:
+            return jsonify({"ok": False, "error": "not found"}), 404
 
-    if "scores" not in target or not isinstance(target["scores"], list) or len(target["scores"]) != 5:
-        target["scores"] = init_scores()
+        if "scores" not in target or not isinstance(target["scores"], list) or len(target["scores"]) != 5:
+            target["scores"] = init_scores()
 
-    old_score = target["scores"][phase]
-    target["scores"][phase] = score
+        old_score = target["scores"][phase]
+        target["scores"][phase] = score
 
-    # Record score change for history
-    if old_score != score:
-        record_score_change(name, phase, old_score, score)
+        # Record score change for history
+        if old_score != score:
+            record_score_change(name, phase, old_score, score)
 
-    save_students(students)
-    invalidate_cache()
+        put_student(target)
+    if old_score != score:
+        publish_event("score", {"name": name, "phase": phase, "score": score})
     return jsonify({"ok": True, "student": {"name": target.get("name"), "repo": target.get("repo"), "scores": target.get("scores")}})
 
 
 @app.route('/api/export/csv')
 def api_export_csv():
+    resp = make_response(cached_response_body("csv", build_students_csv)[0])
+    resp.headers['Content-Type'] = 'text/csv; charset=utf-8'
+    resp.headers['Content-Disposition'] = 'attachment; filename=students_scores.csv'
+    return resp
+
+
+def build_students_csv():
     students = load_students()
     state = load_state()
 
@@ -1269,24 +3677,137 @@ def api_export_csv():
 
     # 添加 UTF-8 BOM 以便 Excel 正确识别中文
     csv_content = '\ufeff' + output.getvalue()
-    resp = make_response(csv_content.encode('utf-8'))
-    resp.headers['Content-Type'] = 'text/csv; charset=utf-8'
-    resp.headers['Content-Disposition'] = 'attachment; filename=students_scores.csv'
-    return resp
+    return csv_content.encode('utf-8')
+
+
+# 最近处理过的 X-GitHub-Delivery（按处理顺序，只用键），超过 WEBHOOK_DELIVERY_HISTORY 时丢弃最早的
+_webhook_deliveries = {}
+_webhook_delivery_lock = threading.Lock()
+
+
+def webhook_delivery_seen(delivery_id):
+    with _webhook_delivery_lock:
+        return bool(delivery_id) and delivery_id in _webhook_deliveries
+
+
+def remember_webhook_delivery(delivery_id):
+    if not delivery_id:
+        return
+    with _webhook_delivery_lock:
+        _webhook_deliveries[delivery_id] = True
+        while len(_webhook_deliveries) > WEBHOOK_DELIVERY_HISTORY:
+            del _webhook_deliveries[next(iter(_webhook_deliveries))]
+
+
+def verify_webhook_signature(body, signature):
+    """校验 X-Hub-Signature-256（HMAC-SHA256）"""
+    if not GITHUB_WEBHOOK_SECRET or not signature or not signature.startswith("sha256="):
+        return False
+    expected = hmac.new(GITHUB_WEBHOOK_SECRET.encode("utf-8"), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature[len("sha256="):])
+
+
+def webhook_timestamp(value):
+    """push 事件里的时间（Unix 时间戳或带时区的 ISO 字符串）统一成 REST API 的 UTC 格式"""
+    if isinstance(value, str):
+        value = parse_timestamp(value) if value else None
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    return value
+
+
+@app.route("/api/webhooks/github", methods=["POST"])
+def api_webhook_github():
+    """接收 GitHub push webhook，直接更新推送时间、提交数与本地提交历史"""
+    if not GITHUB_WEBHOOK_SECRET:
+        return jsonify({"ok": False, "error": "webhook secret not configured"}), 403
+    body = request.get_data()
+    if not verify_webhook_signature(body, request.headers.get("X-Hub-Signature-256", "")):
+        return jsonify({"ok": False, "error": "invalid signature"}), 401
+
+    event = request.headers.get("X-GitHub-Event", "")
+    if event == "ping":
+        return jsonify({"ok": True, "event": "ping"})
+    if event != "push":
+        return jsonify({"ok": True, "ignored": event})
+    # 重投（手动重发、超时后重试）与原投递的 ID 相同，再处理一次会重复累加提交数
+    delivery_id = request.headers.get("X-GitHub-Delivery")
+    if webhook_delivery_seen(delivery_id):
+        return jsonify({"ok": True, "ignored": "duplicate delivery"})
+
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        return jsonify({"ok": False, "error": "invalid payload"}), 400
+    repository = payload.get("repository") or {}
+    key = canonical_repo(repository.get("html_url") or "") or (repository.get("full_name") or "").lower()
+    student = get_student_by_repo_key(key)
+    if not student:
+        return jsonify({"ok": True, "ignored": "unknown repository"})
+
+    name = student.get("name")
+    commits = [c for c in payload.get("commits") or [] if isinstance(c, dict)]
+    pushed_at = webhook_timestamp(repository.get("pushed_at"))
+    default_branch = repository.get("default_branch") or repository.get("master_branch")
+    on_default_branch = payload.get("ref") == f"refs/heads/{default_branch}"
+
+    with storage_write(STATE_FILE):
+        entry = get_state_entry(name)
+        previous_pushed_at = entry.get("last_known_pushed_at")
+        # 与 merge_state_changes 一样新的为准：迟到或乱序的投递不能把推送时间往回改，
+        # 其推送（或更新的推送）已计入提交数，也不再累加
+        stale = bool(pushed_at and previous_pushed_at
+                     and (parse_timestamp(pushed_at) or 0) <= (parse_timestamp(previous_pushed_at) or 0))
+        if pushed_at and not stale:
+            entry["last_known_pushed_at"] = pushed_at
+            entry.setdefault("last_viewed_at", None)
+        # 仓库刚有推送，恢复为基础检查间隔
+        schedule_next_check(entry, "pushed", load_settings())
+        if on_default_branch and commits and not payload.get("deleted"):
+            if "commits_count" in entry and not payload.get("forced") and not stale:
+                entry["commits_count"] += len(commits)
+                # 提交数已准确，后台对账时无需重新统计；事件被截断时交给对账
+                if pushed_at and len(commits) < WEBHOOK_COMMITS_LIMIT:
+                    entry["commits_pushed_at"] = pushed_at
+            history = [{
+                "sha": (c.get("id") or "")[:7],
+                "message": c.get("message", "No message"),
+                "date": webhook_timestamp(c.get("timestamp", "")),
+                "committed": webhook_timestamp(c.get("timestamp", "")),
+                "author": (c.get("author") or {}).get("name", "Unknown"),
+                "url": c.get("url", "")
+            } for c in commits]
+            # 缓存在上一次推送时是完整的、且事件未被截断，则这次推送后仍然完整
+            synced = commit_cache_entry(load_commit_cache(), key).get("synced_pushed_at")
+            complete = (synced is not None and synced == previous_pushed_at and not stale
+                        and not payload.get("forced") and len(commits) < WEBHOOK_COMMITS_LIMIT)
+            update_commit_cache(key, history, pushed_at if complete else None)
+        put_state_entry(name, entry)
+    remember_webhook_delivery(delivery_id)
+    publish_state_event([name])
+    return jsonify({"ok": True, "name": name, "entry": entry})
 
 
 @app.route("/view/<path:name>")
 def view_repo(name):
     # 根据名字找到 repo，标记为已查看并跳转
-    students = load_students()
-    decoded = name
-    repo = next((s.get("repo") for s in students if s.get("name") == decoded), None)
+    student = get_student(name)
+    repo = student.get("repo") if student else None
     if not repo:
         return abort(404)
     # 标记为已查看
-    state = load_state()
-    entry = state.get(decoded, {})
-    entry["last_viewed_at"] = iso_now()
-    state[decoded] = entry
-    save_state(state)
+    with storage_write(STATE_FILE):
+        entry = get_state_entry(name)
+        entry["last_viewed_at"] = iso_now()
+        put_state_entry(name, entry)
+    publish_state_event([name])
     return redirect(repo)
+
+
+# 启动时一次性升级旧版学员数据与分数历史，之后读取只读不写
+migrate_students_schema()
+if not use_sqlite():
+    migrate_score_history_journal()
+
+# 启动后台检查线程（守护线程）；放在模块末尾，确保线程用到的函数都已定义
+t = start_background_poller()
@@ -3,13 +3,50 @@
 快速测试脚本 - 验证主页和 API 是否正常工作
 """
 
+import os
 import sys
 import json
+import shutil
+import tempfile
+from contextlib import contextmanager
 from pathlib import Path
 
 # 添加项目路径
 sys.path.insert(0, str(Path(__file__).parent / "src"))
 
+# temp_data_files 默认重定向（并在退出时恢复）的模块属性
+DATA_FILE_ATTRS = ("STUDENTS_FILE", "STATE_FILE", "SETTINGS_FILE", "REMARKS_FILE", "SCORE_HISTORY_FILE",
+                   "SQLITE_DB", "STORAGE_BACKEND")
+
+@contextmanager
+def temp_data_files(*restore, **overrides):
+    """把 stu_homework 的数据文件指向一个新的临时目录，退出时恢复原值并删除该目录
+
+    restore 列出测试自己会改动的其他模块属性，overrides 直接设置模块属性；两者都在退出时恢复。
+    http_cache.json / commit_cache.json 跟随 STATE_FILE，也落在临时目录里。
+    """
+    from xueyuanzuoye import stu_homework
+
+    tmp = Path(tempfile.mkdtemp())
+    saved = {n: getattr(stu_homework, n) for n in DATA_FILE_ATTRS + restore + tuple(overrides)}
+    stu_homework.STUDENTS_FILE = str(tmp / "students.json")
+    stu_homework.STATE_FILE = str(tmp / "state.json")
+    stu_homework.SETTINGS_FILE = str(tmp / "settings.json")
+    stu_homework.REMARKS_FILE = str(tmp / "remarks.json")
+    stu_homework.SCORE_HISTORY_FILE = str(tmp / "score_history.json")
+    stu_homework.SQLITE_DB = str(tmp / "homework.db")
+    for n, v in overrides.items():
+        setattr(stu_homework, n, v)
+    try:
+        yield tmp
+    finally:
+        for n, v in saved.items():
+            setattr(stu_homework, n, v)
+        conn = getattr(stu_homework._sqlite_local, "conns", {}).pop(str(tmp / "homework.db"), None)
+        if conn is not None:
+            conn.close()
+        shutil.rmtree(tmp, ignore_errors=True)
+
 def test_imports():
     """测试所有必要的导入"""
     print("🔍 测试 1: 检查模块导入...")
@@ -143,6 +180,1637 @@ def test_cache():
         traceback.print_exc()
         return False
 
+def test_graphql_backend():
+    """测试 GraphQL 批量抓取（本地替身服务器）"""
+    print("\n🔍 测试 6: 测试 GraphQL 批量抓取...")
+    try:
+        import threading
+        from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+        from xueyuanzuoye import stu_homework
+
+        repos = {
+            ("alice", "hw"): {"pushedAt": "2026-03-01T08:00:00Z", "count": 42},
+            ("bob", "empty"): {"pushedAt": None, "count": None},
+        }
+        queries = []
+
+        class GraphQLHandler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                queries.append(body)
+                variables = body["variables"]
+                data = {}
+                for key, owner in variables.items():
+                    if not key.startswith("o"):
+                        continue
+                    idx = key[1:]
+                    repo = repos.get((owner, variables[f"n{idx}"]))
+                    if repo is None:
+                        data[f"r{idx}"] = None
+                    elif repo["count"] is None:
+                        data[f"r{idx}"] = {"pushedAt": repo["pushedAt"], "defaultBranchRef": None}
+                    else:
+                        data[f"r{idx}"] = {
+                            "pushedAt": repo["pushedAt"],
+                            "defaultBranchRef": {"target": {"history": {"totalCount": repo["count"]}}},
+                        }
+                payload = json.dumps({"data": data}).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), GraphQLHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        old_url = stu_homework.GITHUB_GRAPHQL_URL
+        stu_homework.GITHUB_GRAPHQL_URL = f"http://127.0.0.1:{server.server_port}/graphql"
+        try:
+            results = stu_homework.fetch_repos_graphql([
+                "https://github.com/alice/hw",
+                "https://github.com/bob/empty",
+                "https://github.com/carol/missing",
+            ])
+        finally:
+            stu_homework.GITHUB_GRAPHQL_URL = old_url
+            server.shutdown()
+
+        expected = {
+            "https://github.com/alice/hw": ({"pushed_at": "2026-03-01T08:00:00Z"}, 42),
+            "https://github.com/bob/empty": ({"pushed_at": None}, 0),
+            "https://github.com/carol/missing": (None, -1),
+        }
+        if len(queries) != 1:
+            print(f"❌ 预期 1 次查询, 实际 {len(queries)} 次")
+            return False
+        if results != expected:
+            print(f"❌ 结果不匹配: {results}")
+            return False
+        print(f"✅ 1 次查询取回 {len(results)} 个仓库")
+        return True
+    except Exception as e:
+        print(f"❌ GraphQL 测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+PUSH_PAYLOAD = {
+    "ref": "refs/heads/main",
+    "before": "6113728f27ae82c7b1a177c8d03f9e96e0adf246",
+    "after": "0d1a26e67d8f5eaf1f6ba5c57fc3c7d91ac0fd1c",
+    "forced": False,
+    "deleted": False,
+    "repository": {
+        "full_name": "alice/homework",
+        "html_url": "https://github.com/Alice/homework",
+        "default_branch": "main",
+        "pushed_at": 1767254400,
+    },
+    "commits": [
+        {
+            "id": "0d1a26e67d8f5eaf1f6ba5c57fc3c7d91ac0fd1c",
+            "message": "完成第二阶段作业",
+            "timestamp": "2026-01-01T08:00:00+08:00",
+            "url": "https://github.com/Alice/homework/commit/0d1a26e",
+            "author": {"name": "Alice", "email": "alice@example.com"},
+        },
+        {
+            "id": "a7c3f1b2e4d5c6b7a8f9e0d1c2b3a4f5e6d7c8b9",
+            "message": "修复测试",
+            "timestamp": "2026-01-01T07:30:00+08:00",
+            "url": "https://github.com/Alice/homework/commit/a7c3f1b",
+            "author": {"name": "Alice", "email": "alice@example.com"},
+        },
+    ],
+}
+
+def test_push_webhook():
+    """测试 GitHub push webhook（录制的 payload）"""
+    print("\n🔍 测试 7: 测试 push webhook...")
+    try:
+        import hmac
+        import hashlib
+        import tempfile
+        from xueyuanzuoye import stu_homework
+
+        tmp = Path(tempfile.mkdtemp())
+        saved = (stu_homework.STUDENTS_FILE, stu_homework.STATE_FILE, stu_homework.GITHUB_WEBHOOK_SECRET)
+        stu_homework.STUDENTS_FILE = str(tmp / "students.json")
+        stu_homework.STATE_FILE = str(tmp / "state.json")
+        stu_homework.GITHUB_WEBHOOK_SECRET = "s3cret"
+        try:
+            stu_homework.save_students([{"name": "alice", "repo": "https://github.com/alice/homework"}])
+            stu_homework.save_state({"alice": {"commits_count": 10, "last_viewed_at": None}})
+            body = json.dumps(PUSH_PAYLOAD).encode("utf-8")
+            signature = "sha256=" + hmac.new(b"s3cret", body, hashlib.sha256).hexdigest()
+            client = stu_homework.app.test_client()
+
+            resp = client.post("/api/webhooks/github", data=body,
+                               headers={"X-GitHub-Event": "push", "X-Hub-Signature-256": "sha256=bad"})
+            if resp.status_code != 401:
+                print(f"❌ 错误签名应被拒绝, 实际 {resp.status_code}")
+                return False
+
+            headers = {"X-GitHub-Event": "push", "X-Hub-Signature-256": signature,
+                       "X-GitHub-Delivery": "72d3162e-cc78-11e3-81ab-4c9367dc0958"}
+            resp = client.post("/api/webhooks/github", data=body, headers=headers)
+            # GitHub 重投同一事件（同一投递 ID）不应重复累加
+            redelivered = client.post("/api/webhooks/github", data=body, headers=headers).get_json()
+            entry = stu_homework.load_state()["alice"]
+
+            # 迟到的旧推送（另一个投递 ID）不能把推送时间往回改，也不能再累加提交数
+            late = {**PUSH_PAYLOAD, "repository": {**PUSH_PAYLOAD["repository"], "pushed_at": 1767250800},
+                    "commits": PUSH_PAYLOAD["commits"][1:]}
+            late_body = json.dumps(late).encode("utf-8")
+            client.post("/api/webhooks/github", data=late_body, headers={
+                "X-GitHub-Event": "push", "X-GitHub-Delivery": "late-1",
+                "X-Hub-Signature-256": "sha256=" + hmac.new(b"s3cret", late_body, hashlib.sha256).hexdigest()})
+            after_late = stu_homework.load_state()["alice"]
+            cached = stu_homework.load_commit_cache().get("alice/homework", {}).get("commits", [])
+        finally:
+            stu_homework.STUDENTS_FILE, stu_homework.STATE_FILE, stu_homework.GITHUB_WEBHOOK_SECRET = saved
+
+        if resp.status_code != 200:
+            print(f"❌ webhook 返回 {resp.status_code}")
+            return False
+        if redelivered.get("ignored") != "duplicate delivery":
+            print(f"❌ 重投的事件应被跳过: {redelivered}")
+            return False
+        if after_late.get("last_known_pushed_at") != "2026-01-01T08:00:00Z" or after_late.get("commits_count") != 12:
+            print(f"❌ 迟到的旧推送不应改动推送时间与提交数: {after_late}")
+            return False
+        if entry.get("commits_count") != 12 or entry.get("last_known_pushed_at") != "2026-01-01T08:00:00Z":
+            print(f"❌ 状态未正确更新: {entry}")
+            return False
+        if [c["sha"] for c in cached] != ["0d1a26e", "a7c3f1b"]:
+            print(f"❌ 本地提交历史不正确: {cached}")
+            return False
+        print(f"✅ webhook 更新: {entry}")
+        return True
+    except Exception as e:
+        print(f"❌ webhook 测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_git_mirror_backend():
+    """测试 git 镜像模式（本地 file:// 仓库）与仓库地址校验"""
+    print("\n🔍 测试 8: 测试 git 镜像模式...")
+    try:
+        import subprocess
+        import tempfile
+        from xueyuanzuoye import stu_homework
+
+        tmp = Path(tempfile.mkdtemp())
+        origin = tmp / "origin" / "alice" / "hw"
+        origin.mkdir(parents=True)
+
+        def git(*args):
+            subprocess.run(["git", "-c", "user.name=Alice", "-c", "user.email=alice@example.com", *args],
+                           cwd=origin, check=True, capture_output=True)
+
+        git("init", "-q")
+        for i in range(3):
+            (origin / "README.md").write_text(f"v{i}\n", encoding="utf-8")
+            git("add", "README.md")
+            git("commit", "-q", "-m", f"commit {i}")
+
+        repo_url = origin.as_uri()
+        saved = (stu_homework.GIT_MIRROR_DIR, stu_homework.ALLOW_FILE_REPOS, stu_homework.STUDENTS_FILE,
+                 stu_homework.STATE_FILE, stu_homework.SETTINGS_FILE)
+        stu_homework.GIT_MIRROR_DIR = str(tmp / "mirrors")
+        stu_homework.STUDENTS_FILE = str(tmp / "students.json")
+        stu_homework.STATE_FILE = str(tmp / "state.json")
+        stu_homework.SETTINGS_FILE = str(tmp / "settings.json")
+        try:
+            client = stu_homework.app.test_client()
+            # REST 模式只取 owner/repo，不限制地址写法
+            rest_added = client.post("/api/students/add", json={"name": "carol",
+                                                                "repo": "http://github.com/carol/hw"}).status_code
+            # git 镜像模式下 file:// 默认不接受，名单导入与 clone 都拒绝
+            stu_homework.save_settings({**stu_homework.load_settings(), "fetch_backend": "git"})
+            file_rejected = client.post("/api/students/add", json={"name": "alice", "repo": repo_url}).status_code
+            marker = tmp / "injected"
+            injected = f"--upload-pack=touch {marker}"
+            rejected = [client.post("/api/students/add", json={"name": "mallory", "repo": url}).status_code
+                        for url in (injected, "/etc", "http://github.com/a/b", "https://evil.example/a/b")]
+            imported = client.post("/api/students/import", json={"text": f"mallory, {injected}"}).get_json()
+            cloned = stu_homework.sync_git_mirror(injected)
+
+            stu_homework.ALLOW_FILE_REPOS = True
+            file_allowed = client.post("/api/students/add", json={"name": "alice", "repo": repo_url}).status_code
+            info, count = stu_homework.check_repo_git(repo_url)
+            git("commit", "-q", "--allow-empty", "-m", "commit 3")
+            _, count_after = stu_homework.check_repo_git(repo_url)
+            history = stu_homework.git_commit_history(repo_url, limit=2)
+            injected_ran = marker.exists()
+        finally:
+            (stu_homework.GIT_MIRROR_DIR, stu_homework.ALLOW_FILE_REPOS, stu_homework.STUDENTS_FILE,
+             stu_homework.STATE_FILE, stu_homework.SETTINGS_FILE) = saved
+
+        if file_rejected != 400 or rejected != [400] * 4 or imported.get("added") or cloned or injected_ran:
+            print(f"❌ 非法仓库地址应被拒绝: {file_rejected}, {rejected}, {imported}, {cloned}, {injected_ran}")
+            return False
+        if rest_added != 200:
+            print(f"❌ REST 模式不应校验仓库地址写法: {rest_added}")
+            return False
+        if file_allowed != 200:
+            print(f"❌ ALLOW_FILE_REPOS 下应接受 file:// 地址: {file_allowed}")
+            return False
+        if not info or not info.get("pushed_at") or count != 3 or count_after != 4:
+            print(f"❌ 提交数不正确: info={info}, count={count}, count_after={count_after}")
+            return False
+        if [c["message"] for c in history] != ["commit 3", "commit 2"]:
+            print(f"❌ 提交历史不正确: {history}")
+            return False
+        print(f"✅ 镜像统计提交数: {count} -> {count_after}")
+        return True
+    except Exception as e:
+        print(f"❌ git 镜像测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_resilience():
+    """测试重试、断路器与 404 负缓存（本地替身服务器）"""
+    print("\n🔍 测试 9: 测试重试 / 断路器 / 负缓存...")
+    try:
+        import asyncio
+        import threading
+        import time
+        from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+        from xueyuanzuoye import stu_homework
+
+        hits = {}
+
+        class FlakyHandler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                hits[self.path] = hits.get(self.path, 0) + 1
+                if self.path == "/missing":
+                    status = 404
+                elif self.path == "/flaky" and hits[self.path] == 1:
+                    status = 503
+                elif self.path == "/down":
+                    status = 502
+                else:
+                    status = 200
+                payload = json.dumps({"path": self.path}).encode("utf-8")
+                if self.path == "/notjson":
+                    payload = b"not json"
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                if self.path == "/garbled":
+                    # 声明 gzip 但内容不是：requests 抛出 ContentDecodingError
+                    self.send_header("Content-Encoding", "gzip")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), FlakyHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base = f"http://127.0.0.1:{server.server_port}"
+        host = f"127.0.0.1:{server.server_port}"
+        saved_delay = stu_homework.RETRY_BASE_DELAY
+        stu_homework.RETRY_BASE_DELAY = 0
+        try:
+            flaky = stu_homework.github_get(base + "/flaky", use_cache=False)
+            missing = [stu_homework.github_get(base + "/missing")[0] for _ in range(3)]
+            for _ in range(2):
+                try:
+                    stu_homework.github_get(base + "/down", use_cache=False)
+                except stu_homework.CircuitOpenError:
+                    pass
+            try:
+                stu_homework.github_get(base + "/ok", use_cache=False)
+                fast_failed = False
+            except stu_homework.CircuitOpenError:
+                fast_failed = True
+
+            def half_open():
+                with stu_homework.circuit_lock:
+                    stu_homework.circuit_breakers[host]["open_until"] = time.time() - 1
+
+            # 试探请求以非连接错误结束时也要结束试探，否则断路器永远不放行
+            probe_errors = []
+            half_open()
+            try:
+                stu_homework.resilient_request("GET", base + "/garbled")
+            except stu_homework.requests.exceptions.ContentDecodingError as e:
+                probe_errors.append(type(e).__name__)
+            if stu_homework.aiohttp is not None:
+                async def async_probe():
+                    async with stu_homework.aiohttp.ClientSession() as session:
+                        return await stu_homework.async_resilient_request(session, "GET", base + "/notjson")
+
+                half_open()
+                try:
+                    asyncio.run(async_probe())
+                except ValueError as e:
+                    probe_errors.append(type(e).__name__)
+            half_open()
+            recovered = stu_homework.github_get(base + "/ok", use_cache=False)[0]
+        finally:
+            stu_homework.RETRY_BASE_DELAY = saved_delay
+            server.shutdown()
+            with stu_homework.circuit_lock:
+                stu_homework.circuit_breakers.pop(host, None)
+            with stu_homework._http_cache_lock:
+                stu_homework._load_http_cache().pop(base + "/missing", None)
+
+        if flaky[0] != 200 or hits.get("/flaky") != 2:
+            print(f"❌ 503 后应重试成功: status={flaky[0]}, hits={hits.get('/flaky')}")
+            return False
+        if missing != [404, 404, 404] or hits.get("/missing") != 1:
+            print(f"❌ 404 应被负缓存: {missing}, hits={hits.get('/missing')}")
+            return False
+        if hits.get("/down") != stu_homework.CIRCUIT_FAILURE_THRESHOLD or not fast_failed or hits.get("/ok") != 1:
+            print("❌ 连续失败后断路器应打开")
+            return False
+        expected_probes = 2 if stu_homework.aiohttp is not None else 1
+        if len(probe_errors) != expected_probes or recovered != 200:
+            print(f"❌ 试探请求出错后断路器不应卡住: {probe_errors}, {recovered}")
+            return False
+        print(f"✅ 请求计数: {hits}")
+        return True
+    except Exception as e:
+        print(f"❌ 容错测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_details_stale_while_revalidate():
+    """测试详情接口先返回本地提交历史、后台刷新"""
+    print("\n🔍 测试 10: 测试详情 stale-while-revalidate...")
+    try:
+        import threading
+        import tempfile
+        from xueyuanzuoye import stu_homework
+
+        tmp = Path(tempfile.mkdtemp())
+        saved = (stu_homework.STATE_FILE, stu_homework.fetch_commit_page)
+        release = threading.Event()
+        calls = []
+
+        def slow_fetch(repo_url, limit=30, since=None, page=1):
+            calls.append(since)
+            release.wait(5)
+            return [{"sha": "b2", "date": "2026-02-02T00:00:00Z", "message": "new", "author": "a", "url": ""}]
+
+        stu_homework.STATE_FILE = str(tmp / "state.json")
+        stu_homework.fetch_commit_page = slow_fetch
+        repo = "https://github.com/alice/hw"
+        try:
+            stu_homework.update_commit_cache("alice/hw", [
+                {"sha": "a1", "date": "2026-01-01T00:00:00Z", "message": "old", "author": "a", "url": ""}
+            ], "2026-01-01T00:00:00Z")
+            first = stu_homework.cached_commit_history(repo, "2026-02-02T00:00:00Z")
+            second = stu_homework.cached_commit_history(repo, "2026-02-02T00:00:00Z")
+            worker = stu_homework._history_refreshes.get("alice/hw")
+            release.set()
+            if worker:
+                worker.join(5)
+            third = stu_homework.cached_commit_history(repo, "2026-02-02T00:00:00Z")
+        finally:
+            release.set()
+            stu_homework.STATE_FILE, stu_homework.fetch_commit_page = saved
+
+        if [c["sha"] for c in first[0]] != ["a1"] or not first[2] or not second[2]:
+            print(f"❌ 应立即返回旧数据并标记刷新中: {first}")
+            return False
+        if len(calls) != 1:
+            print(f"❌ 后台刷新应去重, 实际请求 {len(calls)} 次")
+            return False
+        if [c["sha"] for c in third[0]] != ["b2", "a1"] or third[2] or not third[1]:
+            print(f"❌ 刷新后应返回新数据: {third}")
+            return False
+        print(f"✅ 后台刷新 1 次, 同步于 {third[1]}")
+        return True
+    except Exception as e:
+        print(f"❌ stale-while-revalidate 测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_fake_github_server():
+    """测试用 tools/fake_github.py 统计提交数（Link 分页 + ETag）"""
+    print("\n🔍 测试 11: 测试本地 GitHub 替身服务器...")
+    try:
+        sys.path.insert(0, str(Path(__file__).parent / "tools"))
+        from fake_github import FakeGitHub
+        from xueyuanzuoye import stu_homework
+
+        fake = FakeGitHub().start()
+        fake.add_repo("alice/big", commits=123)
+        fake.add_repo("bob/small", commits=1)
+        saved = stu_homework.GITHUB_API_URL
+        stu_homework.GITHUB_API_URL = fake.url
+        try:
+            big = stu_homework.fetch_commits_count("https://github.com/alice/big")
+            small = stu_homework.fetch_commits_count("https://github.com/bob/small")
+            fake.reset_stats()
+            again = stu_homework.fetch_commits_count("https://github.com/alice/big")
+            stats = fake.snapshot()
+        finally:
+            stu_homework.GITHUB_API_URL = saved
+            fake.stop()
+
+        if (big, small, again) != (123, 1, 123):
+            print(f"❌ 提交数不正确: {big}, {small}, {again}")
+            return False
+        if stats["by_status"] != {"304": 1}:
+            print(f"❌ 重复请求应命中 ETag: {stats}")
+            return False
+        print(f"✅ 提交数 {big} / {small}, 重复请求 304")
+        return True
+    except Exception as e:
+        print(f"❌ 替身服务器测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_sqlite_backend():
+    """测试 SQLite 存储后端与 JSON 迁移"""
+    print("\n🔍 测试 12: 测试 SQLite 存储后端...")
+    try:
+        import tempfile
+        sys.path.insert(0, str(Path(__file__).parent / "tools"))
+        from fake_github import FakeGitHub
+        from xueyuanzuoye import stu_homework
+
+        tmp = Path(tempfile.mkdtemp())
+        names = ("STUDENTS_FILE", "STATE_FILE", "REMARKS_FILE", "SCORE_HISTORY_FILE", "SQLITE_DB", "STORAGE_BACKEND",
+                 "GITHUB_API_URL")
+        saved = {n: getattr(stu_homework, n) for n in names}
+        stu_homework.STUDENTS_FILE = str(tmp / "students.json")
+        stu_homework.STATE_FILE = str(tmp / "state.json")
+        stu_homework.REMARKS_FILE = str(tmp / "remarks.json")
+        stu_homework.SCORE_HISTORY_FILE = str(tmp / "score_history.json")
+        stu_homework.SQLITE_DB = str(tmp / "homework.db")
+        # 推送时间与同步过的提交历史都已就绪，标记已查看与详情都不应请求 GitHub
+        fake = FakeGitHub().start()
+        stu_homework.GITHUB_API_URL = fake.url
+        pushed_at = "2026-01-01T00:00:00Z"
+        try:
+            stu_homework.save_students([
+                {"name": "alice", "repo": "https://github.com/Alice/hw", "scores": [90, 0, 0, 0, 0]},
+                {"name": "bob", "repo": "https://github.com/bob/hw", "scores": [0, 0, 0, 0, 0]},
+            ])
+            stu_homework.save_state({"alice": {"commits_count": 3, "last_known_pushed_at": pushed_at}})
+            stu_homework.update_commit_cache("alice/hw", [
+                {"sha": "a1", "date": pushed_at, "message": "init", "author": "alice", "url": ""}
+            ], pushed_at)
+            stu_homework.save_remarks({"bob": {"text": "hi", "tags": [], "updated_at": None}})
+            # 只有旧版 score_history.json、还没有日志时，迁移也要带上分数历史
+            legacy = {"alice": [{"timestamp": "t0", "phase": 0, "old_score": 0, "new_score": 80},
+                                {"timestamp": "t1", "phase": 0, "old_score": 80, "new_score": 90}],
+                      "bob": [{"timestamp": "t0", "phase": 0, "old_score": 0, "new_score": 10}]}
+            (tmp / "score_history.json").write_text(json.dumps(legacy), encoding="utf-8")
+            counts = stu_homework.migrate_json_to_sqlite()
+
+            stu_homework.STORAGE_BACKEND = "sqlite"
+            client = stu_homework.app.test_client()
+            client.post("/api/students/score", json={"name": "alice", "phase": 1, "score": 80})
+            client.post("/api/students/add", json={"name": "carol", "repo": "https://github.com/carol/hw"})
+            dup = client.post("/api/students/add", json={"name": "dave", "repo": "https://github.com/bob/hw"})
+            client.post("/api/students/delete", json={"name": "bob"})
+            client.post("/api/mark_viewed", json={"name": "alice"})
+            details = client.get("/api/students/alice/details").get_json()
+            by_key = stu_homework.get_student_by_repo_key("alice/hw")
+            roster = [s["name"] for s in stu_homework.load_students()]
+            journal_mode = stu_homework.get_db().execute("PRAGMA journal_mode").fetchone()[0]
+            requests_made = fake.snapshot()["requests"]
+        finally:
+            fake.stop()
+            for n, v in saved.items():
+                setattr(stu_homework, n, v)
+
+        if counts != {"students": 2, "state": 1, "remarks": 1, "score_history": 3}:
+            print(f"❌ 迁移行数不正确: {counts}")
+            return False
+        if dup.status_code != 409 or roster != ["alice", "carol"] or not by_key:
+            print(f"❌ 学员读写不正确: {dup.status_code}, {roster}")
+            return False
+        if details["student"]["scores"][:2] != [90, 80] or details["student"]["commits_count"] != 3:
+            print(f"❌ 详情不正确: {details['student']}")
+            return False
+        if len(details["score_history"]) != 3 or not details["student"]["last_viewed"]:
+            print(f"❌ 分数历史 / 查看时间不正确: {details}")
+            return False
+        if journal_mode.lower() != "wal":
+            print(f"❌ 未启用 WAL: {journal_mode}")
+            return False
+        if requests_made or details["commits_refreshing"]:
+            print(f"❌ 不应请求 GitHub: {requests_made} 次, refreshing={details['commits_refreshing']}")
+            return False
+        print(f"✅ 迁移 {counts}, 名单 {roster}")
+        return True
+    except Exception as e:
+        print(f"❌ SQLite 测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_sweep_write_coalescing():
+    """测试后台检查合并写入 state.json（原子替换）"""
+    print("\n🔍 测试 13: 测试 state 合并写入...")
+    try:
+        import time
+        import tempfile
+        from xueyuanzuoye import stu_homework
+
+        tmp = Path(tempfile.mkdtemp())
+        saved = stu_homework.STATE_FILE
+        stu_homework.STATE_FILE = str(tmp / "state.json")
+        try:
+            results = [(f"s{i}", {"pushed_at": "2026-01-01T00:00:00Z"}, i) for i in range(50)]
+            stu_homework.apply_sweep_results({}, results, len(results), time.time(),
+                                             stu_homework.DEFAULT_SETTINGS)
+            report = dict(stu_homework.last_sweep_report)
+            state = stu_homework.load_state()
+            # 原子替换不能把权限改成 mkstemp 的 0600
+            created_mode = (tmp / "state.json").stat().st_mode & 0o777
+            os.chmod(tmp / "state.json", 0o640)
+            stu_homework.save_state(state)
+            kept_mode = (tmp / "state.json").stat().st_mode & 0o777
+        finally:
+            stu_homework.STATE_FILE = saved
+
+        leftovers = [p.name for p in tmp.iterdir() if p.name.endswith(".tmp")]
+        if report["state_writes"] != 1 or report["bytes_written"] != (tmp / "state.json").stat().st_size:
+            print(f"❌ 应只写一次: {report}")
+            return False
+        if len(state) != 50 or state["s7"]["commits_count"] != 7 or leftovers:
+            print(f"❌ state 内容不正确或残留临时文件: {leftovers}")
+            return False
+        if os.name == "posix" and (created_mode != 0o666 & ~stu_homework._UMASK or kept_mode != 0o640):
+            print(f"❌ 文件权限不正确: 新建 {oct(created_mode)}, 替换后 {oct(kept_mode)}")
+            return False
+        print(f"✅ 50 个仓库写入 {report['state_writes']} 次, {report['bytes_written']} 字节")
+        return True
+    except Exception as e:
+        print(f"❌ 合并写入测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_parsed_data_cache():
+    """测试按文件签名复用解析结果"""
+    print("\n🔍 测试 14: 测试解析结果缓存...")
+    try:
+        import tempfile
+        from xueyuanzuoye import stu_homework
+
+        tmp = Path(tempfile.mkdtemp())
+        saved = (stu_homework.STUDENTS_FILE, stu_homework.STATE_FILE)
+        stu_homework.STUDENTS_FILE = str(tmp / "students.json")
+        stu_homework.STATE_FILE = str(tmp / "state.json")
+        try:
+            stu_homework.save_students([{"name": "alice", "repo": "https://github.com/alice/hw", "scores": [1, 2, 3, 4, 5]}])
+            stu_homework.save_state({"alice": {"commits_count": 1}})
+            pushed_at = "2026-01-01T00:00:00Z"
+            stu_homework.update_commit_cache("alice/hw", [
+                {"sha": "a1", "date": pushed_at, "message": "init", "author": "alice", "url": ""}
+            ], pushed_at)
+            client = stu_homework.app.test_client()
+            client.get("/api/list")
+            shared = stu_homework.load_commit_cache()
+            before = dict(stu_homework.parsed_cache_stats)
+            # 列表响应本身按数据代数缓存，这里直接调用读取函数；打开详情时读取提交历史缓存
+            for _ in range(5):
+                stu_homework.load_students()
+                stu_homework.load_state()
+                stu_homework.cached_commit_history("https://github.com/alice/hw", pushed_at)
+            after = dict(stu_homework.parsed_cache_stats)
+
+            # 写入提交历史不能改动共享的解析结果
+            stu_homework.update_commit_cache("bob/hw", [], pushed_at)
+            shared_untouched = list(shared) == ["alice/hw"]
+            reread = sorted(stu_homework.load_commit_cache())
+
+            # 外部编辑（不同大小）应被读到
+            with open(stu_homework.STATE_FILE, "w", encoding="utf-8") as f:
+                json.dump({"alice": {"commits_count": 12345}}, f)
+            rows = client.get("/api/list").get_json()
+
+            # get_* 返回副本，修改后不影响缓存
+            entry = stu_homework.get_state_entry("alice")
+            entry["commits_count"] = 0
+            cached_count = stu_homework.load_state()["alice"]["commits_count"]
+        finally:
+            stu_homework.STUDENTS_FILE, stu_homework.STATE_FILE = saved
+
+        if after["misses"] != before["misses"] or after["hits"] - before["hits"] < 15:
+            print(f"❌ 重复读取不应重新解析: {before} -> {after}")
+            return False
+        if not shared_untouched or reread != ["alice/hw", "bob/hw"]:
+            print(f"❌ 提交历史缓存被原地修改或未读到写入: {list(shared)}, {reread}")
+            return False
+        if rows[0]["commits_count"] != 12345 or cached_count != 12345:
+            print(f"❌ 未读到外部修改或缓存被改写: {rows[0]['commits_count']}, {cached_count}")
+            return False
+        print(f"✅ 5 次读取 0 次解析（含提交历史缓存）, 外部修改已生效")
+        return True
+    except Exception as e:
+        print(f"❌ 解析缓存测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_score_history_journal():
+    """测试分数历史追加日志与压缩"""
+    print("\n🔍 测试 15: 测试分数历史日志...")
+    try:
+        import tempfile
+        from xueyuanzuoye import stu_homework
+
+        tmp = Path(tempfile.mkdtemp())
+        saved = (stu_homework.SCORE_HISTORY_FILE, stu_homework.SCORE_HISTORY_LIMIT,
+                 stu_homework.SCORE_JOURNAL_COMPACT_MIN)
+        stu_homework.SCORE_HISTORY_FILE = str(tmp / "score_history.json")
+        stu_homework.SCORE_HISTORY_LIMIT = 5
+        stu_homework.SCORE_JOURNAL_COMPACT_MIN = 10
+        journal = tmp / "score_history.jsonl"
+        try:
+            # 旧版 JSON 由启动迁移转换为日志，读取不写文件
+            legacy = {"alice": [{"timestamp": "t0", "phase": 0, "old_score": 0, "new_score": 1}]}
+            (tmp / "score_history.json").write_text(json.dumps(legacy), encoding="utf-8")
+            stu_homework.get_score_history("alice")
+            stu_homework.load_score_history()
+            read_wrote = journal.exists()
+            migrated = stu_homework.migrate_score_history_journal()
+            stu_homework.record_score_change("alice", 1, 0, 2)
+            converted = stu_homework.get_score_history("alice")
+
+            # 每次改分只在末尾追加一行
+            before = journal.read_bytes()
+            appended = stu_homework.append_score_journal("bob", {"timestamp": "t", "phase": 0,
+                                                                 "old_score": 0, "new_score": 3})
+            after = journal.read_bytes()
+
+            # 写到一半崩溃留下的半行不影响后续追加与读取
+            with open(journal, "ab") as f:
+                f.write(b'{"name": "alice", "phase"')
+            for i in range(30):
+                stu_homework.record_score_change("alice", 2, i, i + 1)
+            latest = stu_homework.get_score_history("alice", limit=3)
+            lines = journal.read_bytes().count(b"\n")
+            bob = stu_homework.get_score_history("bob")
+        finally:
+            (stu_homework.SCORE_HISTORY_FILE, stu_homework.SCORE_HISTORY_LIMIT,
+             stu_homework.SCORE_JOURNAL_COMPACT_MIN) = saved
+
+        if read_wrote or migrated != 1:
+            print(f"❌ 读取不应转换, 迁移应转换 1 条: {read_wrote}, {migrated}")
+            return False
+        if len(converted) != 2 or converted[0]["timestamp"] != "t0" or "name" in converted[0]:
+            print(f"❌ 旧版历史未正确转换: {converted}")
+            return False
+        if not after.startswith(before) or len(after) - len(before) != appended:
+            print("❌ 改分应只追加一行")
+            return False
+        if [h["new_score"] for h in latest] != [28, 29, 30] or len(bob) != 1:
+            print(f"❌ 最近记录读取不正确: {latest}, {bob}")
+            return False
+        if lines > 5 + 1 + 10 + 6:
+            print(f"❌ 日志未压缩: {lines} 行")
+            return False
+        print(f"✅ 每次改分追加 {appended} 字节, 31 次改分后日志 {lines} 行")
+        return True
+    except Exception as e:
+        print(f"❌ 分数历史日志测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_students_schema_migration():
+    """测试学员数据结构版本迁移，迁移后读取不再写文件"""
+    print("\n🔍 测试 16: 测试学员数据迁移...")
+    try:
+        import tempfile
+        from xueyuanzuoye import stu_homework
+
+        tmp = Path(tempfile.mkdtemp())
+        saved = stu_homework.STUDENTS_FILE
+        stu_homework.STUDENTS_FILE = str(tmp / "students.json")
+        try:
+            legacy = {"students": [
+                {"name": "alice", "repo": "https://github.com/alice/hw", "score": 90},
+                {"name": "bob", "repo": "https://github.com/bob/hw", "scores": [120, -5, 50, 60, 70]},
+                {"name": "carol", "repo": "https://github.com/carol/hw", "scores": [1, 2, 3, 4, 5]},
+            ]}
+            Path(stu_homework.STUDENTS_FILE).write_text(json.dumps(legacy), encoding="utf-8")
+            raw = Path(stu_homework.STUDENTS_FILE).read_bytes()
+            # 读取是纯读，不写回
+            stu_homework.load_students()
+            stu_homework.app.test_client().get("/api/list")
+            untouched = Path(stu_homework.STUDENTS_FILE).read_bytes() == raw
+
+            changed = stu_homework.migrate_students_schema()
+            version = stu_homework.students_schema_version()
+            students = {s["name"]: s for s in stu_homework.load_students()}
+            again = stu_homework.migrate_students_schema()
+        finally:
+            stu_homework.STUDENTS_FILE = saved
+
+        if not untouched:
+            print("❌ 读取学员不应写文件")
+            return False
+        if changed != 2 or again is not None or version != stu_homework.STUDENTS_SCHEMA_VERSION:
+            print(f"❌ 迁移结果不正确: {changed}, {again}, {version}")
+            return False
+        if "score" in students["alice"] or students["bob"]["scores"] != [100, 0, 50, 60, 70]:
+            print(f"❌ 迁移后数据不正确: {students}")
+            return False
+        print(f"✅ 规范化 {changed} 条记录, 版本 {version}, 再次运行无操作")
+        return True
+    except Exception as e:
+        print(f"❌ 学员数据迁移测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def _storage_worker(data_dir, backend, worker, rounds):
+    """多进程测试的子进程：反复给自己的学员打分并标记已查看"""
+    import os
+    os.environ["POLL_ENGINE"] = "off"
+    from xueyuanzuoye import stu_homework
+
+    data_dir = Path(data_dir)
+    stu_homework.STORAGE_BACKEND = backend
+    stu_homework.SQLITE_DB = str(data_dir / "homework.db")
+    stu_homework.STUDENTS_FILE = str(data_dir / "students.json")
+    stu_homework.STATE_FILE = str(data_dir / "state.json")
+    stu_homework.SCORE_HISTORY_FILE = str(data_dir / "score_history.json")
+    client = stu_homework.app.test_client()
+    name = f"s{worker}"
+    for i in range(rounds):
+        client.post("/api/students/score", json={"name": name, "phase": i % 5, "score": i + 1})
+        client.post("/api/mark_viewed", json={"name": name})
+
+def test_multiprocess_storage():
+    """测试多个进程同时写入、后台检查期间收到 webhook 时不丢失更新"""
+    print("\n🔍 测试 17: 测试多进程并发写入...")
+    try:
+        import hmac
+        import hashlib
+        import multiprocessing
+        import tempfile
+        import time
+        from xueyuanzuoye import stu_homework
+
+        workers, rounds = 4, 25
+        ctx = multiprocessing.get_context("spawn")
+        results = {}
+        for backend in ("json", "sqlite"):
+            tmp = Path(tempfile.mkdtemp())
+            saved = (stu_homework.STORAGE_BACKEND, stu_homework.SQLITE_DB, stu_homework.STUDENTS_FILE,
+                     stu_homework.STATE_FILE, stu_homework.SCORE_HISTORY_FILE, stu_homework.GITHUB_WEBHOOK_SECRET)
+            stu_homework.STORAGE_BACKEND = backend
+            stu_homework.SQLITE_DB = str(tmp / "homework.db")
+            stu_homework.STUDENTS_FILE = str(tmp / "students.json")
+            stu_homework.STATE_FILE = str(tmp / "state.json")
+            stu_homework.SCORE_HISTORY_FILE = str(tmp / "score_history.json")
+            stu_homework.GITHUB_WEBHOOK_SECRET = "s3cret"
+            try:
+                names = [f"s{w}" for w in range(workers)]
+                stu_homework.save_students([{"name": n, "repo": f"https://github.com/{n}/hw",
+                                             "scores": [0, 0, 0, 0, 0]} for n in names])
+                # 已有 last_known_pushed_at，标记已查看时不请求 GitHub
+                stu_homework.save_state({n: {"last_known_pushed_at": "2026-01-01T00:00:00Z", "commits_count": 10}
+                                         for n in names})
+                procs = [ctx.Process(target=_storage_worker, args=(str(tmp), backend, w, rounds))
+                         for w in range(workers)]
+                for proc in procs:
+                    proc.start()
+                for proc in procs:
+                    proc.join(120)
+                students = {s["name"]: s for s in stu_homework.load_students()}
+                state = stu_homework.load_state()
+                history = {n: len(stu_homework.get_score_history(n)) for n in names}
+                exit_codes = [proc.exitcode for proc in procs]
+
+                # 后台检查读完快照后，s0 / s1 收到 push webhook；s0 本轮跳过，s1 按旧推送统计了提交数
+                sweep_state, settings, _, _ = stu_homework.prepare_sweep()
+                client = stu_homework.app.test_client()
+                for n in ("s0", "s1"):
+                    repository = {**PUSH_PAYLOAD["repository"], "full_name": f"{n}/hw",
+                                  "html_url": f"https://github.com/{n}/hw"}
+                    body = json.dumps({**PUSH_PAYLOAD, "repository": repository}).encode("utf-8")
+                    signature = "sha256=" + hmac.new(b"s3cret", body, hashlib.sha256).hexdigest()
+                    client.post("/api/webhooks/github", data=body,
+                                headers={"X-GitHub-Event": "push", "X-Hub-Signature-256": signature})
+                after_webhook = stu_homework.load_state()
+                old = {"pushed_at": "2026-01-01T00:00:00Z"}
+                stu_homework.apply_sweep_results(sweep_state, [("s0", old, None), ("s1", old, 7), ("s2", old, 7)],
+                                                 3, time.time(), settings)
+                swept = stu_homework.load_state()
+            finally:
+                (stu_homework.STORAGE_BACKEND, stu_homework.SQLITE_DB, stu_homework.STUDENTS_FILE,
+                 stu_homework.STATE_FILE, stu_homework.SCORE_HISTORY_FILE, stu_homework.GITHUB_WEBHOOK_SECRET) = saved
+
+            expected = [rounds - 5 + p + 1 for p in range(5)]
+            lost = [n for n in names if students[n]["scores"] != expected]
+            unviewed = [n for n in names if not state[n].get("last_viewed_at")]
+            short = [n for n, count in history.items() if count != rounds]
+            if any(exit_codes) or lost or unviewed or short:
+                print(f"❌ {backend}: 退出码 {exit_codes}, 分数丢失 {lost}, 未标记 {unviewed}, 历史缺失 {short}")
+                return False
+            overwritten = [n for n in ("s0", "s1") if swept[n] != after_webhook[n]]
+            if overwritten or swept["s1"]["commits_count"] != 12 or swept["s2"]["commits_count"] != 7:
+                print(f"❌ {backend}: 后台检查覆盖了 webhook 的写入 {overwritten}: {swept}")
+                return False
+            if not swept["s2"].get("last_viewed_at"):
+                print(f"❌ {backend}: 后台检查覆盖了 last_viewed_at: {swept['s2']}")
+                return False
+            results[backend] = workers * rounds * 2
+        print(f"✅ {workers} 个进程并发写入无丢失: " + ", ".join(f"{b} {n} 次" for b, n in results.items()))
+        return True
+    except Exception as e:
+        print(f"❌ 多进程写入测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_student_registry():
+    """测试学员索引与批量导入"""
+    print("\n🔍 测试 18: 测试学员索引...")
+    try:
+        import time
+        import tempfile
+        from xueyuanzuoye import stu_homework
+
+        tmp = Path(tempfile.mkdtemp())
+        saved = stu_homework.STUDENTS_FILE
+        stu_homework.STUDENTS_FILE = str(tmp / "students.json")
+        try:
+            count = 5000
+            stu_homework.save_students([{"name": f"s{i}", "repo": f"https://github.com/U{i}/hw",
+                                         "scores": [0, 0, 0, 0, 0]} for i in range(count)])
+            first = stu_homework.student_registry()
+            same = stu_homework.student_registry() is first
+            by_key = stu_homework.get_student_by_repo_key("u4321/hw")
+            meta = stu_homework.repo_meta("https://github.com/U7/hw.git")
+
+            client = stu_homework.app.test_client()
+            text = "\n".join(f"n{i}, https://github.com/n{i}/hw" for i in range(count))
+            started = time.perf_counter()
+            result = client.post("/api/students/import", json={"text": text}).get_json()
+            elapsed = time.perf_counter() - started
+            rebuilt = stu_homework.student_registry() is not first
+            newest = stu_homework.get_student(f"n{count - 1}")
+            client.post("/api/students/update", json={"old_name": "s1", "name": "s1-renamed",
+                                                      "repo": "https://github.com/U1/hw"})
+            renamed = stu_homework.load_students()[1]["name"]
+            client.post("/api/students/delete", json={"name": "s0"})
+            gone = stu_homework.get_student("s0") is None and stu_homework.get_student_by_repo_key("u0/hw") is None
+        finally:
+            stu_homework.STUDENTS_FILE = saved
+
+        if not same or not by_key or by_key["name"] != "s4321":
+            print(f"❌ 索引未复用或查找错误: {same}, {by_key}")
+            return False
+        if meta != {"key": "u7/hw", "owner": "U7", "repo": "hw", "avatar_url": "https://github.com/U7.png?size=80"}:
+            print(f"❌ 仓库解析缓存不正确: {meta}")
+            return False
+        if result.get("added") != count or not rebuilt or not newest:
+            print(f"❌ 导入结果不正确: {result}")
+            return False
+        if renamed != "s1-renamed" or not gone:
+            print(f"❌ 改名应保留位置、删除后索引应更新: {renamed}, {gone}")
+            return False
+        print(f"✅ {count} 人名单导入 {count} 行用时 {elapsed:.2f}s")
+        return True
+    except Exception as e:
+        print(f"❌ 学员索引测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_generation_cache():
+    """测试按数据代数缓存列表、排行榜与 CSV"""
+    print("\n🔍 测试 19: 测试数据代数缓存...")
+    try:
+        import time
+        import tempfile
+        from xueyuanzuoye import stu_homework
+
+        tmp = Path(tempfile.mkdtemp())
+        saved = (stu_homework.STUDENTS_FILE, stu_homework.STATE_FILE, stu_homework.build_list_rows)
+        stu_homework.STUDENTS_FILE = str(tmp / "students.json")
+        stu_homework.STATE_FILE = str(tmp / "state.json")
+        builds = []
+
+        def counting_build():
+            builds.append(1)
+            return saved[2]()
+
+        stu_homework.build_list_rows = counting_build
+        try:
+            stu_homework.save_students([{"name": "alice", "repo": "https://github.com/alice/hw", "scores": [90, 0, 0, 0, 0]}])
+            client = stu_homework.app.test_client()
+            first = client.get("/api/list").data
+            second = client.get("/api/list").data
+            hits = len(builds)
+            board = client.get("/api/leaderboard").get_json()
+            csv_before = client.get("/api/export/csv").data
+
+            client.post("/api/students/add", json={"name": "bob", "repo": "https://github.com/bob/hw",
+                                                   "scores": [100, 0, 0, 0, 0]})
+            board_after_add = [r["name"] for r in client.get("/api/leaderboard").get_json()]
+            csv_after_add = client.get("/api/export/csv").data
+            client.post("/api/students/import", json={"text": "carol, https://github.com/carol/hw"})
+            names_after_import = [r["name"] for r in client.get("/api/list").get_json()]
+
+            # 后台检查写入的抓取状态也会让缓存失效
+            stu_homework.apply_sweep_results({}, [("alice", {"pushed_at": "2026-01-01T00:00:00Z"}, 42)], 1,
+                                             time.time(), stu_homework.DEFAULT_SETTINGS)
+            alice = next(r for r in client.get("/api/list").get_json() if r["name"] == "alice")
+
+            # 其他进程（或手工编辑）改动文件同样能发现
+            state = json.loads(Path(stu_homework.STATE_FILE).read_text(encoding="utf-8"))
+            state["alice"]["commits_count"] = 7
+            Path(stu_homework.STATE_FILE).write_text(json.dumps(state), encoding="utf-8")
+            external = next(r for r in client.get("/api/list").get_json() if r["name"] == "alice")
+        finally:
+            stu_homework.STUDENTS_FILE, stu_homework.STATE_FILE, stu_homework.build_list_rows = saved
+
+        if first != second or hits != 1:
+            print(f"❌ 数据未变时应命中缓存: 构建 {hits} 次")
+            return False
+        if [r["name"] for r in board] != ["alice"] or board_after_add != ["bob", "alice"] or csv_after_add == csv_before:
+            print(f"❌ 新增学员后排行榜 / CSV 未更新: {board_after_add}")
+            return False
+        if names_after_import != ["alice", "bob", "carol"]:
+            print(f"❌ 导入后列表未更新: {names_after_import}")
+            return False
+        if alice["commits_count"] != 42 or external["commits_count"] != 7:
+            print(f"❌ 后台检查或外部修改后列表未更新: {alice['commits_count']}, {external['commits_count']}")
+            return False
+        print(f"✅ 重复请求命中缓存, 写入后立即失效 (共构建 {len(builds)} 次)")
+        return True
+    except Exception as e:
+        print(f"❌ 数据代数缓存测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_list_etag():
+    """测试列表与排行榜的 ETag / 304"""
+    print("\n🔍 测试 20: 测试 ETag 条件请求...")
+    try:
+        import tempfile
+        from xueyuanzuoye import stu_homework
+
+        tmp = Path(tempfile.mkdtemp())
+        saved = (stu_homework.STUDENTS_FILE, stu_homework.STATE_FILE, stu_homework.SCORE_HISTORY_FILE)
+        stu_homework.STUDENTS_FILE = str(tmp / "students.json")
+        stu_homework.STATE_FILE = str(tmp / "state.json")
+        stu_homework.SCORE_HISTORY_FILE = str(tmp / "score_history.json")
+        try:
+            stu_homework.save_students([{"name": "alice", "repo": "https://github.com/alice/hw", "scores": [90, 0, 0, 0, 0]}])
+            client = stu_homework.app.test_client()
+            first = client.get("/api/list")
+            etag = first.headers.get("ETag")
+            revalidated = client.get("/api/list", headers={"If-None-Match": etag})
+            board = client.get("/api/leaderboard?sort_by=total_score")
+            board_revalidated = client.get("/api/leaderboard?sort_by=total_score",
+                                           headers={"If-None-Match": board.headers.get("ETag")})
+
+            client.post("/api/students/score", json={"name": "alice", "phase": 1, "score": 80})
+            changed = client.get("/api/list", headers={"If-None-Match": etag})
+        finally:
+            stu_homework.STUDENTS_FILE, stu_homework.STATE_FILE, stu_homework.SCORE_HISTORY_FILE = saved
+
+        if not etag or etag.startswith("W/") or revalidated.status_code != 304 or revalidated.data:
+            print(f"❌ 数据未变时应返回 304: {etag}, {revalidated.status_code}")
+            return False
+        if board_revalidated.status_code != 304:
+            print(f"❌ 排行榜应返回 304: {board_revalidated.status_code}")
+            return False
+        if changed.status_code != 200 or changed.headers.get("ETag") == etag or changed.get_json()[0]["scores"][1] != 80:
+            print(f"❌ 数据变化后应返回新内容: {changed.status_code}")
+            return False
+        print(f"✅ 未变化 304 (0 字节), 打分后 200 ({len(changed.data)} 字节)")
+        return True
+    except Exception as e:
+        print(f"❌ ETag 测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_list_delta_sync():
+    """测试 /api/list?since= 增量同步"""
+    print("\n🔍 测试 21: 测试列表增量同步...")
+    try:
+        import tempfile
+        from xueyuanzuoye import stu_homework
+
+        def merge(rows, delta):
+            # 完整名单调用方的合并方式（app.js 只合并已加载的行，名单顺序变化时重新加载）
+            by_name = {r["name"]: r for r in rows}
+            for name in delta["deleted"]:
+                by_name.pop(name, None)
+            for r in delta["rows"]:
+                by_name[r["name"]] = r
+            if "order" in delta:
+                return [by_name[n] for n in delta["order"] if n in by_name]
+            return list(by_name.values())
+
+        tmp = Path(tempfile.mkdtemp())
+        saved = (stu_homework.STUDENTS_FILE, stu_homework.STATE_FILE, stu_homework.SCORE_HISTORY_FILE)
+        stu_homework.STUDENTS_FILE = str(tmp / "students.json")
+        stu_homework.STATE_FILE = str(tmp / "state.json")
+        stu_homework.SCORE_HISTORY_FILE = str(tmp / "score_history.json")
+        try:
+            stu_homework.save_students([{"name": f"s{i}", "repo": f"https://github.com/s{i}/hw",
+                                         "scores": [0, 0, 0, 0, 0]} for i in range(100)])
+            client = stu_homework.app.test_client()
+            full = client.get("/api/list")
+            rows = full.get_json()
+            version = full.headers["X-List-Version"]
+            unchanged = client.get(f"/api/list?since={version}")
+
+            client.post("/api/students/score", json={"name": "s5", "phase": 0, "score": 90})
+            score_delta = client.get(f"/api/list?since={version}")
+            rows = merge(rows, score_delta.get_json())
+            version = score_delta.get_json()["version"]
+
+            # 两次写入之间不取列表，增量应合并两次的变化
+            client.post("/api/students/update", json={"old_name": "s1", "name": "s1-new", "repo": "https://github.com/s1/hw"})
+            client.post("/api/students/delete", json={"name": "s2"})
+            client.post("/api/students/add", json={"name": "s100", "repo": "https://github.com/s100/hw"})
+            roster_delta = client.get(f"/api/list?since={version}").get_json()
+            rows = merge(rows, roster_delta)
+            expected = client.get("/api/list").get_json()
+            stale = client.get("/api/list?since=deadbeef.1").get_json()
+        finally:
+            stu_homework.STUDENTS_FILE, stu_homework.STATE_FILE, stu_homework.SCORE_HISTORY_FILE = saved
+
+        if unchanged.status_code != 304:
+            print(f"❌ 版本未变应返回 304: {unchanged.status_code}")
+            return False
+        delta = score_delta.get_json()
+        if delta["full"] or [r["name"] for r in delta["rows"]] != ["s5"] or "order" in delta \
+                or delta["summary"]["avg_score"] != 90 / 5 / 100:
+            print(f"❌ 打分后的增量不正确: {delta}")
+            return False
+        if sorted(r["name"] for r in roster_delta["rows"]) != ["s1-new", "s100"] or roster_delta["deleted"] != ["s1", "s2"]:
+            print(f"❌ 名单变化的增量不正确: {roster_delta}")
+            return False
+        if rows != expected:
+            print("❌ 合并增量后与完整列表不一致")
+            return False
+        if not stale["full"] or len(stale["rows"]) != len(expected):
+            print("❌ 未知版本应返回完整列表")
+            return False
+        print(f"✅ 打分增量 {len(score_delta.data)} 字节 (完整列表 {len(full.data)} 字节), 合并结果一致")
+        return True
+    except Exception as e:
+        print(f"❌ 增量同步测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_event_stream():
+    """测试 /api/events 事件推送"""
+    print("\n🔍 测试 22: 测试事件推送...")
+    try:
+        import tempfile
+        from xueyuanzuoye import stu_homework
+
+        tmp = Path(tempfile.mkdtemp())
+        saved = (stu_homework.STUDENTS_FILE, stu_homework.STATE_FILE, stu_homework.SCORE_HISTORY_FILE,
+                 stu_homework.REMARKS_FILE, stu_homework.EVENTS_KEEPALIVE_SECONDS)
+        stu_homework.STUDENTS_FILE = str(tmp / "students.json")
+        stu_homework.STATE_FILE = str(tmp / "state.json")
+        stu_homework.SCORE_HISTORY_FILE = str(tmp / "score_history.json")
+        stu_homework.REMARKS_FILE = str(tmp / "remarks.json")
+        stu_homework.EVENTS_KEEPALIVE_SECONDS = 0.05
+        try:
+            stu_homework.save_students([{"name": "alice", "repo": "https://github.com/alice/hw", "scores": [0, 0, 0, 0, 0]}])
+            client = stu_homework.app.test_client()
+            resp = client.get("/api/events", buffered=False)
+            stream = iter(resp.response)
+            first = next(stream)
+            subscribed = len(stu_homework._event_subscribers)
+
+            client.post("/api/students/score", json={"name": "alice", "phase": 0, "score": 95})
+            client.post("/api/students/alice/remarks", json={"text": "good", "tags": []})
+            client.post("/api/students/add", json={"name": "bob", "repo": "https://github.com/bob/hw"})
+            events = [next(stream) for _ in range(3)]
+
+            # 其他进程的写入（这里直接改文件）在心跳时以 data 事件通知
+            Path(stu_homework.STATE_FILE).write_text(json.dumps({"alice": {"commits_count": 3}}), encoding="utf-8")
+            external = next(stream)
+            while external.startswith(b": keepalive"):
+                external = next(stream)
+            resp.close()
+            unsubscribed = len(stu_homework._event_subscribers)
+        finally:
+            (stu_homework.STUDENTS_FILE, stu_homework.STATE_FILE, stu_homework.SCORE_HISTORY_FILE,
+             stu_homework.REMARKS_FILE, stu_homework.EVENTS_KEEPALIVE_SECONDS) = saved
+
+        kinds = [e.decode().split("event: ")[1].split("\n")[0] for e in events]
+        if resp.mimetype != "text/event-stream" or not first.startswith(b"retry:") or subscribed != 1:
+            print(f"❌ 事件流未建立: {resp.mimetype}, {first}")
+            return False
+        if kinds != ["score", "remarks", "roster"] or '"score": 95' not in events[0].decode():
+            print(f"❌ 事件不正确: {events}")
+            return False
+        if b"event: data" not in external or unsubscribed != 0:
+            print(f"❌ 未发现外部修改或连接未注销: {external}, {unsubscribed}")
+            return False
+        print(f"✅ 推送事件: {', '.join(kinds)}, 外部修改 -> data")
+        return True
+    except Exception as e:
+        print(f"❌ 事件推送测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_list_paging():
+    """测试 /api/list 服务器端分页、筛选、搜索与排序"""
+    print("\n🔍 测试 23: 测试列表分页与搜索...")
+    try:
+        import tempfile
+        from xueyuanzuoye import stu_homework
+
+        tmp = Path(tempfile.mkdtemp())
+        saved = (stu_homework.STUDENTS_FILE, stu_homework.STATE_FILE, stu_homework.SCORE_HISTORY_FILE)
+        stu_homework.STUDENTS_FILE = str(tmp / "students.json")
+        stu_homework.STATE_FILE = str(tmp / "state.json")
+        stu_homework.SCORE_HISTORY_FILE = str(tmp / "score_history.json")
+        try:
+            students = [{"name": f"s{i:03d}", "repo": f"https://github.com/s{i}/hw",
+                         "scores": [i % 100, 0, 0, 0, 0]} for i in range(250)]
+            students += [{"name": "李白", "repo": "https://github.com/libai/hw"},
+                         {"name": "王小明", "repo": "https://github.com/wxm/homework"}]
+            stu_homework.save_students(students)
+            stu_homework.save_state({"s007": {"last_known_pushed_at": "2024-01-02T00:00:00Z"},
+                                     "李白": {"last_known_pushed_at": "2024-01-03T00:00:00Z"}})
+            client = stu_homework.app.test_client()
+            full = client.get("/api/list").get_json()
+
+            # 按 next_cursor 翻完所有页
+            names, cursor, pages, versions = [], None, 0, set()
+            while True:
+                url = "/api/list?limit=100" + (f"&cursor={cursor}" if cursor else "")
+                page = client.get(url).get_json()
+                names += [r["name"] for r in page["rows"]]
+                versions.add(page["version"])
+                pages += 1
+                cursor = page["next_cursor"]
+                if cursor is None:
+                    break
+
+            first = client.get("/api/list?limit=100")
+            not_modified = client.get("/api/list?limit=100", headers={"If-None-Match": first.headers["ETag"]})
+            by_initials = client.get("/api/list?q=lb").get_json()
+            by_repo = client.get("/api/list?q=HOMEWORK").get_json()
+            updated = client.get("/api/list?updated_only=1").get_json()
+            top = client.get("/api/list?sort=avg_score&limit=3").get_json()
+            by_name = client.get("/api/list?sort=name&order=desc&limit=1").get_json()
+            bad_sort = client.get("/api/list?sort=nope")
+            bad_since = client.get("/api/list?since=x&limit=10")
+        finally:
+            stu_homework.STUDENTS_FILE, stu_homework.STATE_FILE, stu_homework.SCORE_HISTORY_FILE = saved
+
+        if pages != 3 or names != [r["name"] for r in full] or len(versions) != 1:
+            print(f"❌ 翻页结果与完整列表不一致: {pages} 页, {len(names)} 行")
+            return False
+        if first.get_json()["total"] != 252 or first.get_json()["summary"]["updated"] != 2:
+            print(f"❌ total/summary 不正确: {first.get_json()['total']}, {first.get_json()['summary']}")
+            return False
+        if not_modified.status_code != 304:
+            print(f"❌ 分页响应未变应返回 304: {not_modified.status_code}")
+            return False
+        if [r["name"] for r in by_initials["rows"]] != ["李白"] or [r["name"] for r in by_repo["rows"]] != ["王小明"]:
+            print(f"❌ 搜索结果不正确: {by_initials['rows']}, {by_repo['rows']}")
+            return False
+        if sorted(r["name"] for r in updated["rows"]) != ["s007", "李白"]:
+            print(f"❌ updated_only 结果不正确: {[r['name'] for r in updated['rows']]}")
+            return False
+        # 平均分同为 19.8 的行保持名单原有顺序
+        if [r["name"] for r in top["rows"]] != ["s099", "s199", "s098"] or by_name["rows"][0]["name"] != "王小明":
+            print(f"❌ 排序结果不正确: {[r['name'] for r in top['rows']]}, {by_name['rows'][0]['name']}")
+            return False
+        if bad_sort.status_code != 400 or bad_since.status_code != 400:
+            print(f"❌ 非法参数应返回 400: {bad_sort.status_code}, {bad_since.status_code}")
+            return False
+        print(f"✅ 252 行分 {pages} 页取回, 首页 {len(first.data)} 字节, 拼音首字母/仓库搜索与排序正确")
+        return True
+    except Exception as e:
+        print(f"❌ 分页测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_worker_pool_concurrency():
+    """测试后台检查的并发数不超过 poll_concurrency"""
+    print("\n🔍 测试 24: 测试后台检查并发上限...")
+    try:
+        import threading
+        import time
+        from xueyuanzuoye import stu_homework
+
+        lock = threading.Lock()
+        active = [0]
+        peak = [0]
+
+        def slow_repo_info(repo_url):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.05)
+            with lock:
+                active[0] -= 1
+            return {"pushed_at": "2026-01-01T00:00:00Z"}
+
+        with temp_data_files(fetch_repo_info=slow_repo_info, fetch_commits_count=lambda repo_url: 1):
+            stu_homework.save_settings({"poll_concurrency": 3})
+            stu_homework.save_students([{"name": f"s{i}", "repo": f"https://github.com/s{i}/hw"} for i in range(12)])
+            started = time.perf_counter()
+            stu_homework.check_all()
+            elapsed = time.perf_counter() - started
+            state = stu_homework.load_state()
+            report = dict(stu_homework.last_sweep_report)
+        shared = stu_homework.get_http_session(3) is stu_homework.get_http_session(3)
+
+        if peak[0] != 3:
+            print(f"❌ 同时在途的检查数应为 3, 实际 {peak[0]}")
+            return False
+        if len(state) != 12 or report["refreshed"] != 12 or elapsed >= 12 * 0.05:
+            print(f"❌ 检查结果不正确或未并发: {report}, {elapsed:.2f}s")
+            return False
+        if not shared:
+            print("❌ 各次请求应共用同一个 HTTP 会话")
+            return False
+        print(f"✅ 12 个仓库, 最多 {peak[0]} 个并发, 用时 {elapsed:.2f}s")
+        return True
+    except Exception as e:
+        print(f"❌ 并发检查测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_conditional_requests():
+    """测试 GitHub 条件请求：带 If-None-Match / If-Modified-Since，304 复用缓存的响应体"""
+    print("\n🔍 测试 25: 测试 GitHub 条件请求...")
+    try:
+        import threading
+        from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+        from xueyuanzuoye import stu_homework
+
+        etag = '"abc123"'
+        last_modified = "Wed, 01 Jan 2026 00:00:00 GMT"
+        seen = []
+
+        class ValidatorHandler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                seen.append((self.headers.get("If-None-Match"), self.headers.get("If-Modified-Since")))
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+                payload = json.dumps({"pushed_at": "2026-01-01T00:00:00Z", "extra": "x" * 100}).encode("utf-8")
+                self.send_response(200)
+                self.send_header("ETag", etag)
+                self.send_header("Last-Modified", last_modified)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), ValidatorHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_port}/repos/alice/hw"
+        parsed = []
+
+        def transform(body):
+            parsed.append(1)
+            return {"pushed_at": body["pushed_at"]}
+
+        try:
+            with temp_data_files("_http_cache"):
+                first = stu_homework.github_get(url, transform=transform)
+                second = stu_homework.github_get(url, transform=transform)
+                # 校验信息落盘，重新加载后仍然发条件请求
+                stu_homework.flush_http_cache()
+                stu_homework._http_cache = None
+                third = stu_homework.github_get(url, transform=transform)
+        finally:
+            server.shutdown()
+
+        if seen[0] != (None, None) or seen[1] != (etag, last_modified) or seen[2] != (etag, last_modified):
+            print(f"❌ 条件请求头不正确: {seen}")
+            return False
+        if first[:2] != second[:2] or second[:2] != third[:2] or first[0] != 200:
+            print(f"❌ 304 应返回缓存的数据: {first[:2]}, {second[:2]}, {third[:2]}")
+            return False
+        if len(parsed) != 1:
+            print(f"❌ 304 不应重新解析响应体, 解析 {len(parsed)} 次")
+            return False
+        print(f"✅ 3 次请求 1 次 200 + 2 次 304, 缓存数据 {second[1]}")
+        return True
+    except Exception as e:
+        print(f"❌ 条件请求测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_rate_budget():
+    """测试按 X-RateLimit-* 配额节流：配额偏低时均匀分布请求，接近耗尽时暂停"""
+    print("\n🔍 测试 26: 测试配额节流...")
+    try:
+        import time
+        from xueyuanzuoye import stu_homework
+
+        saved = {k: dict(v) for k, v in stu_homework.rate_limits.items()}
+        reserve = stu_homework.RATE_LIMIT_RESERVE
+        calls = []
+        try:
+            reset = time.time() + 100
+            # 配额充足：不等待
+            stu_homework.note_rate_limit({"X-RateLimit-Limit": "5000", "X-RateLimit-Remaining": "4000",
+                                          "X-RateLimit-Reset": str(reset)})
+            plenty = [stu_homework.reserve_rate_budget() for _ in range(3)]
+            # 剩余 100 个（低于上限的 20%），重置前 100 秒：每个请求约间隔 1 秒
+            stu_homework.rate_limits.clear()
+            stu_homework.note_rate_limit({"X-RateLimit-Limit": "5000", "X-RateLimit-Remaining": str(reserve + 100),
+                                          "X-RateLimit-Reset": str(reset)})
+            paced = [stu_homework.reserve_rate_budget() for _ in range(3)]
+            # 只剩保留额度：不再发请求，轮询暂停到重置
+            stu_homework.rate_limits.clear()
+            stu_homework.note_rate_limit({"X-RateLimit-Limit": "5000", "X-RateLimit-Remaining": str(reserve),
+                                          "X-RateLimit-Reset": str(reset)})
+            exhausted = stu_homework.reserve_rate_budget()
+            pause = stu_homework.rate_limit_pause_seconds()
+
+            def counting_repo_info(repo_url):
+                calls.append(repo_url)
+                return {"pushed_at": "2026-01-01T00:00:00Z"}
+
+            with temp_data_files(fetch_repo_info=counting_repo_info, fetch_commits_count=lambda repo_url: 1):
+                stu_homework.save_students([{"name": "alice", "repo": "https://github.com/alice/hw"}])
+                stu_homework.check_all()
+                report = dict(stu_homework.last_sweep_report)
+                state = stu_homework.load_state()
+        finally:
+            stu_homework.rate_limits.clear()
+            stu_homework.rate_limits.update(saved)
+
+        if plenty != [0, 0, 0]:
+            print(f"❌ 配额充足时不应等待: {plenty}")
+            return False
+        if paced[0] != 0 or not (0.9 < paced[1] < 1.1) or not (1.9 < paced[2] < 2.2):
+            print(f"❌ 配额偏低时应均匀分布请求: {paced}")
+            return False
+        if exhausted is not None or not (95 < pause <= 100):
+            print(f"❌ 配额耗尽时应暂停到重置: {exhausted}, {pause}")
+            return False
+        if calls or report["deferred"] != 1 or state:
+            print(f"❌ 配额耗尽时应推迟检查且不写入状态: {calls}, {report}, {state}")
+            return False
+        print(f"✅ 节流间隔 {[round(d, 2) for d in paced]}s, 耗尽后暂停 {pause:.0f}s 并推迟检查")
+        return True
+    except Exception as e:
+        print(f"❌ 配额节流测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_skip_unchanged_repos():
+    """测试 pushed_at 未变的仓库不重新统计提交数，并如实记入检查报告"""
+    print("\n🔍 测试 27: 测试跳过未变化的仓库...")
+    try:
+        from xueyuanzuoye import stu_homework
+
+        pushed = {f"https://github.com/s{i}/hw": "2026-01-01T00:00:00Z" for i in range(5)}
+        counted = []
+        failing = set()
+
+        def repo_info(repo_url):
+            return {"pushed_at": pushed[repo_url]}
+
+        def commits_count(repo_url):
+            counted.append(repo_url)
+            return -1 if repo_url in failing else 10
+
+        reports = []
+        with temp_data_files(fetch_repo_info=repo_info, fetch_commits_count=commits_count):
+            stu_homework.save_students([{"name": f"s{i}", "repo": f"https://github.com/s{i}/hw"} for i in range(5)])
+            stu_homework.check_all()
+            reports.append(dict(stu_homework.last_sweep_report))
+            stu_homework.check_all()
+            reports.append(dict(stu_homework.last_sweep_report))
+            # s0 有新推送；s4 有新推送但统计提交数失败
+            pushed["https://github.com/s0/hw"] = "2026-01-02T00:00:00Z"
+            pushed["https://github.com/s4/hw"] = "2026-01-02T00:00:00Z"
+            failing.add("https://github.com/s4/hw")
+            counted.clear()
+            stu_homework.check_all()
+            reports.append(dict(stu_homework.last_sweep_report))
+            state = stu_homework.load_state()
+
+        summary = [(r["refreshed"], r["skipped"], r["failed"]) for r in reports]
+        if summary != [(5, 0, 0), (0, 5, 0), (1, 3, 1)]:
+            print(f"❌ 检查报告不正确 (refreshed, skipped, failed): {summary}")
+            return False
+        if sorted(counted) != ["https://github.com/s0/hw", "https://github.com/s4/hw"]:
+            print(f"❌ 只有新推送的仓库应重新统计: {counted}")
+            return False
+        if state["s4"]["last_known_pushed_at"] != "2026-01-02T00:00:00Z" or \
+                state["s4"]["commits_pushed_at"] != "2026-01-01T00:00:00Z":
+            print(f"❌ 统计失败时应记录推送但保留旧的统计时间: {state['s4']}")
+            return False
+        print(f"✅ 三轮检查 (refreshed, skipped, failed): {summary}")
+        return True
+    except Exception as e:
+        print(f"❌ 跳过未变仓库测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_async_engine():
+    """测试 asyncio 轮询引擎（本地替身服务器），以及检查中途取消时干净退出"""
+    print("\n🔍 测试 28: 测试 asyncio 轮询引擎...")
+    try:
+        import asyncio
+        import threading
+        import time
+        sys.path.insert(0, str(Path(__file__).parent / "tools"))
+        from fake_github import FakeGitHub
+        from xueyuanzuoye import stu_homework
+
+        if stu_homework.aiohttp is None:
+            print("⚠️  未安装 aiohttp，跳过")
+            return True
+
+        async def sweep():
+            async with stu_homework.aiohttp.ClientSession() as session:
+                await stu_homework.async_check_all(session)
+
+        fake = FakeGitHub().start()
+        fake.add_repo("alice/hw", commits=5)
+        fake.add_repo("bob/hw", commits=150)
+        students = [{"name": n, "repo": f"https://github.com/{n}/hw"} for n in ("alice", "bob", "carol")]
+        host = fake.url.split("://")[1]
+        try:
+            with temp_data_files(GITHUB_API_URL=fake.url):
+                stu_homework.save_students(students)
+                asyncio.run(sweep())
+                state = stu_homework.load_state()
+                report = dict(stu_homework.last_sweep_report)
+
+            # 请求在途时取消：事件循环与线程退出，不写入半轮结果
+            fake.latency = 0.3
+            with temp_data_files(GITHUB_API_URL=fake.url) as tmp:
+                stu_homework.save_students(students)
+                fake.reset_stats()
+                thread = threading.Thread(target=stu_homework.run_async_poller, daemon=True)
+                thread.start()
+                deadline = time.time() + 5
+                while fake.snapshot()["requests"] == 0 and time.time() < deadline:
+                    time.sleep(0.02)
+                in_flight = fake.snapshot()["requests"]
+                stopped = stu_homework.stop_async_poller(timeout=5)
+                state_written = (tmp / "state.json").exists()
+                poller = dict(stu_homework._async_poller)
+            with stu_homework.circuit_lock:
+                breaker = dict(stu_homework.circuit_breakers.get(host) or {})
+        finally:
+            fake.stop()
+            with stu_homework.circuit_lock:
+                stu_homework.circuit_breakers.pop(host, None)
+
+        counts = {name: entry.get("commits_count") for name, entry in state.items()}
+        if counts.get("alice") != 5 or counts.get("bob") != 150 or "commits_count" in state.get("carol", {}):
+            print(f"❌ asyncio 引擎结果不正确: {counts}")
+            return False
+        if (report["refreshed"], report["failed"]) != (2, 1):
+            print(f"❌ 检查报告不正确: {report}")
+            return False
+        if not in_flight or not stopped or thread.is_alive() or any(poller.values()):
+            print(f"❌ 取消后应退出: requests={in_flight}, stopped={stopped}, poller={poller}")
+            return False
+        if state_written or breaker.get("probing") or breaker.get("failures"):
+            print(f"❌ 取消后不应留下半轮状态: state={state_written}, breaker={breaker}")
+            return False
+        print(f"✅ asyncio 引擎统计 {counts}, 检查中途取消后线程退出")
+        return True
+    except Exception as e:
+        print(f"❌ asyncio 引擎测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_adaptive_poll_interval():
+    """测试每个仓库的检查间隔：无变化时翻倍到上限，有推送时恢复基础间隔，出错单独退避"""
+    print("\n🔍 测试 29: 测试自适应检查间隔...")
+    try:
+        from datetime import datetime, timezone
+        from xueyuanzuoye import stu_homework
+
+        settings = {"server_poll_interval_seconds": 300, "poll_max_interval_seconds": 1000}
+        now = 1_767_225_600  # 2026-01-01T00:00:00Z
+        entry = {}
+        idle = [stu_homework.schedule_next_check(entry, "idle", settings, now) for _ in range(4)]
+        next_at = entry["next_check_at"]
+        pushed = stu_homework.schedule_next_check(entry, "pushed", settings, now)
+        after_push = stu_homework.schedule_next_check(entry, "idle", settings, now)
+        errors = [stu_homework.schedule_next_check(entry, "error", settings, now) for _ in range(3)]
+        recovered = stu_homework.schedule_next_check(entry, "idle", settings, now)
+
+        # 只检查到期的仓库
+        with temp_data_files():
+            stu_homework.save_students([{"name": n, "repo": f"https://github.com/{n}/hw"} for n in ("due", "later")])
+            future = datetime.fromtimestamp(now + 10 ** 9, timezone.utc).isoformat()
+            stu_homework.save_state({"due": {"next_check_at": "2026-01-01T00:00:00+00:00"},
+                                     "later": {"next_check_at": future}})
+            targets = stu_homework.prepare_sweep(due_only=True)[2]
+
+        if idle != [300, 600, 1000, 1000] or next_at != datetime.fromtimestamp(now + 1000, timezone.utc).isoformat():
+            print(f"❌ 无变化时应翻倍到上限: {idle}, {next_at}")
+            return False
+        if pushed != 300 or after_push != 600:
+            print(f"❌ 有推送后应恢复基础间隔: {pushed}, {after_push}")
+            return False
+        if errors != [300, 600, 1000] or "error_backoff_seconds" in entry or recovered != 1000:
+            print(f"❌ 出错退避不正确: {errors}, {recovered}, {entry}")
+            return False
+        if [name for name, _ in targets] != ["due"]:
+            print(f"❌ 只应检查到期的仓库: {targets}")
+            return False
+        print(f"✅ 间隔 {idle} -> 推送后 {pushed}, 出错退避 {errors}")
+        return True
+    except Exception as e:
+        print(f"❌ 检查间隔测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_commit_history_paging():
+    """测试提交历史增量拉取跟随分页、按提交时间重叠去重"""
+    print("\n🔍 测试 30: 测试提交历史分页...")
+    try:
+        sys.path.insert(0, str(Path(__file__).parent / "tools"))
+        from fake_github import FakeGitHub
+        from xueyuanzuoye import stu_homework
+
+        fake = FakeGitHub().start()
+        fake.add_repo("alice/hw", commits=5)
+        repo = "https://github.com/alice/hw"
+        try:
+            with temp_data_files(GITHUB_API_URL=fake.url, COMMIT_PAGE_SIZE=20):
+                first = stu_homework.get_commit_history(repo, "2026-01-01T00:04:00Z", limit=50)
+                fake.push("alice/hw", commits=40)
+                fake.reset_stats()
+                second = stu_homework.get_commit_history(repo, "2026-01-01T00:44:00Z", limit=50)
+                stats = fake.snapshot()
+                entry = stu_homework.commit_cache_entry(stu_homework.load_commit_cache(), "alice/hw")
+        finally:
+            fake.stop()
+
+        # 作者时间早于缓存、提交时间更新的提交（rebase 后）不能被 since 跳过
+        since = stu_homework.commit_history_since([
+            {"sha": "a1", "date": "2025-01-01T00:00:00Z", "committed": "2026-03-01T12:00:00Z"},
+        ])
+
+        if len(first) != 5:
+            print(f"❌ 首次应拉取 5 个提交: {len(first)}")
+            return False
+        messages = [c["message"] for c in second]
+        if messages != [f"commit {i}" for i in range(44, -1, -1)]:
+            print(f"❌ 增量拉取应得到完整且不重复的 45 个提交: {messages}")
+            return False
+        # 5 个旧提交落在重叠窗口内，45 个提交按每页 20 分 3 页
+        if stats["by_endpoint"] != {"commits": 3}:
+            print(f"❌ 应跟随分页请求 3 次: {stats}")
+            return False
+        if entry["synced_pushed_at"] != "2026-01-01T00:44:00Z":
+            print(f"❌ 拉完所有分页后才标记同步: {entry}")
+            return False
+        if since != "2026-02-28T12:00:00Z":
+            print(f"❌ since 应取提交时间并向前重叠: {since}")
+            return False
+        print(f"✅ 增量拉取 {stats['by_endpoint']['commits']} 页, 共 {len(second)} 个提交")
+        return True
+    except Exception as e:
+        print(f"❌ 提交历史分页测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
 def main():
     """运行所有测试"""
     print("=" * 60)
@@ -154,7 +1822,32 @@ def main():
         test_functions,
         test_avatar_url,
         test_badges,
-        test_cache
+        test_cache,
+        test_graphql_backend,
+        test_push_webhook,
+        test_git_mirror_backend,
+        test_resilience,
+        test_details_stale_while_revalidate,
+        test_fake_github_server,
+        test_sqlite_backend,
+        test_sweep_write_coalescing,
+        test_parsed_data_cache,
+        test_score_history_journal,
+        test_students_schema_migration,
+        test_multiprocess_storage,
+        test_student_registry,
+        test_generation_cache,
+        test_list_etag,
+        test_list_delta_sync,
+        test_event_stream,
+        test_list_paging,
+        test_worker_pool_concurrency,
+        test_conditional_requests,
+        test_rate_budget,
+        test_skip_unchanged_repos,
+        test_async_engine,
+        test_adaptive_poll_interval,
+        test_commit_history_paging
     ]
 
     results = []
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Poller throughput benchmark against the local fake GitHub (tools/fake_github.py).
+
+Runs check_all over N synthetic repos for several rounds and reports, per
+round, sweep time, requests issued (and how many were 304), requests per
+second, state.json writes and bytes written, and the sweep report. Round 1
+is a cold start; before each later round --push-ratio of the repos receive
+a new commit, so the rounds show what the validator cache and incremental
+refresh save.
+
+All data files live in a temp directory; nothing under data/ is touched.
+
+    python tools/bench_poller.py --repos 500 --latency 0.05
+    python tools/bench_poller.py --repos 500 --latency 0.05 --backend graphql
+    python tools/bench_poller.py --repos 2000 --latency 0.05 --engine asyncio --json
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from fake_github import FakeGitHub
+
+SRC_DIR = Path(__file__).resolve().parents[1] / "src"
+
+
+def load_app(api_url):
+    """Import the app pointed at the fake server, without its background poller"""
+    os.environ["POLL_ENGINE"] = "off"
+    os.environ["GITHUB_API_URL"] = api_url
+    os.environ["GITHUB_GRAPHQL_URL"] = f"{api_url}/graphql"
+    os.environ.pop("GITHUB_TOKEN", None)
+    if str(SRC_DIR) not in sys.path:
+        sys.path.insert(0, str(SRC_DIR))
+    from xueyuanzuoye import stu_homework
+    return stu_homework
+
+
+def run_sweep(app, engine):
+    if engine == "asyncio":
+        async def sweep():
+            timeout = app.aiohttp.ClientTimeout(total=app.ASYNC_REQUEST_TIMEOUT)
+            connector = app.aiohttp.TCPConnector(limit=0)
+            async with app.aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+                await app.async_check_all(session)
+        asyncio.run(sweep())
+    else:
+        app.check_all()
+    return dict(app.last_sweep_report)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark check_all against a fake GitHub")
+    parser.add_argument("--repos", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--push-ratio", type=float, default=0.1, help="fraction of repos pushed before rounds 2+")
+    parser.add_argument("--backend", choices=("rest", "graphql"), default="rest")
+    parser.add_argument("--engine", choices=("thread", "asyncio"), default="thread")
+    parser.add_argument("--concurrency", type=int, default=8, help="poll_concurrency / async_poll_concurrency")
+    parser.add_argument("--batch-size", type=int, default=50, help="graphql_batch_size")
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    fake = FakeGitHub(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                      rate_limit=args.rate_limit, seed=args.seed).start()
+    repo_urls = fake.add_synthetic_repos(args.repos)
+    app = load_app(fake.url)
+    if args.engine == "asyncio" and app.aiohttp is None:
+        sys.exit("asyncio engine needs aiohttp: pip install aiohttp")
+
+    tmp = Path(tempfile.mkdtemp(prefix="bench-poller-"))
+    app.STUDENTS_FILE = str(tmp / "students.json")
+    app.STATE_FILE = str(tmp / "state.json")
+    app.SETTINGS_FILE = str(tmp / "settings.json")
+    app.save_settings({
+        "fetch_backend": args.backend,
+        "poll_engine": args.engine,
+        "poll_concurrency": args.concurrency,
+        "async_poll_concurrency": args.concurrency,
+        "graphql_batch_size": args.batch_size,
+    })
+    app.save_students([{"name": f"student{i:04d}", "repo": url} for i, url in enumerate(repo_urls)])
+
+    results = []
+    pushed = 0
+    for round_no in range(1, args.rounds + 1):
+        if round_no > 1:
+            pushed = int(args.repos * args.push_ratio)
+            for url in fake.random.sample(repo_urls, pushed):
+                fake.push(url.split("github.com/")[1])
+        fake.reset_stats()
+        started = time.perf_counter()
+        report = run_sweep(app, args.engine)
+        elapsed = time.perf_counter() - started
+        stats = fake.snapshot()
+        results.append({
+            "round": round_no,
+            "pushed": pushed,
+            "sweep_seconds": round(elapsed, 3),
+            "requests": stats["requests"],
+            "not_modified": stats["by_status"].get("304", 0),
+            "requests_per_second": round(stats["requests"] / elapsed, 1) if elapsed else None,
+            "by_status": stats["by_status"],
+            "by_endpoint": stats["by_endpoint"],
+            "sweep": report,
+        })
+    fake.stop()
+
+    config = {k: getattr(args, k) for k in ("repos", "backend", "engine", "concurrency", "latency", "error_rate")}
+    if args.json:
+        print(json.dumps({"config": config, "rounds": results}, ensure_ascii=False, indent=2))
+        return
+    print("config: " + ", ".join(f"{k}={v}" for k, v in config.items()))
+    print(f"{'round':>5} {'pushed':>6} {'time(s)':>8} {'requests':>8} {'304':>6} {'req/s':>8} "
+          f"{'refreshed':>9} {'skipped':>7} {'failed':>6} {'writes':>6} {'KB written':>10}")
+    for r in results:
+        sweep = r["sweep"]
+        print(f"{r['round']:>5} {r['pushed']:>6} {r['sweep_seconds']:>8.3f} {r['requests']:>8} "
+              f"{r['not_modified']:>6} {r['requests_per_second'] or 0:>8.1f} "
+              f"{sweep.get('refreshed', 0):>9} {sweep.get('skipped', 0):>7} {sweep.get('failed', 0):>6} "
+              f"{sweep.get('state_writes', 0):>6} {sweep.get('bytes_written', 0) / 1024:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the parts of the GitHub API the poller uses.
+
+Serves:
+  GET  /repos/{owner}/{repo}           repository info (pushed_at, default_branch ...)
+  GET  /repos/{owner}/{repo}/commits   commit list with per_page/page/since and Link pagination
+  POST /graphql                        the batched repository query built by build_graphql_query
+  GET  /rate_limit                     current budget per resource
+
+Every response carries X-RateLimit-* headers and an ETag; If-None-Match hits
+return 304 and, like GitHub, do not count against the budget. Latency and
+error injection are configurable.
+
+Standalone:
+    python tools/fake_github.py --repos 200 --port 8099 --latency 0.05 --error-rate 0.01
+    GITHUB_API_URL=http://127.0.0.1:8099 python scripts/run_server.py
+"""
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs, urlencode
+
+REPO_PATH = re.compile(r"^/repos/([^/]+)/([^/]+?)(/commits)?/?$")
+BASE_TIME = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def iso(dt):
+    return dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class FakeGitHub:
+    """In-memory repositories plus the HTTP server that serves them.
+
+    repos: {"owner/name": {"commits": int, "pushed_at": datetime}}; commit i
+    (0 = oldest) is dated BASE_TIME + i minutes, so pagination and since=
+    filtering are deterministic.
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, error_status=502,
+                 rate_limit=5000, rate_window=3600, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.random = random.Random(seed)
+        self.repos = {}
+        self.lock = threading.Lock()
+        self.budgets = {}
+        self.stats = {}
+        self.reset_stats()
+        self.server = None
+        self.base_url = None
+
+    # ---------- data ----------
+
+    def add_repo(self, full_name, commits=1):
+        with self.lock:
+            self.repos[full_name.lower()] = {
+                "full_name": full_name,
+                "commits": commits,
+                "pushed_at": BASE_TIME + timedelta(minutes=max(commits - 1, 0)),
+            }
+
+    def add_synthetic_repos(self, count, owner="student", max_commits=60):
+        """Create count repos with 1..max_commits commits; returns their html URLs"""
+        urls = []
+        for i in range(count):
+            full_name = f"{owner}{i:04d}/homework"
+            self.add_repo(full_name, commits=self.random.randint(1, max_commits))
+            urls.append(f"https://github.com/{full_name}")
+        return urls
+
+    def push(self, full_name, commits=1):
+        """Simulate a push of `commits` new commits"""
+        with self.lock:
+            repo = self.repos[full_name.lower()]
+            repo["commits"] += commits
+            repo["pushed_at"] = max(repo["pushed_at"], BASE_TIME + timedelta(minutes=repo["commits"] - 1))
+
+    def commit_dicts(self, repo, start, stop):
+        """Commits newest first, in the REST response shape"""
+        owner_repo = repo["full_name"]
+        items = []
+        for i in range(start, stop):
+            idx = repo["commits"] - 1 - i
+            sha = hashlib.sha1(f"{owner_repo}:{idx}".encode()).hexdigest()
+            date = iso(BASE_TIME + timedelta(minutes=idx))
+            items.append({
+                "sha": sha,
+                "html_url": f"https://github.com/{owner_repo}/commit/{sha}",
+                "commit": {
+                    "message": f"commit {idx}",
+                    "author": {"name": owner_repo.split("/")[0], "date": date},
+                    "committer": {"name": owner_repo.split("/")[0], "date": date},
+                },
+            })
+        return items
+
+    # ---------- accounting ----------
+
+    def reset_stats(self):
+        with self.lock:
+            self.stats = {"requests": 0, "by_status": {}, "by_endpoint": {}}
+
+    def snapshot(self):
+        with self.lock:
+            return json.loads(json.dumps(self.stats))
+
+    def count(self, endpoint, status):
+        with self.lock:
+            self.stats["requests"] += 1
+            key = str(status)
+            self.stats["by_status"][key] = self.stats["by_status"].get(key, 0) + 1
+            self.stats["by_endpoint"][endpoint] = self.stats["by_endpoint"].get(endpoint, 0) + 1
+
+    def spend(self, resource, cost):
+        """Charge the budget; returns (allowed, headers)"""
+        now = time.time()
+        with self.lock:
+            budget = self.budgets.get(resource)
+            if budget is None or budget["reset"] <= now:
+                budget = {"used": 0, "reset": int(now + self.rate_window)}
+                self.budgets[resource] = budget
+            allowed = budget["used"] + cost <= self.rate_limit
+            if allowed:
+                budget["used"] += cost
+            headers = {
+                "X-RateLimit-Limit": str(self.rate_limit),
+                "X-RateLimit-Remaining": str(max(self.rate_limit - budget["used"], 0)),
+                "X-RateLimit-Used": str(budget["used"]),
+                "X-RateLimit-Reset": str(budget["reset"]),
+                "X-RateLimit-Resource": resource,
+            }
+        return allowed, headers
+
+    # ---------- server ----------
+
+    @property
+    def url(self):
+        # Saved in start(): handler threads still finishing after stop() build Link headers from it
+        return self.base_url
+
+    def start(self, host="127.0.0.1", port=0):
+        fake = self
+
+        class Handler(FakeGitHubHandler):
+            pass
+
+        Handler.fake = fake
+        self.server = FakeGitHubServer((host, port), Handler)
+        self.server.daemon_threads = True
+        bound_host, bound_port = self.server.server_address[:2]
+        self.base_url = f"http://{bound_host}:{bound_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+
+class FakeGitHubServer(ThreadingHTTPServer):
+    # Large listen backlog for load tests with hundreds of concurrent connections
+    request_queue_size = 1024
+
+
+class FakeGitHubHandler(BaseHTTPRequestHandler):
+    fake = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def delay(self):
+        fake = self.fake
+        if fake.latency or fake.jitter:
+            time.sleep(fake.latency + fake.random.uniform(0, fake.jitter))
+
+    def send_json(self, endpoint, status, body, headers=None, resource="core", cost=1):
+        fake = self.fake
+        payload = json.dumps(body).encode("utf-8") if body is not None else b""
+        etag = 'W/"%s"' % hashlib.sha1(payload).hexdigest()
+        not_modified = status == 200 and self.headers.get("If-None-Match") == etag
+        # 304 responses are free, as on GitHub
+        allowed, rate_headers = fake.spend(resource, 0 if not_modified else cost)
+        if not allowed:
+            status, not_modified = 403, False
+            payload = json.dumps({"message": "API rate limit exceeded"}).encode("utf-8")
+        elif not_modified:
+            status, payload = 304, b""
+        fake.count(endpoint, status)
+
+        self.send_response(status)
+        for key, value in rate_headers.items():
+            self.send_header(key, value)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        if status in (200, 304):
+            self.send_header("ETag", etag)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        if payload:
+            self.wfile.write(payload)
+
+    def injected_error(self, endpoint):
+        fake = self.fake
+        if fake.error_rate and fake.random.random() < fake.error_rate:
+            self.send_json(endpoint, fake.error_status, {"message": "injected error"})
+            return True
+        return False
+
+    def do_GET(self):
+        self.delay()
+        parsed = urlparse(self.path)
+        query = {k: v[-1] for k, v in parse_qs(parsed.query).items()}
+        if parsed.path == "/rate_limit":
+            with self.fake.lock:
+                body = {"resources": {k: dict(v) for k, v in self.fake.budgets.items()}}
+            self.send_json("rate_limit", 200, body, cost=0)
+            return
+
+        match = REPO_PATH.match(parsed.path)
+        if not match:
+            self.send_json("other", 404, {"message": "Not Found"})
+            return
+        endpoint = "commits" if match.group(3) else "repo"
+        if self.injected_error(endpoint):
+            return
+        full_name = f"{match.group(1)}/{match.group(2)}"
+        with self.fake.lock:
+            repo = dict(self.fake.repos.get(full_name.lower()) or {}) or None
+        if repo is None:
+            self.send_json(endpoint, 404, {"message": "Not Found"})
+            return
+        if endpoint == "repo":
+            self.send_json(endpoint, 200, {
+                "full_name": repo["full_name"],
+                "html_url": f"https://github.com/{repo['full_name']}",
+                "default_branch": "main",
+                "pushed_at": iso(repo["pushed_at"]),
+                "updated_at": iso(repo["pushed_at"]),
+                "size": repo["commits"],
+            })
+            return
+        self.list_commits(repo, parsed.path, query)
+
+    def list_commits(self, repo, path, query):
+        if repo["commits"] == 0:
+            self.send_json("commits", 409, {"message": "Git Repository is empty."})
+            return
+        try:
+            per_page = min(max(int(query.get("per_page", 30)), 1), 100)
+            page = max(int(query.get("page", 1)), 1)
+        except ValueError:
+            self.send_json("commits", 400, {"message": "Bad Request"})
+            return
+        total = repo["commits"]
+        since = query.get("since")
+        if since:
+            try:
+                cutoff = datetime.fromisoformat(since.replace("Z", "+00:00"))
+            except ValueError:
+                self.send_json("commits", 422, {"message": "Invalid since"})
+                return
+            # commit idx is dated BASE_TIME + idx minutes; keep those at or after since
+            first_idx = max(int((cutoff - BASE_TIME).total_seconds() // 60), 0)
+            if BASE_TIME + timedelta(minutes=first_idx) < cutoff:
+                first_idx += 1
+            total = max(repo["commits"] - first_idx, 0)
+        last_page = max((total + per_page - 1) // per_page, 1)
+        start = (page - 1) * per_page
+        body = self.fake.commit_dicts(repo, start, min(start + per_page, total))
+
+        links = []
+        base = dict(query)
+
+        def link(p, rel):
+            base["page"] = p
+            links.append(f'<{self.fake.url}{path}?{urlencode(base)}>; rel="{rel}"')
+
+        if page < last_page:
+            link(page + 1, "next")
+            link(last_page, "last")
+        if page > 1:
+            link(1, "first")
+            link(page - 1, "prev")
+        self.send_json("commits", 200, body, headers={"Link": ", ".join(links)} if links else None)
+
+    def do_POST(self):
+        self.delay()
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        if urlparse(self.path).path != "/graphql":
+            self.send_json("other", 404, {"message": "Not Found"})
+            return
+        if self.injected_error("graphql"):
+            return
+        try:
+            variables = (json.loads(raw or b"{}") or {}).get("variables") or {}
+        except ValueError:
+            self.send_json("graphql", 400, {"message": "Problems parsing JSON"})
+            return
+        data = {}
+        for key, owner in variables.items():
+            if not key.startswith("o"):
+                continue
+            idx = key[1:]
+            full_name = f"{owner}/{variables.get('n' + idx, '')}"
+            with self.fake.lock:
+                repo = dict(self.fake.repos.get(full_name.lower()) or {}) or None
+            if repo is None:
+                data[f"r{idx}"] = None
+            elif repo["commits"] == 0:
+                data[f"r{idx}"] = {"pushedAt": iso(repo["pushed_at"]), "defaultBranchRef": None}
+            else:
+                data[f"r{idx}"] = {
+                    "pushedAt": iso(repo["pushed_at"]),
+                    "defaultBranchRef": {"target": {"history": {"totalCount": repo["commits"]}}},
+                }
+        self.send_json("graphql", 200, {"data": data}, resource="graphql")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local fake GitHub API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--repos", type=int, default=100, help="number of synthetic repos (student0000/homework ...)")
+    parser.add_argument("--latency", type=float, default=0.0, help="fixed delay per request (seconds)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random delay per request (seconds)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with --error-status")
+    parser.add_argument("--error-status", type=int, default=502)
+    parser.add_argument("--rate-limit", type=int, default=5000, help="requests per window and resource")
+    parser.add_argument("--rate-window", type=int, default=3600, help="rate limit window (seconds)")
+    args = parser.parse_args()
+
+    fake = FakeGitHub(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                      error_status=args.error_status, rate_limit=args.rate_limit,
+                      rate_window=args.rate_window)
+    fake.add_synthetic_repos(args.repos)
+    fake.start(args.host, args.port)
+    print(f"Fake GitHub API on {fake.url} with {args.repos} repos (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        fake.stop()
+
+
+if __name__ == "__main__":
+    main()